@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库流式导出、导入
+导出：远程 mysqldump 的输出在服务器上压缩（gzip/zstd）后直接通过exec通道传回，本地边接收边写入文件，
+服务器上不产生临时文件，导出开始后立即开始传输；
+进度按 mysqldump 输出的未压缩字节数统计（远程 dd 每秒报告一次），总量按数据库的数据大小估算。
+导入：本地文件（可以是压缩文件）通过exec通道的stdin直接送入远程 mysql，压缩文件在服务器上解压，
+同样不占用服务器磁盘；进度按已发送的字节数统计，同时在本地统计已发送的SQL语句数。
+都提供与 FileTransfer 相同的接口（name/stats/run/cancel/verify），可直接交给 TransferJob 在后台运行
+"""
+
+import gzip
+import os
+import re
+import shlex
+import threading
+import zlib
+from typing import Optional, Tuple
+
+from sftp_transfer import PART_SUFFIX, TransferCancelled, TransferStats, VerifyMismatch, format_bytes
+
+
+# 每次从通道读取的块大小
+DUMP_BLOCK_SIZE = 256 * 1024
+# 远程压缩命令（按本地文件扩展名选择）
+DUMP_COMPRESSORS = {
+    "gzip": "gzip -c -6",
+    "zstd": "zstd -c -q -3",
+}
+# mysqldump 失败时写到 stderr 的标记（管道的退出码只反映最后一个命令）
+DUMP_FAILED_MARKER = "__MYSQLDUMP_FAILED__"
+# 命令开头从stdin的第一行读取密码，放入 MYSQL_PWD 环境变量（为空时不设置），
+# 密码不出现在命令行和远程进程列表中（进程环境变量只有本人和root可以读取）
+READ_PASSWORD = 'IFS= read -r MYSQL_PWD; [ -n "$MYSQL_PWD" ] && export MYSQL_PWD; '
+# 估算数据库大小的超时时间（秒）
+DUMP_ESTIMATE_TIMEOUT = 30
+# 本地检查压缩文件完整性的读取块大小
+DUMP_VERIFY_BLOCK_SIZE = 1024 * 1024
+# 导入时每次发送的块大小
+IMPORT_BLOCK_SIZE = 256 * 1024
+# 远程解压命令
+IMPORT_DECOMPRESSORS = {
+    "gzip": "gzip -dc",
+    "zstd": "zstd -dc -q",
+}
+# 解压失败时写到 stderr 的标记
+IMPORT_FAILED_MARKER = "__DECOMPRESS_FAILED__"
+
+# dd status=progress 的输出，如 “104857600 bytes (105 MB, 100 MiB) copied, 1 s, 105 MB/s”
+_DD_PROGRESS = re.compile(r"^(\d+) bytes")
+_DD_RECORDS = re.compile(r"^\d+\+\d+ records (in|out)$")
+
+
+def compression_for_path(path: str) -> Optional[str]:
+    """按本地文件扩展名选择压缩方式：.gz -> gzip，.zst -> zstd，其他不压缩"""
+    lower = path.lower()
+    if lower.endswith(".gz"):
+        return "gzip"
+    if lower.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def mysql_command(program: str, user: str, *args: str) -> str:
+    """构建 mysql/mysqldump 命令（不含密码，密码由 READ_PASSWORD 从stdin读取）"""
+    quoted = " ".join(shlex.quote(arg) for arg in args)
+    return f"{program} -u {shlex.quote(user)} {quoted}"
+
+
+def check_password(password: str):
+    """密码作为一行发送，不能包含换行符"""
+    if "\n" in password or "\r" in password:
+        raise ValueError("数据库密码不能包含换行符")
+
+
+def send_password(channel, password: str):
+    """把密码作为stdin的第一行发送给以 READ_PASSWORD 开头的命令"""
+    channel.sendall((password + "\n").encode("utf-8"))
+
+
+def build_dump_command(database: str, user: str, compression: Optional[str] = None) -> str:
+    """
+    导出命令：mysqldump | dd（报告进度，不支持 status=progress 时用 cat）| 压缩
+    mysqldump 失败时在 stderr 输出 DUMP_FAILED_MARKER；密码从stdin的第一行读取（send_password）
+    """
+    dump = mysql_command("mysqldump", user, database)
+    command = (
+        f"{READ_PASSWORD}"
+        "if dd if=/dev/null of=/dev/null status=progress 2>/dev/null; then meter='dd bs=1M status=progress'; "
+        "else meter=cat; fi; "
+        f"{{ {dump} || echo {DUMP_FAILED_MARKER} >&2; }} | $meter"
+    )
+    if compression:
+        command += f" | {DUMP_COMPRESSORS[compression]}"
+    return command
+
+
+def build_import_command(database: str, user: str, compression: Optional[str] = None) -> str:
+    """
+    导入命令：[解压 |] mysql，stdin的第一行是密码（send_password），之后是SQL；
+    解压失败时在 stderr 输出 IMPORT_FAILED_MARKER
+    """
+    command = mysql_command("mysql", user, database)
+    if compression:
+        command = f"{{ {IMPORT_DECOMPRESSORS[compression]} || echo {IMPORT_FAILED_MARKER} >&2; }} | {command}"
+    return READ_PASSWORD + command
+
+
+def check_gzip_file(path: str):
+    """完整读取本地gzip文件检查CRC，损坏时抛出 VerifyMismatch"""
+    try:
+        with gzip.open(path, "rb") as f:
+            while f.read(DUMP_VERIFY_BLOCK_SIZE):
+                pass
+    except (OSError, EOFError) as e:
+        raise VerifyMismatch(f"压缩文件校验失败: {e}")
+
+
+def estimate_database_size(client, database: str, user: str, password: str) -> int:
+    """数据库的数据大小（information_schema 中的 data_length 之和，用于估算导出进度），失败时返回0"""
+    literal = database.replace("\\", "\\\\").replace("'", "''")
+    query = f"SELECT COALESCE(SUM(data_length), 0) FROM information_schema.tables WHERE table_schema = '{literal}'"
+    try:
+        command = READ_PASSWORD + mysql_command("mysql", user, "-N", "-B", "-e", query)
+        stdin, stdout, stderr = client.exec_command(command, timeout=DUMP_ESTIMATE_TIMEOUT)
+        send_password(stdout.channel, password)
+        stdout.channel.shutdown_write()
+        return int(stdout.read().decode("utf-8", errors="ignore").strip() or 0)
+    except Exception:
+        return 0
+
+
+class _DatabaseStream:
+    """导出、导入共用的部分：取消（关闭通道）、在单独的线程中读取远程 stderr"""
+
+    def __init__(self, client, database: str, user: str, password: str, local_path: str,
+                 compression: Optional[str] = None):
+        self.client = client
+        self.database = database
+        self.user = user
+        self.password = password
+        self.local_path = local_path
+        self.compression = compression if compression is not None else compression_for_path(local_path)
+        self.verify = False
+        self.stats = TransferStats()
+        self._errors = []
+        self._cancel_event = threading.Event()
+        self._channel = None
+
+    def cancel(self):
+        self._cancel_event.set()
+        # 关闭通道，使阻塞中的读取立即返回（远程命令随之结束）
+        if self._channel is not None:
+            try:
+                self._channel.close()
+            except Exception:
+                pass
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def _start_stderr_thread(self, channel) -> threading.Thread:
+        # stderr 在单独的线程中读取，避免缓冲区写满阻塞远程命令
+        thread = threading.Thread(target=self._read_stderr, args=(channel,), daemon=True)
+        thread.start()
+        return thread
+
+    def _read_stderr(self, channel):
+        pending = ""
+        while True:
+            try:
+                data = channel.recv_stderr(4096)
+            except Exception:
+                return
+            if not data:
+                break
+            pending += data.decode("utf-8", errors="ignore")
+            # dd 用 \r 刷新同一行
+            lines = re.split(r"[\r\n]", pending)
+            pending = lines.pop()
+            for line in lines:
+                self._handle_stderr_line(line.strip())
+        self._handle_stderr_line(pending.strip())
+
+    def _handle_stderr_line(self, line: str):
+        if line and "Using a password" not in line:
+            self._errors.append(line)
+
+    def _error_text(self, marker: str) -> Tuple[bool, str]:
+        """(是否出现了失败标记, 其余的错误信息)"""
+        failed = marker in self._errors
+        return failed, "\n".join(line for line in self._errors if line != marker)
+
+
+class DatabaseExport(_DatabaseStream):
+    """
+    数据库流式导出（本地先写入 .part 文件，完成后改名，失败或取消时删除）
+    verify=True 时完成后检查本地gzip文件的完整性（CRC），损坏时由 TransferJob 重新导出
+    """
+
+    def __init__(self, client, database: str, user: str, password: str, local_path: str,
+                 compression: Optional[str] = None, verify: bool = False):
+        super().__init__(client, database, user, password, local_path, compression)
+        self.verify = verify and self.compression == "gzip"
+        self.compressed_bytes = 0
+        self._metered = False  # 是否收到过 dd 的进度（未压缩字节数）
+        self._progress_lock = threading.Lock()  # 接收线程和 stderr 线程都会更新进度
+
+    @property
+    def name(self) -> str:
+        return f"{self.database} -> {os.path.basename(self.local_path)}"
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.stats.done / self.compressed_bytes if self.compressed_bytes else 0.0
+
+    def describe(self) -> str:
+        """导出结果说明（SQL大小、压缩后大小）"""
+        if not self.compression:
+            return f"SQL {format_bytes(self.compressed_bytes)}"
+        if not self._metered:
+            return f"{self.compression}压缩后 {format_bytes(self.compressed_bytes)}"
+        return (f"SQL {format_bytes(self.stats.done)}，{self.compression}压缩后 {format_bytes(self.compressed_bytes)}"
+                f"（{self.compression_ratio:.1f}x）")
+
+    def run(self, sftp=None):
+        """执行导出（阻塞）；sftp参数仅为与FileTransfer接口一致，不使用"""
+        self.compressed_bytes = 0
+        self._metered = False
+        self._errors = []
+        check_password(self.password)
+        self.stats.start(estimate_database_size(self.client, self.database, self.user, self.password))
+        part_path = self.local_path + PART_SUFFIX
+        try:
+            self._receive(part_path)
+            os.replace(part_path, self.local_path)
+        except BaseException:
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            raise
+        # 估算的总量只用于显示进度，完成后以实际大小为准
+        self.stats.total = self.stats.done
+        self.stats.finish()
+
+    def _receive(self, part_path: str):
+        command = build_dump_command(self.database, self.user, self.compression)
+        stdin, stdout, stderr = self.client.exec_command(command)
+        channel = stdout.channel
+        self._channel = channel
+        send_password(channel, self.password)
+        channel.shutdown_write()
+        # stderr 中是 dd 的进度和错误信息
+        stderr_thread = self._start_stderr_thread(channel)
+        try:
+            with open(part_path, "wb") as local_file:
+                while True:
+                    data = channel.recv(DUMP_BLOCK_SIZE)
+                    if not data:
+                        break
+                    local_file.write(data)
+                    self.compressed_bytes += len(data)
+                    # dd 报告之前（或远程没有 dd 进度）先按接收的字节数显示进度
+                    self._set_dumped(self.compressed_bytes)
+        except OSError as e:
+            if self.cancelled:
+                raise TransferCancelled()
+            raise IOError(f"写入本地文件失败: {e}")
+        finally:
+            self._channel = None
+        if self.cancelled:
+            raise TransferCancelled()
+        exit_status = channel.recv_exit_status()
+        stderr_thread.join(timeout=5)
+        failed, errors = self._error_text(DUMP_FAILED_MARKER)
+        if failed:
+            raise IOError(f"导出失败: {errors or 'mysqldump 执行失败'}")
+        if exit_status != 0:
+            raise IOError(f"导出失败（退出码 {exit_status}）: {errors or '无错误信息'}")
+        if self.compressed_bytes == 0:
+            raise IOError("导出失败: 没有收到数据")
+
+    def _handle_stderr_line(self, line: str):
+        if not line or _DD_RECORDS.match(line):
+            return
+        match = _DD_PROGRESS.match(line)
+        if match:
+            self._metered = True
+            self._set_dumped(int(match.group(1)))
+        else:
+            super()._handle_stderr_line(line)
+
+    def _set_dumped(self, dumped: int):
+        with self._progress_lock:
+            if dumped > self.stats.done:
+                self.stats.add(dumped - self.stats.done)
+            # 估算偏小时进度不超过100%
+            if self.stats.done > self.stats.total:
+                self.stats.total = self.stats.done
+
+    def verify_remote(self, client=None):
+        """
+        导出没有远程文件可以比较：完整读取本地gzip文件检查CRC，损坏时抛出 VerifyMismatch
+        （TransferJob 收到后重新导出）
+        """
+        check_gzip_file(self.local_path)
+
+
+class _StatementCounter:
+    """
+    统计已发送的SQL语句数（mysqldump 的每条语句以“;”加换行结尾）
+    gzip文件在本地同时解压一份用于统计；zstd文件不统计
+    """
+
+    def __init__(self, compression: Optional[str]):
+        self.count = 0
+        self.enabled = compression in (None, "gzip")
+        self._last = b""
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if compression == "gzip" else None
+
+    def feed(self, data: bytes):
+        if not self.enabled:
+            return
+        if self._decompressor is not None:
+            data = self._decompress(data)
+        if not data:
+            return
+        # 块的边界正好落在“;”和换行之间
+        if self._last == b";" and data[:1] == b"\n":
+            self.count += 1
+        self.count += data.count(b";\n")
+        self._last = data[-1:]
+
+    def _decompress(self, data: bytes) -> bytes:
+        output = []
+        try:
+            while data:
+                output.append(self._decompressor.decompress(data))
+                if not self._decompressor.eof:
+                    break
+                # 多个gzip成员拼接的文件
+                data = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        except zlib.error:
+            # 文件损坏时由远程解压报告错误，这里只停止统计
+            self.enabled = False
+            return b""
+        return b"".join(output)
+
+
+class DatabaseImport(_DatabaseStream):
+    """
+    数据库流式导入（本地文件通过stdin送入远程 mysql，.gz/.zst 文件在服务器上解压）
+    取消时关闭通道，已经执行的语句不会回滚
+    导入后没有远程文件可以计算SHA256，因此不做传输后校验；
+    verify=True 时在发送前检查本地gzip文件的完整性（CRC），避免损坏的文件导入到一半才失败
+    """
+
+    def __init__(self, client, database: str, user: str, password: str, local_path: str,
+                 compression: Optional[str] = None, verify: bool = False):
+        super().__init__(client, database, user, password, local_path, compression)
+        self.check_archive = verify and self.compression == "gzip"
+        self.checking = False  # 正在检查压缩文件
+        self._counter = _StatementCounter(self.compression)
+
+    @property
+    def name(self) -> str:
+        return f"{os.path.basename(self.local_path)} -> {self.database}"
+
+    @property
+    def statements(self) -> Optional[int]:
+        """已发送的SQL语句数（无法统计时为None）"""
+        return self._counter.count if self._counter.enabled else None
+
+    def describe(self) -> str:
+        """导入进度说明（已发送的字节数、语句数）"""
+        text = f"已发送 {format_bytes(self.stats.done)}"
+        if self.statements is not None:
+            text += f"，{self.statements} 条SQL语句"
+        return text
+
+    def run(self, sftp=None):
+        """执行导入（阻塞）；sftp参数仅为与FileTransfer接口一致，不使用"""
+        self._errors = []
+        self._counter = _StatementCounter(self.compression)
+        check_password(self.password)
+        if self.check_archive:
+            self.checking = True
+            try:
+                check_gzip_file(self.local_path)
+            finally:
+                self.checking = False
+            if self.cancelled:
+                raise TransferCancelled()
+        # 先打开本地文件，打不开时不启动远程命令
+        with open(self.local_path, "rb") as local_file:
+            self.stats.start(os.fstat(local_file.fileno()).st_size)
+            stdin, stdout, stderr = self.client.exec_command(
+                build_import_command(self.database, self.user, self.compression))
+            channel = stdout.channel
+            self._channel = channel
+            stderr_thread = self._start_stderr_thread(channel)
+            try:
+                send_error = self._send(channel, local_file)
+                if self.cancelled:
+                    raise TransferCancelled()
+                exit_status = channel.recv_exit_status()
+            except BaseException:
+                # 读取本地文件出错或取消：结束远程命令（否则 mysql 一直等待输入）
+                channel.close()
+                raise
+            finally:
+                self._channel = None
+        stderr_thread.join(timeout=5)
+        failed, errors = self._error_text(IMPORT_FAILED_MARKER)
+        if failed:
+            raise IOError(f"导入失败: 解压失败 {errors}")
+        if exit_status != 0 or send_error is not None:
+            raise IOError(f"导入失败（退出码 {exit_status}）: {errors or send_error or '无错误信息'}")
+        self.stats.finish()
+
+    def _send(self, channel, local_file) -> Optional[Exception]:
+        """发送密码和文件内容并关闭stdin；远程命令提前退出（如SQL错误）时返回发送的异常，错误信息在 stderr 中"""
+        try:
+            send_password(channel, self.password)
+        except (OSError, EOFError) as e:
+            return e
+        while not self.cancelled:
+            data = local_file.read(IMPORT_BLOCK_SIZE)
+            try:
+                if not data:
+                    channel.shutdown_write()
+                    return None
+                channel.sendall(data)
+            except (OSError, EOFError) as e:
+                if self.cancelled:
+                    break
+                return e
+            self._counter.feed(data)
+            self.stats.add(len(data))
+        raise TransferCancelled()
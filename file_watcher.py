@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+外部编辑器自动同步
+所有用外部编辑器（如Notepad++）打开的文件共用一个监视服务：
+优先使用系统文件变化通知（watchdog），未安装时用一个线程轮询；
+每个文件单独防抖，连续多次保存合并为一次上传，通过共享SFTP会话原子保存到服务器
+"""
+
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+from sftp_transfer import RemoteVersion, SaveConflict, atomic_save
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    HAS_WATCHDOG = True
+except ImportError:
+    FileSystemEventHandler = object
+    HAS_WATCHDOG = False
+
+
+# 轮询模式的检查间隔（秒）
+WATCH_POLL_INTERVAL = 1.0
+# 文件最后一次变化后等待的时间（秒），期间的多次保存合并为一次上传
+WATCH_DEBOUNCE = 0.8
+# 上传失败后重试的间隔（秒）和次数
+WATCH_RETRY_INTERVAL = 5.0
+WATCH_MAX_RETRIES = 3
+
+
+class WatchedFile:
+    """一个被监视的文件（本地副本 -> 远程文件）"""
+
+    def __init__(self, remote_path: str, local_path: str, version: Optional[RemoteVersion] = None):
+        self.remote_path = remote_path
+        self.local_path = local_path
+        self.version = version  # 最近一次下载或上传后的远程版本，用于冲突检查
+        self.status = "idle"  # idle/pending/uploading/synced/conflict/error
+        self.error = None
+        self.sync_count = 0
+        self.last_sync = None
+        self.due = None  # 计划上传的时间
+        self.force = False  # 下次上传跳过冲突检查
+        self.retries = 0
+        self.signature = self._stat_signature()  # 已同步（或刚下载）时本地文件的 (修改时间, 大小)
+        self.seen = self.signature  # 最近一次检测到的 (修改时间, 大小)，用于防抖
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.local_path)
+            return st.st_mtime, st.st_size
+        except OSError:
+            return None
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    """watchdog事件处理：把变化的本地路径交给监视服务"""
+
+    def __init__(self, watcher: "FileWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify_changed(event.src_path)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify_changed(event.src_path)
+
+    def on_moved(self, event):
+        # 很多编辑器保存时先写临时文件再改名
+        if not event.is_directory:
+            self.watcher.notify_changed(event.dest_path)
+
+
+class FileWatcher:
+    """
+    文件监视服务
+    session_provider: 返回当前连接的 SharedSFTPSession（上传时从中借用SFTP通道）
+    on_event: 回调 (级别, 消息, WatchedFile)，级别为 success/error/warning，在工作线程中调用
+    """
+
+    def __init__(self, session_provider: Callable, on_event: Optional[Callable] = None):
+        self.session_provider = session_provider
+        self.on_event = on_event or (lambda level, message, watched: None)
+        self.use_notifications = HAS_WATCHDOG
+        self._files = {}  # {远程路径: WatchedFile}
+        self._by_local = {}  # {规范化的本地路径: WatchedFile}
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._observer = None
+        self._watched_dirs = {}  # {本地目录: (watch句柄, 引用计数)}
+        threading.Thread(target=self._upload_loop, daemon=True).start()
+        if not self.use_notifications:
+            threading.Thread(target=self._poll_loop, daemon=True).start()
+
+    @staticmethod
+    def _key(local_path: str) -> str:
+        return os.path.normcase(os.path.abspath(local_path))
+
+    # ---------- 管理监视的文件 ----------
+
+    def watch(self, remote_path: str, local_path: str, version: Optional[RemoteVersion] = None) -> WatchedFile:
+        with self._condition:
+            existing = self._files.get(remote_path)
+            if existing is not None:
+                if self._key(existing.local_path) == self._key(local_path):
+                    return existing
+                self._remove(existing)
+            watched = WatchedFile(remote_path, local_path, version)
+            self._files[remote_path] = watched
+            self._by_local[self._key(local_path)] = watched
+        if self.use_notifications:
+            self._add_dir_watch(os.path.dirname(self._key(local_path)))
+            # 替换的旧本地副本所在目录（先增加新目录的引用，同一目录时不会被移除后重建）
+            if existing is not None:
+                self._remove_dir_watch(os.path.dirname(self._key(existing.local_path)))
+        return watched
+
+    def get(self, remote_path: str) -> Optional[WatchedFile]:
+        with self._condition:
+            return self._files.get(remote_path)
+
+    def unwatch(self, remote_path: str):
+        with self._condition:
+            watched = self._files.get(remote_path)
+            if watched is None:
+                return
+            self._remove(watched)
+        if self.use_notifications:
+            self._remove_dir_watch(os.path.dirname(self._key(watched.local_path)))
+
+    def _remove(self, watched: WatchedFile):
+        self._files.pop(watched.remote_path, None)
+        self._by_local.pop(self._key(watched.local_path), None)
+
+    def files(self) -> List[WatchedFile]:
+        with self._condition:
+            return list(self._files.values())
+
+    def sync_now(self, remote_path: str, force: bool = False):
+        """立即上传（force=True 时忽略远程冲突直接覆盖）"""
+        with self._condition:
+            watched = self._files.get(remote_path)
+            if watched is None:
+                return
+            watched.force = force
+            watched.retries = 0
+            watched.status = "pending"
+            watched.due = time.time()
+            self._condition.notify_all()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._files.clear()
+            self._by_local.clear()
+            self._condition.notify_all()
+        if self._observer is not None:
+            try:
+                self._observer.stop()
+            except Exception:
+                pass
+            self._observer = None
+            self._watched_dirs.clear()
+
+    # ---------- 变化检测 ----------
+
+    def _add_dir_watch(self, directory: str):
+        try:
+            if self._observer is None:
+                self._observer = Observer()
+                self._observer.daemon = True
+                self._observer.start()
+            handle, count = self._watched_dirs.get(directory, (None, 0))
+            if handle is None:
+                handle = self._observer.schedule(_ChangeHandler(self), directory, recursive=False)
+            self._watched_dirs[directory] = (handle, count + 1)
+        except Exception:
+            # 系统通知不可用（如监视数量达到上限），改为轮询
+            if self.use_notifications:
+                self.use_notifications = False
+                threading.Thread(target=self._poll_loop, daemon=True).start()
+
+    def _remove_dir_watch(self, directory: str):
+        handle, count = self._watched_dirs.get(directory, (None, 0))
+        if handle is None:
+            return
+        if count > 1:
+            self._watched_dirs[directory] = (handle, count - 1)
+            return
+        del self._watched_dirs[directory]
+        try:
+            self._observer.unschedule(handle)
+        except Exception:
+            pass
+
+    def notify_changed(self, local_path: str):
+        """本地文件有变化：推迟到防抖时间之后上传（再次变化时重新计时）"""
+        with self._condition:
+            watched = self._by_local.get(self._key(local_path))
+            if watched is None:
+                return
+            current = watched._stat_signature()
+            # 与已同步的版本相同，或这次变化已经处理过（失败后不反复重试）
+            if current == watched.signature or current == watched.seen:
+                return
+            watched.seen = current
+            watched.status = "pending"
+            watched.due = time.time() + WATCH_DEBOUNCE
+            self._condition.notify_all()
+
+    def _poll_loop(self):
+        """轮询模式：一个线程检查所有文件"""
+        while not self._stopped:
+            for watched in self.files():
+                if watched.status != "uploading":
+                    self.notify_changed(watched.local_path)
+            time.sleep(WATCH_POLL_INTERVAL)
+
+    # ---------- 上传 ----------
+
+    def _next_due(self) -> Optional[WatchedFile]:
+        """等待到最早的计划上传时间，返回到期的文件（停止时返回None）"""
+        with self._condition:
+            while not self._stopped:
+                pending = [watched for watched in self._files.values() if watched.due is not None]
+                if pending:
+                    first = min(pending, key=lambda watched: watched.due)
+                    delay = first.due - time.time()
+                    if delay <= 0:
+                        first.due = None
+                        first.status = "uploading"
+                        return first
+                    self._condition.wait(delay)
+                else:
+                    self._condition.wait()
+            return None
+
+    def _upload_loop(self):
+        while True:
+            watched = self._next_due()
+            if watched is None:
+                return
+            signature = watched._stat_signature()
+            if signature is None:
+                self._finish(watched, "error", "本地文件已被删除", None)
+                continue
+            try:
+                with open(watched.local_path, "rb") as f:
+                    data = f.read()
+                session = self.session_provider()
+                with session.channel() as sftp:
+                    version, sent, delta = atomic_save(session.client, sftp, watched.remote_path, data,
+                                                       watched.version, force=watched.force)
+            except SaveConflict:
+                watched.signature = signature
+                self._finish(watched, "conflict", "远程文件已被其他人修改，未覆盖（可在列表中选择强制上传）", None)
+                continue
+            except Exception as e:
+                self._finish(watched, "error", str(e), None)
+                # 连接问题等临时错误稍后重试
+                with self._condition:
+                    if watched.remote_path in self._files and watched.due is None and \
+                            watched.retries < WATCH_MAX_RETRIES:
+                        watched.retries += 1
+                        watched.due = time.time() + WATCH_RETRY_INTERVAL
+                        self._condition.notify_all()
+                continue
+            watched.version = version
+            watched.signature = signature
+            watched.force = False
+            watched.retries = 0
+            watched.sync_count += 1
+            watched.last_sync = time.time()
+            self._finish(watched, "synced", None, f"[自动同步] {watched.remote_path} 已同步到服务器")
+            # 上传期间又有修改时再同步一次
+            self.notify_changed(watched.local_path)
+
+    def _finish(self, watched: WatchedFile, status: str, error: Optional[str], message: Optional[str]):
+        with self._condition:
+            if watched.due is None:
+                watched.status = status
+            watched.error = error
+        if error:
+            level = "warning" if status == "conflict" else "error"
+            self.on_event(level, f"[自动同步失败] {watched.remote_path}: {error}", watched)
+        elif message:
+            self.on_event("success", message, watched)
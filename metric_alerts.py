@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控告警
+告警规则按指标建立索引，每收到一个采样只检查与该指标有关的规则；
+每台主机的每条规则只保存几个数值（条件开始成立/不成立的时间、是否正在告警），不保存历史采样；
+条件持续满足指定时间后告警一次，持续恢复一段时间后发出恢复通知，同一告警不重复通知
+"""
+
+import operator
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# 告警恢复前条件需要持续不满足的时间（秒），避免数值在阈值附近波动时反复告警
+ALERT_RESOLVE_AFTER = 30.0
+# 保留的最近告警事件条数
+ALERT_HISTORY = 200
+
+# 可用的指标: (名称, 单位)；reachable/gm_port 为 1（正常）或 0（无法连接）
+ALERT_METRICS = {
+    "cpu": ("CPU使用率", "%"),
+    "mem": ("内存使用率", "%"),
+    "disk": ("磁盘使用率", "%"),
+    "load": ("系统负载(1分钟)", ""),
+    "net_rx": ("网络接收", "B/s"),
+    "net_tx": ("网络发送", "B/s"),
+    "reachable": ("主机连接", ""),
+    "gm_port": ("GM端口", ""),
+    "gm_latency": ("GM端口延迟", "ms"),
+    "tcp_est": ("TCP连接数", ""),
+    "tcp_syn_recv": ("TCP半连接数", ""),
+}
+ALERT_STATE_METRICS = ("reachable", "gm_port")
+ALERT_COUNT_METRICS = ("tcp_est", "tcp_syn_recv")
+
+ALERT_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+ALERT_LEVELS = ("warning", "error")
+
+DEFAULT_ALERT_RULES = [
+    {"name": "CPU使用率过高", "metric": "cpu", "op": ">", "threshold": 90, "duration": 60, "level": "warning"},
+    {"name": "内存不足", "metric": "mem", "op": ">", "threshold": 90, "duration": 60, "level": "warning"},
+    {"name": "磁盘空间不足", "metric": "disk", "op": ">", "threshold": 85, "duration": 0, "level": "warning"},
+    {"name": "主机无法连接", "metric": "reachable", "op": "<", "threshold": 1, "duration": 30, "level": "error"},
+    {"name": "GM端口无法连接", "metric": "gm_port", "op": "<", "threshold": 1, "duration": 0, "level": "error"},
+]
+
+
+class AlertRule:
+    """一条告警规则：指标 比较 阈值，持续 duration 秒"""
+
+    def __init__(self, name: str, metric: str, op: str, threshold: float, duration: float = 0,
+                 level: str = "warning", enabled: bool = True):
+        if metric not in ALERT_METRICS:
+            raise ValueError(f"未知指标: {metric}")
+        if op not in ALERT_OPERATORS:
+            raise ValueError(f"未知比较方式: {op}")
+        self.name = name
+        self.metric = metric
+        self.op = op
+        self.threshold = float(threshold)
+        self.duration = max(0.0, float(duration))
+        self.level = level if level in ALERT_LEVELS else "warning"
+        self.enabled = bool(enabled)
+        self._compare = ALERT_OPERATORS[op]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AlertRule":
+        return cls(data["name"], data["metric"], data.get("op", ">"), data.get("threshold", 0),
+                   data.get("duration", 0), data.get("level", "warning"), data.get("enabled", True))
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "metric": self.metric, "op": self.op, "threshold": self.threshold,
+                "duration": self.duration, "level": self.level, "enabled": self.enabled}
+
+    def matches(self, value: float) -> bool:
+        return self._compare(value, self.threshold)
+
+    def describe(self) -> str:
+        """条件的文字说明，如“CPU使用率 > 90% 持续60秒”"""
+        label, unit = ALERT_METRICS[self.metric]
+        if self.metric in ALERT_STATE_METRICS:
+            text = f"{label}失败"
+        else:
+            text = f"{label} {self.op} {self.threshold:g}{unit}"
+        if self.duration:
+            text += f" 持续{self.duration:g}秒"
+        return text
+
+
+def default_alert_rules() -> List[AlertRule]:
+    return [AlertRule.from_dict(data) for data in DEFAULT_ALERT_RULES]
+
+
+def format_metric_value(metric: str, value: float) -> str:
+    if metric in ALERT_STATE_METRICS:
+        return "正常" if value >= 1 else "无法连接"
+    if metric in ALERT_COUNT_METRICS:
+        return str(int(value))
+    return f"{value:.1f}{ALERT_METRICS[metric][1]}"
+
+
+class AlertEvent:
+    """一次告警或恢复"""
+
+    def __init__(self, kind: str, host: str, rule: AlertRule, value: float, timestamp: float,
+                 since: Optional[float] = None):
+        self.kind = kind  # fire/resolve
+        self.host = host
+        self.rule = rule
+        self.value = value
+        self.timestamp = timestamp
+        self.since = since  # 告警开始的时间（恢复事件）
+
+    @property
+    def message(self) -> str:
+        value = format_metric_value(self.rule.metric, self.value)
+        if self.kind == "fire":
+            return f"[告警] {self.host} {self.rule.name}: {self.rule.describe()}（当前 {value}）"
+        lasted = f"，持续{int(self.timestamp - self.since)}秒" if self.since else ""
+        return f"[恢复] {self.host} {self.rule.name} 已恢复（当前 {value}{lasted}）"
+
+
+class _RuleState:
+    """一台主机的一条规则的状态（固定大小）"""
+    __slots__ = ("since", "clear_since", "active", "fired_at", "value")
+
+    def __init__(self):
+        self.since = None  # 条件开始连续满足的时间
+        self.clear_since = None  # 告警中条件开始连续不满足的时间
+        self.active = False
+        self.fired_at = None
+        self.value = None
+
+
+class AlertEngine:
+    """
+    告警引擎（可在任意线程调用）
+    on_event(AlertEvent): 告警或恢复时调用，在调用 observe 的线程中执行
+    """
+
+    def __init__(self, rules: Optional[List[AlertRule]] = None, on_event: Optional[Callable] = None):
+        self.on_event = on_event or (lambda event: None)
+        self.events = deque(maxlen=ALERT_HISTORY)
+        self._lock = threading.Lock()
+        self._states = {}  # {(主机, 规则名称): _RuleState}
+        self._by_metric = {}  # {指标: [规则]}
+        self.rules = []
+        self.set_rules(rules if rules is not None else default_alert_rules())
+
+    def set_rules(self, rules: List[AlertRule]):
+        """替换规则（修改过的规则重新计时，正在告警的直接清除，不发恢复通知）"""
+        with self._lock:
+            self.rules = list(rules)
+            self._by_metric = {}
+            for rule in self.rules:
+                if rule.enabled:
+                    self._by_metric.setdefault(rule.metric, []).append(rule)
+            self._states.clear()
+
+    def observe(self, host: str, stats):
+        """一次采集成功（SystemStats）：同时视为主机可以连接；探测了GM端口时同时检查GM端口"""
+        values = {
+            "cpu": stats.cpu_usage,
+            "mem": stats.mem_usage,
+            "disk": stats.disk_usage,
+            "load": stats.load[0],
+            "net_rx": stats.net_rx_rate,
+            "net_tx": stats.net_tx_rate,
+            "tcp_est": stats.tcp_established,
+            "tcp_syn_recv": stats.tcp_syn_recv,
+            "reachable": 1,
+        }
+        if stats.gm_port_up is not None:
+            values["gm_port"] = 1 if stats.gm_port_up else 0
+            if stats.gm_latency is not None:
+                values["gm_latency"] = stats.gm_latency
+        self.observe_values(host, values, stats.timestamp)
+
+    def observe_value(self, host: str, metric: str, value: float, timestamp: Optional[float] = None):
+        self.observe_values(host, {metric: value}, timestamp)
+
+    def observe_values(self, host: str, values: Dict[str, float], timestamp: Optional[float] = None):
+        timestamp = timestamp if timestamp is not None else time.time()
+        events = []
+        with self._lock:
+            for metric, value in values.items():
+                for rule in self._by_metric.get(metric, ()):
+                    event = self._evaluate(host, rule, value, timestamp)
+                    if event is not None:
+                        events.append(event)
+                        self.events.append(event)
+        for event in events:
+            self.on_event(event)
+
+    def _evaluate(self, host: str, rule: AlertRule, value: float, timestamp: float) -> Optional[AlertEvent]:
+        key = (host, rule.name)
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _RuleState()
+        state.value = value
+        if rule.matches(value):
+            state.clear_since = None
+            if state.since is None:
+                state.since = timestamp
+            if not state.active and timestamp - state.since >= rule.duration:
+                state.active = True
+                state.fired_at = timestamp
+                return AlertEvent("fire", host, rule, value, timestamp)
+            return None
+        state.since = None
+        if not state.active:
+            return None
+        if state.clear_since is None:
+            state.clear_since = timestamp
+        if timestamp - state.clear_since < ALERT_RESOLVE_AFTER:
+            return None
+        state.active = False
+        state.clear_since = None
+        return AlertEvent("resolve", host, rule, value, timestamp, state.fired_at)
+
+    def active(self) -> List[AlertEvent]:
+        """正在告警的规则（按开始时间排序，value 为最近一次的数值）"""
+        rules = {rule.name: rule for rule in self.rules}
+        with self._lock:
+            result = [AlertEvent("fire", host, rules[name], state.value, state.fired_at)
+                      for (host, name), state in self._states.items() if state.active and name in rules]
+        result.sort(key=lambda event: event.timestamp)
+        return result
+
+    def recent_events(self) -> List[AlertEvent]:
+        """最近的告警事件（副本，采集线程可能同时在追加）"""
+        with self._lock:
+            return list(self.events)
+
+    def forget(self, host: str):
+        """停止监控某台主机：清除它的状态（不发恢复通知）"""
+        with self._lock:
+            for key in [key for key in self._states if key[0] == host]:
+                del self._states[key]
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控数据存储（本地SQLite）
+采样先放入内存缓冲，由写入线程批量写入（每秒一条）；
+已结束的分钟、小时自动汇总为平均值和最大值（1秒 -> 1分钟 -> 1小时），过期数据按保留时间删除；
+查询时按时间范围选择合适的精度，并在SQL中分桶降采样
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+
+# 批量写入：最长间隔（秒）和缓冲条数上限（达到后立即写入）
+STORE_FLUSH_INTERVAL = 5.0
+STORE_BATCH_SIZE = 500
+# 各精度的保留时间（秒）
+STORE_RAW_RETENTION = 2 * 86400
+STORE_MINUTE_RETENTION = 30 * 86400
+STORE_HOUR_RETENTION = 365 * 86400
+# 清理过期数据的间隔（秒）
+STORE_PRUNE_INTERVAL = 3600
+
+# 保存的指标（与 remote_monitor.HISTORY_METRICS 一致，各网卡、各端口的数值只保存在内存中）
+STORE_METRICS = ("cpu", "mem", "disk", "load", "net_rx", "net_tx", "gm_latency", "tcp_est", "tcp_syn_recv")
+
+# 精度: (表名, 每条的秒数, 保留时间)
+LEVEL_RAW = ("samples_1s", 1, STORE_RAW_RETENTION)
+LEVEL_MINUTE = ("samples_1m", 60, STORE_MINUTE_RETENTION)
+LEVEL_HOUR = ("samples_1h", 3600, STORE_HOUR_RETENTION)
+
+
+def _metric_columns(with_max: bool) -> str:
+    columns = []
+    for metric in STORE_METRICS:
+        columns.append(f"{metric} REAL")
+        if with_max:
+            columns.append(f"{metric}_max REAL")
+    return ", ".join(columns)
+
+
+class MetricsStore:
+    """
+    监控数据存储
+    add() 只把采样放入内存缓冲（可在任意线程调用）；query() 每次使用独立的只读连接
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._buffer = []
+        self._flush_waiters = []  # flush() 等待写入完成的事件
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._last_prune = 0.0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        connection = self._connect()
+        try:
+            self._create_tables(connection)
+        finally:
+            connection.close()
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    @staticmethod
+    def _create_tables(connection: sqlite3.Connection):
+        with connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS hosts (id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL)")
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value REAL)")
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {LEVEL_RAW[0]} (host INTEGER, ts INTEGER, "
+                               f"{_metric_columns(False)}, PRIMARY KEY (host, ts)) WITHOUT ROWID")
+            for table, _, _ in (LEVEL_MINUTE, LEVEL_HOUR):
+                connection.execute(f"CREATE TABLE IF NOT EXISTS {table} (host INTEGER, ts INTEGER, "
+                                   f"{_metric_columns(True)}, PRIMARY KEY (host, ts)) WITHOUT ROWID")
+            # 旧版本创建的表缺少后来增加的指标（新列加在末尾，与 STORE_METRICS 的顺序一致）
+            for table, _, _ in (LEVEL_RAW, LEVEL_MINUTE, LEVEL_HOUR):
+                existing = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+                for column in _metric_columns(table != LEVEL_RAW[0]).split(", "):
+                    if column.split()[0] not in existing:
+                        connection.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+
+    # ---------- 写入 ----------
+
+    def add(self, host_key: str, stats):
+        """记录一次采样（SystemStats），没有的数值（如未探测GM端口）保存为NULL"""
+        row = (host_key, int(stats.timestamp), stats.cpu_usage, stats.mem_usage, stats.disk_usage,
+               stats.load[0], stats.net_rx_rate, stats.net_tx_rate, stats.gm_latency,
+               stats.tcp_established, stats.tcp_syn_recv)
+        with self._lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= STORE_BATCH_SIZE
+        if full:
+            self._wakeup.set()
+
+    def flush(self, timeout: float = 0) -> bool:
+        """
+        立即写入缓冲中的数据（在写入线程中执行）
+        timeout > 0 时等待写入提交（最长 timeout 秒），返回是否已写入
+        """
+        done = threading.Event()
+        if timeout > 0:
+            with self._lock:
+                self._flush_waiters.append(done)
+        self._wakeup.set()
+        return done.wait(timeout) if timeout > 0 else False
+
+    def close(self):
+        """停止写入线程（写入剩余的缓冲数据）"""
+        self._stop_event.set()
+        self._wakeup.set()
+        self._thread.join(timeout=10)
+
+    def _write_loop(self):
+        connection = self._connect()
+        host_ids = {}
+        try:
+            while True:
+                self._wakeup.wait(STORE_FLUSH_INTERVAL)
+                self._wakeup.clear()
+                stopping = self._stop_event.is_set()
+                with self._lock:
+                    rows, self._buffer = self._buffer, []
+                    waiters, self._flush_waiters = self._flush_waiters, []
+                try:
+                    if rows:
+                        self._insert(connection, host_ids, rows)
+                except sqlite3.Error as e:
+                    print(f"写入监控数据失败: {e}")
+                finally:
+                    for done in waiters:
+                        done.set()
+                try:
+                    self._rollup(connection)
+                    if time.time() - self._last_prune >= STORE_PRUNE_INTERVAL or stopping:
+                        self._prune(connection)
+                        self._last_prune = time.time()
+                except sqlite3.Error as e:
+                    print(f"写入监控数据失败: {e}")
+                if stopping:
+                    return
+        finally:
+            connection.close()
+
+    def _host_id(self, connection: sqlite3.Connection, host_ids: dict, host_key: str) -> int:
+        host_id = host_ids.get(host_key)
+        if host_id is None:
+            connection.execute("INSERT OR IGNORE INTO hosts (key) VALUES (?)", (host_key,))
+            host_id = connection.execute("SELECT id FROM hosts WHERE key = ?", (host_key,)).fetchone()[0]
+            host_ids[host_key] = host_id
+        return host_id
+
+    def _insert(self, connection: sqlite3.Connection, host_ids: dict, rows: list):
+        placeholders = ", ".join("?" * (len(STORE_METRICS) + 2))
+        with connection:
+            # 同一秒内的多次采样只保留最后一次
+            connection.executemany(
+                f"INSERT OR REPLACE INTO {LEVEL_RAW[0]} VALUES ({placeholders})",
+                [(self._host_id(connection, host_ids, row[0]),) + row[1:] for row in rows])
+
+    def _watermark(self, connection: sqlite3.Connection, name: str) -> Optional[float]:
+        row = connection.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _rollup(self, connection: sqlite3.Connection):
+        """把已结束的分钟汇总到分钟表、已结束的小时汇总到小时表（只处理上次汇总之后的时间段）"""
+        now = int(time.time())
+        for source, target in ((LEVEL_RAW, LEVEL_MINUTE), (LEVEL_MINUTE, LEVEL_HOUR)):
+            source_table, _, _ = source
+            target_table, span, _ = target
+            end = now // span * span
+            start = self._watermark(connection, target_table)
+            if start is None:
+                row = connection.execute(f"SELECT MIN(ts) FROM {source_table}").fetchone()
+                if row[0] is None:
+                    continue
+                start = row[0] // span * span
+            # 上一个区间再汇总一次，包含写入稍有延迟的采样（INSERT OR REPLACE，重复汇总结果相同）
+            start = int(start) - span
+            if start >= end:
+                continue
+            averages = []
+            for metric in STORE_METRICS:
+                peak = metric if source is LEVEL_RAW else f"{metric}_max"
+                averages.append(f"AVG({metric}), MAX({peak})")
+            with connection:
+                connection.execute(
+                    f"INSERT OR REPLACE INTO {target_table} SELECT host, ts / {span} * {span}, {', '.join(averages)} "
+                    f"FROM {source_table} WHERE ts >= ? AND ts < ? GROUP BY host, ts / {span}", (start, end))
+                connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (target_table, end))
+
+    def _prune(self, connection: sqlite3.Connection):
+        now = int(time.time())
+        with connection:
+            for table, _, retention in (LEVEL_RAW, LEVEL_MINUTE, LEVEL_HOUR):
+                connection.execute(f"DELETE FROM {table} WHERE ts < ?", (now - retention,))
+
+    # ---------- 查询 ----------
+
+    def hosts(self) -> List[str]:
+        """有数据的主机"""
+        connection = self._connect()
+        try:
+            return [row[0] for row in connection.execute("SELECT key FROM hosts ORDER BY key")]
+        finally:
+            connection.close()
+
+    @staticmethod
+    def choose_level(start: float, end: float, now: Optional[float] = None):
+        """选择精度：原始数据能覆盖且范围不超过6小时时用逐秒数据，7天以内用分钟汇总，否则用小时汇总"""
+        now = now if now is not None else time.time()
+        span = end - start
+        if span <= 6 * 3600 and start >= now - STORE_RAW_RETENTION:
+            return LEVEL_RAW
+        if span <= 7 * 86400 and start >= now - STORE_MINUTE_RETENTION:
+            return LEVEL_MINUTE
+        return LEVEL_HOUR
+
+    def query(self, host_key: str, metric: str, start: float, end: float,
+              points: Optional[int] = None) -> List[Tuple[float, float, float]]:
+        """
+        查询一段时间的数据 [(时间, 平均值, 最大值)]
+        points: 最多返回的点数（在SQL中按时间分桶，取每个桶的平均值和最大值）
+        """
+        if metric not in STORE_METRICS:
+            raise ValueError(f"未知指标: {metric}")
+        table, span, _ = self.choose_level(start, end)
+        peak = metric if table == LEVEL_RAW[0] else f"{metric}_max"
+        bucket = span
+        if points:
+            bucket = max(span, int((end - start) / points) or 1)
+        sql = (f"SELECT MIN(ts), AVG({metric}), MAX({peak}) FROM {table} "
+               f"WHERE host = (SELECT id FROM hosts WHERE key = ?) AND ts >= ? AND ts <= ? "
+               f"GROUP BY (ts - ?) / ? ORDER BY 1")
+        connection = self._connect()
+        try:
+            rows = connection.execute(sql, (host_key, int(start), int(end), int(start), bucket)).fetchall()
+        finally:
+            connection.close()
+        # 汇总数据的时间取区间中点
+        offset = span / 2 if span > 1 else 0
+        return [(ts + offset, average, maximum) for ts, average, maximum in rows if average is not None]
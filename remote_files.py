@@ -0,0 +1,1161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+远程文件操作辅助模块
+为文件浏览器提供后台目录读取、远程搜索、大文件分页读取等功能（不依赖Tk，可在工作线程中运行）
+"""
+
+import bisect
+import itertools
+import json
+import os
+import posixpath
+import queue
+import shlex
+import stat
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+
+# 每次推送给界面的目录项数量
+LISTING_CHUNK_SIZE = 200
+# SFTP目录读取时的预读请求数
+LISTING_READ_AHEADS = 50
+# ls 备用方法的超时时间（秒）
+LISTING_LS_TIMEOUT = 10
+
+# 目录缓存：有效期（秒）和内存上限（字节，按估算值计算）
+LISTING_CACHE_TTL = 30
+LISTING_CACHE_MAX_BYTES = 32 * 1024 * 1024
+# 估算内存时每个目录项的固定开销（字节）
+LISTING_ENTRY_OVERHEAD = 120
+# 预取：并发线程数、待预取队列长度
+PREFETCH_MAX_WORKERS = 2
+PREFETCH_MAX_PENDING = 16
+# 共享SFTP会话中保留的空闲通道数（前台读取 + 预取线程）
+SFTP_POOL_IDLE_MAX = PREFETCH_MAX_WORKERS + 1
+
+# 远程搜索：结果数量上限、每个文件最多返回的匹配行数
+SEARCH_MAX_RESULTS = 2000
+SEARCH_MAX_MATCHES_PER_FILE = 5
+
+# 大文件分页查看：每页字节数、缓存的页数（LRU）
+VIEWER_PAGE_SIZE = 64 * 1024
+VIEWER_MAX_PAGES = 64
+# 行号索引的间隔（每隔多少行记录一次字节偏移）
+LINE_INDEX_INTERVAL = 1000
+
+# 实时日志：开始时显示的最后行数、环形缓冲区保留的行数
+TAIL_INITIAL_LINES = 200
+TAIL_BUFFER_LINES = 5000
+
+# 磁盘占用分析：默认扫描深度、列出的大文件数量及最小大小（KB）
+DISK_USAGE_DEPTH = 3
+DISK_USAGE_TOP_FILES = 200
+DISK_USAGE_MIN_FILE_KB = 10 * 1024
+
+
+def iter_output_lines(stdout):
+    """
+    逐行读取远程命令的输出
+    paramiko 的文本模式按严格UTF-8解码，遇到GBK等非UTF-8字节会抛出异常；这里按字节读取，无法解码的字节替换为�
+    """
+    for raw_line in stdout.channel.makefile("rb"):
+        yield raw_line.decode("utf-8", errors="replace")
+
+
+def file_type_from_mode(mode: int) -> str:
+    """根据st_mode返回界面显示的文件类型"""
+    if stat.S_ISDIR(mode):
+        return "目录"
+    elif stat.S_ISLNK(mode):
+        return "链接"
+    return "文件"
+
+
+def mode_from_permissions(permissions: str) -> int:
+    """把ls输出的权限字符串（如 drwxr-xr-x）转换为st_mode"""
+    type_bits = {'d': stat.S_IFDIR, 'l': stat.S_IFLNK, '-': stat.S_IFREG}
+    mode = type_bits.get(permissions[:1], stat.S_IFREG)
+    bits = (stat.S_IRUSR, stat.S_IWUSR, stat.S_IXUSR,
+            stat.S_IRGRP, stat.S_IWGRP, stat.S_IXGRP,
+            stat.S_IROTH, stat.S_IWOTH, stat.S_IXOTH)
+    for char, bit in zip(permissions[1:10], bits):
+        if char not in ('-', 'S', 'T'):
+            mode |= bit
+    return mode
+
+
+def format_entry_row(entry: Tuple[str, int, int, float]) -> Tuple[str, str, str, str]:
+    """把目录项 (名称, st_mode, 大小, 修改时间) 转换为Treeview的列值"""
+    name, mode, size, mtime = entry
+    date = ""
+    if mtime:
+        try:
+            date = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M")
+        except (ValueError, OSError, OverflowError):
+            date = ""
+    return (file_type_from_mode(mode), stat.filemode(mode), str(size), date)
+
+
+def entry_from_attr(attr) -> Optional[Tuple[str, int, int, float]]:
+    """把SFTPAttributes转换为目录项 (名称, st_mode, 大小, 修改时间)，跳过 . 和 .."""
+    if attr.filename in ('.', '..'):
+        return None
+    return (attr.filename, attr.st_mode or 0, attr.st_size or 0, attr.st_mtime or 0)
+
+
+def parse_ls_line(line: str) -> Optional[Tuple[str, int, int, float]]:
+    """
+    解析一行 ls -la 输出
+    支持 --time-style=+%s（时间为时间戳）和默认格式，无法解析返回None
+    """
+    line = line.strip()
+    # 跳过空行和total行，只处理以d、-或l开头的行
+    if not line or line.startswith('total') or len(line) < 10 or line[0] not in ('d', '-', 'l'):
+        return None
+
+    mtime = 0.0
+    parts = line.split(None, 6)
+    if len(parts) == 7 and parts[5].isdigit():
+        # 时间戳格式: 权限 链接数 用户 组 大小 时间戳 名称
+        mtime = float(parts[5])
+        name = parts[6]
+    else:
+        parts = line.split(None, 8)
+        if len(parts) < 9:
+            raise ValueError(f"无法解析: {line[:50]}")
+        name = parts[8]
+
+    # 处理符号链接
+    if ' -> ' in name:
+        name = name.split(' -> ')[0].strip()
+    if name in ('.', '..'):
+        return None
+
+    size = int(parts[4]) if parts[4].isdigit() else 0
+    return (name, mode_from_permissions(parts[0]), size, mtime)
+
+
+class SharedSFTPSession:
+    """
+    共享SFTP会话
+    同一个SSH连接上复用SFTP通道（文件浏览、预取、自动同步等共用）。
+    paramiko 的 SFTPClient 不能被多个线程同时使用，因此每次使用时借出一个空闲通道（没有则新开），
+    用完放回；同一时间一个通道只被一个线程使用
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self._idle = []
+        self._borrowed = {}  # {借出的SFTP客户端: 借出时的代数}
+        self._generation = 0  # reset 后借出的旧通道放回时直接关闭
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _is_open(sftp) -> bool:
+        channel = sftp.get_channel()
+        return channel is not None and not channel.closed
+
+    @staticmethod
+    def _close(sftp):
+        try:
+            sftp.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """借出一个SFTP客户端（必要时新开通道），用完必须调用 release"""
+        with self._lock:
+            while self._idle:
+                sftp = self._idle.pop()
+                if self._is_open(sftp):
+                    self._borrowed[sftp] = self._generation
+                    return sftp
+            generation = self._generation
+        sftp = self.client.open_sftp()
+        with self._lock:
+            self._borrowed[sftp] = generation
+        return sftp
+
+    def release(self, sftp, broken: bool = False):
+        """放回通道；broken=True（通道异常）时关闭它"""
+        with self._lock:
+            generation = self._borrowed.pop(sftp, None)
+            if (not broken and generation == self._generation
+                    and len(self._idle) < SFTP_POOL_IDLE_MAX and self._is_open(sftp)):
+                self._idle.append(sftp)
+                return
+        self._close(sftp)
+
+    @contextmanager
+    def channel(self):
+        """借用一个SFTP客户端；出现非IO错误（通道异常）时关闭该通道，下次重新打开"""
+        sftp = self.acquire()
+        broken = False
+        try:
+            yield sftp
+        except (IOError, OSError):
+            raise
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.release(sftp, broken)
+
+    def reset(self):
+        """关闭所有通道（正在使用的通道在放回时关闭）"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._generation += 1
+        for sftp in idle:
+            self._close(sftp)
+
+    def close(self):
+        self.reset()
+
+
+class ListingCache:
+    """
+    目录列表缓存（LRU）
+    保存最近读取/预取的目录内容，超过有效期视为失效，总内存超过上限时淘汰最久未使用的目录
+    """
+
+    def __init__(self, max_bytes: int = LISTING_CACHE_MAX_BYTES, ttl: float = LISTING_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # path -> (时间, 目录项列表, 估算字节数)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def estimate_bytes(entries) -> int:
+        return sum(len(entry[0]) * 2 + LISTING_ENTRY_OVERHEAD for entry in entries)
+
+    def get(self, path: str):
+        """返回未过期的目录项列表，没有则返回None"""
+        with self._lock:
+            item = self._entries.get(path)
+            if item is None:
+                return None
+            if time.time() - item[0] > self.ttl:
+                self._remove(path)
+                return None
+            self._entries.move_to_end(path)
+            return item[1]
+
+    def contains(self, path: str) -> bool:
+        return self.get(path) is not None
+
+    def put(self, path: str, entries):
+        size = self.estimate_bytes(entries)
+        with self._lock:
+            self._remove(path)
+            # 单个目录超过上限的1/4时不缓存，避免挤掉其他目录
+            if size > self.max_bytes // 4:
+                return
+            self._entries[path] = (time.time(), list(entries), size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, path: str):
+        with self._lock:
+            self._remove(path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, path: str):
+        item = self._entries.pop(path, None)
+        if item is not None:
+            self._bytes -= item[2]
+
+
+class DirectoryPrefetcher:
+    """
+    目录预取器
+    在后台通过共享SFTP会话读取"下一步最可能打开"的目录，结果写入 ListingCache，
+    用户双击进入时直接从缓存显示。并发数由工作线程数限制，内存由缓存上限限制。
+    """
+
+    def __init__(self, session: SharedSFTPSession, cache: ListingCache,
+                 max_workers: int = PREFETCH_MAX_WORKERS, max_pending: int = PREFETCH_MAX_PENDING):
+        self.session = session
+        self.cache = cache
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._in_flight = set()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._workers = []
+
+    def schedule(self, paths):
+        """
+        设置新的预取候选（按可能性从高到低排列）
+        旧的未开始的候选会被丢弃，已缓存或正在读取的目录会跳过
+        """
+        with self._condition:
+            if self._stopped:
+                return
+            self._pending.clear()
+            for path in paths:
+                if len(self._pending) >= self.max_pending:
+                    break
+                if path in self._in_flight or path in self._pending or self.cache.contains(path):
+                    continue
+                self._pending.append(path)
+            # 按需启动工作线程（不超过并发上限）
+            while len(self._workers) < min(self.max_workers, len(self._pending)):
+                worker = threading.Thread(target=self._work, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify_all()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._pending.clear()
+            self._condition.notify_all()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                path = self._pending.popleft()
+                self._in_flight.add(path)
+            try:
+                with self.session.channel() as sftp:
+                    attrs = sftp.listdir_attr(path)
+                entries = [entry for entry in map(entry_from_attr, attrs) if entry is not None]
+                if not self._stopped:
+                    self.cache.put(path, entries)
+            except Exception:
+                # 目录不存在、无权限或通道异常（异常的通道已关闭），忽略
+                pass
+            finally:
+                with self._condition:
+                    self._in_flight.discard(path)
+
+
+class DirectoryListingJob:
+    """
+    后台目录读取任务
+    在工作线程中读取远程目录，按块把结果放入 results 队列，界面线程定时取出显示。
+    队列消息格式:
+        ("chunk", [目录项, ...])           目录项为 (名称, st_mode, 大小, 修改时间)
+        ("done", {"count": n, "parse_errors": m})
+        ("error", 错误信息)               目录不存在/无权限等可预期错误
+        ("exception", (错误信息, 详细信息)) 未预期的异常
+    """
+
+    def __init__(self, client, path: str, chunk_size: int = LISTING_CHUNK_SIZE,
+                 session=None, cache=None):
+        self.client = client
+        self.path = path
+        self.chunk_size = chunk_size
+        # 共享SFTP会话（为None时单独打开一个SFTP通道）和目录缓存（读取完成后写入）
+        self.session = session
+        self.cache = cache
+        self.results = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def start(self):
+        """启动后台读取线程"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """取消读取（用户切换目录或关闭窗口时调用）"""
+        self._cancel_event.set()
+
+    def _run(self):
+        try:
+            try:
+                if self._list_with_sftp():
+                    return
+            except Exception:
+                # SFTP失败，回退到ls命令
+                if self.cancelled:
+                    return
+            self._list_with_ls()
+        except Exception as e:
+            if not self.cancelled:
+                import traceback
+                self.results.put(("exception", (str(e), traceback.format_exc())))
+
+    def _flush(self, chunk: List) -> List:
+        if chunk and not self.cancelled:
+            self.results.put(("chunk", chunk))
+        return []
+
+    def _list_with_sftp(self) -> bool:
+        """
+        使用SFTP逐批读取目录（listdir_iter 边读边返回，不等待整个目录）
+        返回True表示已完成（或已取消）；已推送过数据后出错则直接报告错误，避免与ls结果重复
+        """
+        sftp = self.session.acquire() if self.session else self.client.open_sftp()
+        broken = False
+        entries = []
+        chunk = []
+        try:
+            try:
+                for attr in sftp.listdir_iter(self.path, read_aheads=LISTING_READ_AHEADS):
+                    if self.cancelled:
+                        return True
+                    entry = entry_from_attr(attr)
+                    if entry is None:
+                        continue
+                    entries.append(entry)
+                    chunk.append(entry)
+                    if len(chunk) >= self.chunk_size:
+                        chunk = self._flush(chunk)
+            except Exception as e:
+                # 通道异常时不再放回共享会话
+                broken = not isinstance(e, (IOError, OSError))
+                if not entries:
+                    raise
+                self.results.put(("error", f"读取目录中断: {e}"))
+                return True
+        finally:
+            if self.session:
+                self.session.release(sftp, broken)
+            else:
+                try:
+                    sftp.close()
+                except Exception:
+                    pass
+
+        self._flush(chunk)
+        if not self.cancelled:
+            if self.cache is not None:
+                self.cache.put(self.path, entries)
+            self.results.put(("done", {"count": len(entries), "parse_errors": 0}))
+        return True
+
+    def _list_with_ls(self):
+        """使用ls命令作为备用方法（按行读取，不再固定等待）"""
+        quoted = shlex.quote(self.path)
+        cmd = f"ls -la --time-style=+%s {quoted} 2>/dev/null || ls -la {quoted}"
+        stdin, stdout, stderr = self.client.exec_command(cmd, timeout=LISTING_LS_TIMEOUT)
+        channel = stdout.channel
+
+        entries = []
+        parse_errors = 0
+        chunk = []
+        try:
+            for line in iter_output_lines(stdout):
+                if self.cancelled:
+                    return
+                try:
+                    entry = parse_ls_line(line)
+                except ValueError:
+                    parse_errors += 1
+                    continue
+                if entry is None:
+                    continue
+                entries.append(entry)
+                chunk.append(entry)
+                if len(chunk) >= self.chunk_size:
+                    chunk = self._flush(chunk)
+
+            error = stderr.read().decode('utf-8', errors='ignore')
+        finally:
+            if self.cancelled:
+                try:
+                    channel.close()
+                except Exception:
+                    pass
+
+        self._flush(chunk)
+        if self.cancelled:
+            return
+
+        # 检查错误
+        if not entries and error and ("No such file" in error or "cannot access" in error or "Permission denied" in error):
+            self.results.put(("error", error.strip()))
+            return
+        if self.cache is not None and not parse_errors:
+            self.cache.put(self.path, entries)
+        self.results.put(("done", {"count": len(entries), "parse_errors": parse_errors}))
+
+
+class DirectoryModel:
+    """
+    目录内容模型
+    目录项按列保存在紧凑数组中（名称、类型、权限、大小、修改时间），
+    order 保存显示顺序（显示行号 -> 数组下标），排序只重排 order，不触碰界面。
+    """
+
+    KIND_DIR = 0
+    KIND_LINK = 1
+    KIND_FILE = 2
+
+    # 支持的排序键
+    SORT_KEYS = ("name", "size", "mtime", "kind")
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.names = []
+        self.kinds = bytearray()
+        self.modes = array('L')
+        self.sizes = array('q')
+        self.mtimes = array('d')
+        self.order = array('L')
+        # 名称的小写形式在第一次按名称排序时才计算
+        self._name_keys = None
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def extend(self, entries):
+        """追加目录项 (名称, st_mode, 大小, 修改时间)，新项显示在末尾"""
+        base = len(self.names)
+        for name, mode, size, mtime in entries:
+            self.names.append(name)
+            if stat.S_ISDIR(mode):
+                self.kinds.append(self.KIND_DIR)
+            elif stat.S_ISLNK(mode):
+                self.kinds.append(self.KIND_LINK)
+            else:
+                self.kinds.append(self.KIND_FILE)
+            self.modes.append(mode & 0xFFFFFFFF)
+            self.sizes.append(size)
+            self.mtimes.append(mtime or 0.0)
+        self.order.extend(range(base, len(self.names)))
+        self._name_keys = None
+
+    def index_at(self, row: int) -> int:
+        """显示行号 -> 数组下标"""
+        return self.order[row]
+
+    def entry(self, row: int) -> Tuple[str, int, int, float]:
+        """返回显示行对应的目录项 (名称, st_mode, 大小, 修改时间)"""
+        i = self.order[row]
+        return (self.names[i], self.modes[i], self.sizes[i], self.mtimes[i])
+
+    def name_at(self, row: int) -> str:
+        return self.names[self.order[row]]
+
+    def is_dir_at(self, row: int) -> bool:
+        return self.kinds[self.order[row]] == self.KIND_DIR
+
+    def row_values(self, row: int) -> Tuple[str, str, str, str]:
+        """返回显示行对应的Treeview列值"""
+        return format_entry_row(self.entry(row))
+
+    def find(self, name: str) -> int:
+        """按名称查找显示行号，找不到返回-1"""
+        for row, i in enumerate(self.order):
+            if self.names[i] == name:
+                return row
+        return -1
+
+    def sort(self, key: str, reverse: bool = False):
+        """
+        按指定键排序（name/size/mtime/kind）
+        大小、时间、类型直接使用数组中的数值作为排序键，名称使用预先计算的小写形式
+        """
+        if key == "name":
+            if self._name_keys is None:
+                # 空名称排在最后（与原界面行为一致）
+                self._name_keys = [(not n.strip(), n.lower()) for n in self.names]
+            sort_key = self._name_keys.__getitem__
+        elif key == "size":
+            sort_key = self.sizes.__getitem__
+        elif key == "mtime":
+            sort_key = self.mtimes.__getitem__
+        elif key == "kind":
+            sort_key = self.kinds.__getitem__
+        else:
+            raise ValueError(f"不支持的排序列: {key}")
+        self.order = array('L', sorted(range(len(self.names)), key=sort_key, reverse=reverse))
+
+
+def build_search_command(root: str, name_pattern: str = "", content: str = "",
+                         max_depth: int = 5, max_size_kb: int = 0, ignore_case: bool = False) -> str:
+    """
+    构建远程搜索命令
+    只按文件名搜索时使用 find；指定内容时 find 找出候选文件再交给 grep（-I 跳过二进制文件）。
+    max_size_kb 大于0时跳过超过该大小的文件。
+    """
+    find_parts = ["find", shlex.quote(root), "-maxdepth", str(int(max_depth))]
+    if content:
+        find_parts += ["-type", "f"]
+    if name_pattern:
+        find_parts += ["-iname" if ignore_case else "-name", shlex.quote(name_pattern)]
+    if max_size_kb > 0:
+        find_parts += ["-size", f"-{int(max_size_kb) + 1}k"]
+
+    if not content:
+        return " ".join(find_parts + ["2>/dev/null"])
+
+    grep_flags = "-I -n -H -F -m {}".format(SEARCH_MAX_MATCHES_PER_FILE)
+    if ignore_case:
+        grep_flags += " -i"
+    return " ".join(find_parts + ["-print0", "2>/dev/null", "|",
+                                  "xargs", "-0", "grep", grep_flags, "--", shlex.quote(content), "2>/dev/null"])
+
+
+def parse_search_line(line: str, with_content: bool):
+    """解析搜索输出的一行，返回 (路径, 行号, 匹配内容)"""
+    line = line.rstrip("\r\n")
+    if not line:
+        return None
+    if not with_content:
+        return (line, "", "")
+    parts = line.split(":", 2)
+    if len(parts) < 3 or not parts[1].isdigit():
+        return (line, "", "")
+    return (parts[0], parts[1], parts[2].strip())
+
+
+class RemoteSearchJob:
+    """
+    远程搜索任务
+    在一个exec通道上运行 find/grep，按行读取输出，匹配结果边到达边放入 results 队列。
+    队列消息格式:
+        ("match", (路径, 行号, 匹配内容))
+        ("done", {"count": n, "truncated": 是否达到数量上限})
+        ("error", 错误信息)
+    """
+
+    def __init__(self, client, command: str, with_content: bool, max_results: int = SEARCH_MAX_RESULTS):
+        self.client = client
+        self.command = command
+        self.with_content = with_content
+        self.max_results = max_results
+        self.results = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._channel = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def cancel(self):
+        """取消搜索（关闭通道，远程命令随之结束）"""
+        self._cancel_event.set()
+        channel = self._channel
+        if channel is not None:
+            try:
+                channel.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        count = 0
+        truncated = False
+        try:
+            stdin, stdout, stderr = self.client.exec_command(self.command, get_pty=False)
+            self._channel = stdout.channel
+            if self.cancelled:
+                self._channel.close()
+                return
+            for raw_line in iter_output_lines(stdout):
+                if self.cancelled:
+                    return
+                match = parse_search_line(raw_line, self.with_content)
+                if match is None:
+                    continue
+                self.results.put(("match", match))
+                count += 1
+                if count >= self.max_results:
+                    truncated = True
+                    self._channel.close()
+                    break
+        except Exception as e:
+            if not self.cancelled:
+                self.results.put(("error", str(e)))
+            return
+        if not self.cancelled:
+            self.results.put(("done", {"count": count, "truncated": truncated}))
+
+
+class PagedRemoteFile:
+    """
+    按页读取远程文件（LRU缓存页），用于只读查看大文件
+    所有读取都是阻塞的，应在工作线程中调用
+    """
+
+    def __init__(self, client, path: str, size: int, page_size: int = VIEWER_PAGE_SIZE,
+                 max_pages: int = VIEWER_MAX_PAGES):
+        self.client = client
+        self.path = path
+        self.size = size
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self._sftp = None
+        self._file = None
+
+    @property
+    def page_count(self) -> int:
+        return (self.size + self.page_size - 1) // self.page_size
+
+    def _open(self):
+        if self._file is None:
+            # 使用独立的SFTP通道，不影响文件浏览器的目录读取
+            self._sftp = self.client.open_sftp()
+            self._file = self._sftp.open(self.path, "rb")
+        return self._file
+
+    def page(self, index: int) -> bytes:
+        with self._lock:
+            data = self._pages.get(index)
+            if data is not None:
+                self._pages.move_to_end(index)
+                return data
+            remote_file = self._open()
+            remote_file.seek(index * self.page_size)
+            data = remote_file.read(self.page_size)
+            self._pages[index] = data
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+            return data
+
+    def read_range(self, start: int, length: int) -> bytes:
+        """读取 [start, start+length) 范围的字节（由缓存页拼接）"""
+        start = max(0, min(start, self.size))
+        end = min(self.size, start + length)
+        if start >= end:
+            return b""
+        first, last = start // self.page_size, (end - 1) // self.page_size
+        data = b"".join(self.page(index) for index in range(first, last + 1))
+        offset = first * self.page_size
+        return data[start - offset:end - offset]
+
+    def find_line_offset(self, line: int, index: "LineIndex") -> Optional[int]:
+        """
+        行号（从1开始）对应的字节偏移：从索引中最近的前一个记录点开始向后数换行符，
+        最多读取 LINE_INDEX_INTERVAL 行的数据；超出文件或索引尚未覆盖时返回 None
+        """
+        known = index.lookup(line)
+        if known is None:
+            return None
+        known_line, offset = known
+        remaining = line - known_line
+        while remaining > 0:
+            if offset >= self.size:
+                return None
+            page_index = offset // self.page_size
+            data = self.page(page_index)
+            position = offset - page_index * self.page_size
+            while remaining > 0:
+                newline = data.find(b"\n", position)
+                if newline < 0:
+                    break
+                position = newline + 1
+                remaining -= 1
+            offset = page_index * self.page_size + position if remaining == 0 else (page_index + 1) * self.page_size
+        return offset if offset < self.size or line == 1 else None
+
+    def close(self):
+        with self._lock:
+            for resource in (self._file, self._sftp):
+                if resource is not None:
+                    try:
+                        resource.close()
+                    except Exception:
+                        pass
+            self._file = self._sftp = None
+            self._pages.clear()
+
+
+class LineIndex:
+    """稀疏行号索引：每隔 LINE_INDEX_INTERVAL 行记录一次（行号, 字节偏移）"""
+
+    def __init__(self):
+        self.lines = array("q", [1])
+        self.offsets = array("q", [0])
+        self.total_lines = None  # 索引完成后为文件总行数
+        self._lock = threading.Lock()
+
+    def add(self, line: int, offset: int):
+        with self._lock:
+            if line > self.lines[-1]:
+                self.lines.append(line)
+                self.offsets.append(offset)
+
+    @property
+    def indexed_lines(self) -> int:
+        return self.total_lines if self.total_lines is not None else self.lines[-1]
+
+    def lookup(self, line: int) -> Optional[Tuple[int, int]]:
+        """不超过 line 的最近记录点；索引还未覆盖到该行附近时返回 None"""
+        with self._lock:
+            if line < 1 or (self.total_lines is not None and line > self.total_lines):
+                return None
+            position = bisect.bisect_right(self.lines, line) - 1
+            if self.total_lines is None and position == len(self.lines) - 1 and \
+                    line - self.lines[position] >= LINE_INDEX_INTERVAL:
+                return None
+            return self.lines[position], self.offsets[position]
+
+    def line_at(self, offset: int) -> Tuple[int, int]:
+        """不超过 offset 的最近记录点 (行号, 偏移)"""
+        with self._lock:
+            position = bisect.bisect_right(self.offsets, offset) - 1
+            return self.lines[position], self.offsets[position]
+
+
+class LineIndexJob:
+    """
+    在远程用 awk 一次扫描文件，生成稀疏行号索引（LC_ALL=C 下 length 按字节计算）
+    队列消息格式:
+        ("progress", 已索引行数)
+        ("done", 总行数)
+        ("error", 错误信息)
+    """
+
+    def __init__(self, client, path: str, index: LineIndex, interval: int = LINE_INDEX_INTERVAL):
+        self.client = client
+        self.path = path
+        self.index = index
+        self.interval = interval
+        self.results = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._channel = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def cancel(self):
+        self._cancel_event.set()
+        channel = self._channel
+        if channel is not None:
+            try:
+                channel.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        script = (f"{{ if ((NR - 1) % {self.interval} == 0 && NR > 1) print NR, off; off += length($0) + 1 }} "
+                  f"END {{ print \"END\", NR }}")
+        command = f"LC_ALL=C awk {shlex.quote(script)} {shlex.quote(self.path)}"
+        total = None
+        try:
+            stdin, stdout, stderr = self.client.exec_command(command)
+            self._channel = stdout.channel
+            reported = time.time()
+            for raw_line in iter_output_lines(stdout):
+                if self.cancelled:
+                    return
+                fields = raw_line.split()
+                if len(fields) != 2:
+                    continue
+                if fields[0] == "END":
+                    total = int(fields[1])
+                    continue
+                self.index.add(int(fields[0]), int(fields[1]))
+                if time.time() - reported >= 0.5:
+                    reported = time.time()
+                    self.results.put(("progress", self.index.indexed_lines))
+        except Exception as e:
+            if not self.cancelled:
+                self.results.put(("error", str(e)))
+            return
+        if self.cancelled:
+            return
+        if total is None:
+            error = stderr.read().decode("utf-8", errors="ignore").strip()
+            self.results.put(("error", error or "生成行号索引失败"))
+            return
+        self.index.total_lines = total
+        self.results.put(("done", total))
+
+
+def build_tail_command(path: str, pattern: str = "", regex: bool = False, ignore_case: bool = False,
+                       initial_lines: int = TAIL_INITIAL_LINES) -> str:
+    """构造实时日志命令：tail -F 跟随文件（日志轮转后自动重新打开），过滤在服务器端完成"""
+    command = f"tail -n {int(initial_lines)} -F {shlex.quote(path)} 2>&1"
+    if pattern:
+        flags = "-E" if regex else "-F"
+        if ignore_case:
+            flags += " -i"
+        command += f" | grep --line-buffered {flags} -e {shlex.quote(pattern)}"
+    return command
+
+
+class TailJob:
+    """
+    实时日志任务
+    在独立的exec通道上运行 tail -F（可带 grep 过滤），收到的行放入有界环形缓冲区；
+    界面按自己的节奏用 read_new 取新行，来不及显示的旧行被丢弃而不会占满内存
+    """
+
+    def __init__(self, client, command: str, max_lines: int = TAIL_BUFFER_LINES):
+        self.client = client
+        self.command = command
+        self.lines = deque(maxlen=max_lines)
+        self.received = 0  # 累计收到的行数
+        self.status = "running"  # running/stopped/error
+        self.error = None
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._channel = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def cancel(self):
+        """停止（关闭通道；使用伪终端，远程 tail 随会话挂断一起结束）"""
+        self._cancel_event.set()
+        channel = self._channel
+        if channel is not None:
+            try:
+                channel.close()
+            except Exception:
+                pass
+
+    def read_new(self, since: int):
+        """返回 (序号 since 之后的新行, 新的序号, 因缓冲区已满而丢弃的行数)"""
+        with self._lock:
+            available = self.received - since
+            count = min(available, len(self.lines))
+            lines = list(itertools.islice(self.lines, len(self.lines) - count, None)) if count else []
+            return lines, self.received, available - count
+
+    def _run(self):
+        try:
+            stdin, stdout, stderr = self.client.exec_command(self.command, get_pty=True)
+            self._channel = stdout.channel
+            if self.cancelled:
+                self._channel.close()
+                return
+            for raw_line in iter_output_lines(stdout):
+                if self.cancelled:
+                    break
+                line = raw_line.rstrip("\r\n")
+                with self._lock:
+                    self.lines.append(line)
+                    self.received += 1
+        except Exception as e:
+            if not self.cancelled:
+                self.error = str(e)
+                self.status = "error"
+                return
+        self.status = "stopped"
+
+
+def build_disk_usage_command(root: str, max_depth: int = DISK_USAGE_DEPTH,
+                             top_files: int = DISK_USAGE_TOP_FILES, min_file_kb: int = DISK_USAGE_MIN_FILE_KB) -> str:
+    """
+    磁盘占用扫描命令：du 统计各级目录（不跨文件系统，限制深度），
+    之后输出分隔行和子树中最大的文件；目录按 du 完成的顺序逐行输出
+    """
+    quoted = shlex.quote(root)
+    return (f"du -x -k --max-depth={int(max_depth)} {quoted} 2>/dev/null; echo '__FILES__'; "
+            f"find {quoted} -xdev -type f -size +{int(min_file_kb)}k -printf '%k\\t%p\\n' 2>/dev/null "
+            f"| sort -rn | head -n {int(top_files)}")
+
+
+class DiskUsageTree:
+    """
+    磁盘占用结果：{目录路径: KB} 及最大文件列表
+    子目录按大小从大到小排列；可以用新的扫描结果替换某个子树，并修正上级目录的大小
+    """
+
+    def __init__(self, root: str, max_depth: int = DISK_USAGE_DEPTH):
+        self.root = root.rstrip("/") or "/"
+        self.max_depth = max_depth
+        self.sizes = {}
+        self.files = []  # [(KB, 路径)]，从大到小
+        self.scanned_at = None
+        self._children = None
+
+    def add_dir(self, path: str, size_kb: int):
+        self.sizes[path.rstrip("/") or "/"] = size_kb
+        self._children = None
+
+    def add_file(self, path: str, size_kb: int):
+        self.files.append((size_kb, path))
+
+    def _in_subtree(self, path: str, root: str) -> bool:
+        return path == root or path.startswith(root.rstrip("/") + "/")
+
+    def children(self, path: str) -> List[Tuple[str, int]]:
+        """直接子目录 [(路径, KB)]，从大到小"""
+        if self._children is None:
+            children = {}
+            for child, size_kb in self.sizes.items():
+                if child == self.root:
+                    continue
+                children.setdefault(posixpath.dirname(child), []).append((child, size_kb))
+            for entries in children.values():
+                entries.sort(key=lambda entry: entry[1], reverse=True)
+            self._children = children
+        return self._children.get(path, [])
+
+    def depth_of(self, path: str) -> int:
+        if path == self.root:
+            return 0
+        relative = path[len(self.root):].strip("/")
+        return relative.count("/") + 1
+
+    def replace_subtree(self, subtree: "DiskUsageTree"):
+        """用对某个子目录重新扫描的结果替换原有数据，上级目录大小按差值修正"""
+        root = subtree.root
+        old_size = self.sizes.get(root, 0)
+        for path in [path for path in self.sizes if self._in_subtree(path, root)]:
+            del self.sizes[path]
+        self.sizes.update(subtree.sizes)
+        delta = subtree.sizes.get(root, 0) - old_size
+        parent = root
+        while delta and parent != self.root and self._in_subtree(parent, self.root):
+            parent = posixpath.dirname(parent)
+            if parent in self.sizes:
+                self.sizes[parent] += delta
+        self.files = [entry for entry in self.files if not self._in_subtree(entry[1], root)] + subtree.files
+        self.files.sort(reverse=True)
+        self._children = None
+
+    def to_dict(self) -> dict:
+        return {"root": self.root, "depth": self.max_depth, "time": self.scanned_at,
+                "dirs": [[path, size_kb] for path, size_kb in self.sizes.items()],
+                "files": [[size_kb, path] for size_kb, path in self.files]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DiskUsageTree":
+        tree = cls(data["root"], data.get("depth", DISK_USAGE_DEPTH))
+        tree.scanned_at = data.get("time")
+        for path, size_kb in data.get("dirs", []):
+            tree.add_dir(path, size_kb)
+        tree.files = [(size_kb, path) for size_kb, path in data.get("files", [])]
+        return tree
+
+
+class DiskUsageCache:
+    """
+    磁盘占用结果缓存（保存在程序目录的JSON文件中）
+    按 主机 -> 扫描目录 保存最近一次的结果和扫描时间，再次打开时先显示缓存
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hosts = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.hosts = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, host: str, root: str) -> Optional[DiskUsageTree]:
+        data = self.hosts.get(host, {}).get(root)
+        if not data:
+            return None
+        try:
+            return DiskUsageTree.from_dict(data)
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def put(self, host: str, tree: DiskUsageTree):
+        self.hosts.setdefault(host, {})[tree.root] = tree.to_dict()
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.hosts, f, ensure_ascii=False)
+        except OSError:
+            pass
+
+
+class DiskUsageJob:
+    """
+    磁盘占用扫描任务（一条远程命令，结果逐行读取）
+    队列消息格式:
+        ("progress", 已统计的目录数)
+        ("done", DiskUsageTree)
+        ("error", 错误信息)
+    """
+
+    def __init__(self, client, root: str, max_depth: int = DISK_USAGE_DEPTH):
+        self.client = client
+        self.tree = DiskUsageTree(root, max_depth)
+        self.results = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._channel = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def cancel(self):
+        self._cancel_event.set()
+        channel = self._channel
+        if channel is not None:
+            try:
+                channel.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        tree = self.tree
+        command = build_disk_usage_command(tree.root, tree.max_depth)
+        in_files = False
+        count = 0
+        try:
+            stdin, stdout, stderr = self.client.exec_command(command)
+            self._channel = stdout.channel
+            reported = time.time()
+            for raw_line in iter_output_lines(stdout):
+                if self.cancelled:
+                    return
+                line = raw_line.rstrip("\n")
+                if line == "__FILES__":
+                    in_files = True
+                    continue
+                size_text, _, path = line.partition("\t")
+                if not path or not size_text.isdigit():
+                    continue
+                if in_files:
+                    tree.add_file(path, int(size_text))
+                else:
+                    tree.add_dir(path, int(size_text))
+                    count += 1
+                    if time.time() - reported >= 0.3:
+                        reported = time.time()
+                        self.results.put(("progress", count))
+        except Exception as e:
+            if not self.cancelled:
+                self.results.put(("error", str(e)))
+            return
+        if self.cancelled:
+            return
+        if tree.root not in tree.sizes:
+            self.results.put(("error", f"无法统计目录: {tree.root}（目录不存在或没有权限）"))
+            return
+        tree.scanned_at = time.time()
+        self.results.put(("done", tree))
@@ -0,0 +1,772 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务器状态采集
+一条远程命令输出CPU、内存、磁盘、负载、网络（含各网卡和各监听端口的TCP连接数）和运行时间（每行“标记 数值...”的紧凑格式），
+本地一次遍历解析，每次刷新只需一次往返；
+持续监控时在一个长期运行的远程循环中按间隔输出，每帧以结束标记分隔，不再每次采样启动新命令；
+CPU使用率和网络速率由相邻两次采样的差值计算，历史数据保存在固定大小的环形数组中；
+设置了GM端口时在同一个采集命令中探测该端口（连接延迟记入历史）；
+需要进程列表时在同一个采集命令中附加各进程的 /proc/[pid]/stat 计数，按差值计算每个进程的CPU使用率；
+多主机监控由有限数量的采集线程轮流采集所有主机，SSH连接放在连接池中复用
+"""
+
+import heapq
+import math
+import queue
+import threading
+import time
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple
+
+from remote_files import iter_output_lines
+
+try:
+    import paramiko
+    HAS_PARAMIKO = True
+except ImportError:
+    HAS_PARAMIKO = False
+
+
+# 采集命令的超时时间（秒）
+COLLECT_TIMEOUT = 5
+
+# 采集命令：每行以标记开头
+#   cpu   /proc/stat 第一行的累计计数（user nice system idle iowait irq softirq steal ...）
+#   mem   /proc/meminfo 的名称和值（KB）
+#   load  /proc/loadavg（1/5/15分钟负载、运行/总进程数）
+#   up    运行时间（秒）
+#   net   除 lo 以外所有网卡的累计接收、发送字节数
+#   if    各网卡（不含 lo 和容器的虚拟网卡）的名称、累计接收、发送字节数
+#   tcp   TCP连接数：已建立、半连接(SYN_RECV)
+#   tport 每个监听端口的端口号和已建立的连接数（/proc/net/tcp 和 tcp6，地址中的端口为十六进制）
+#   disk  根分区的总大小、已用、可用（KB）
+COLLECTOR_COMMAND = (
+    "export LC_ALL=C; "
+    "head -n 1 /proc/stat; "
+    "awk '/^(MemTotal|MemFree|MemAvailable|Buffers|Cached):/ {print \"mem\", $1, $2}' /proc/meminfo; "
+    "echo load $(cat /proc/loadavg); "
+    "echo up $(cut -d' ' -f1 /proc/uptime); "
+    "awk 'NR > 2 {sub(\":\", \" \"); if ($1 != \"lo\") {rx += $2; tx += $10; "
+    "if ($1 !~ /^(veth|docker|br-|virbr|ifb)/) print \"if\", $1, $2, $10}} END {print \"net\", rx + 0, tx + 0}' /proc/net/dev; "
+    "awk 'function h(s, i, n) {n = 0; for (i = 1; i <= length(s); i++) n = n * 16 + index(\"0123456789ABCDEF\", substr(s, i, 1)) - 1; return n} "
+    "FNR > 1 {split($2, a, \":\"); p = h(a[2]); if ($4 == \"0A\") listen[p] = 1; else if ($4 == \"01\") {est++; c[p]++} else if ($4 == \"03\") syn++} "
+    "END {print \"tcp\", est + 0, syn + 0; for (p in listen) print \"tport\", p, c[p] + 0}' /proc/net/tcp /proc/net/tcp6 2>/dev/null; "
+    "df -P -k / 2>/dev/null | awk 'NR == 2 {print \"disk\", $2, $3, $4}'"
+)
+
+# 进程采集（附加在采集命令之后）：
+#   ncpu      CPU核数
+#   pagesize  内存页大小（字节）
+#   proc      进程号 状态 累计CPU时间(user+system, 时钟周期) 常驻内存(页) 启动时间 名称（空格替换为_）
+#   cmd       java进程的命令行（截断到 PROCESS_CMDLINE_MAX 个字符）
+PROCESS_CMDLINE_MAX = 512
+PROCESS_COMMAND = (
+    "echo ncpu $(grep -c '^cpu[0-9]' /proc/stat); "
+    "echo pagesize $(getconf PAGESIZE 2>/dev/null || echo 4096); "
+    # 名称可能包含空格和括号，取最后一个 ')' 之后的字段；
+    # 用 cat 读取：采集期间退出的进程读不到时 cat 跳过继续，mawk 会直接停止
+    "cat /proc/[0-9]*/stat 2>/dev/null | awk '{l = $0; o = index(l, \"(\"); r = o; "
+    "for (i = length(l); i > o; i--) if (substr(l, i, 1) == \")\") {r = i; break}; "
+    "c = substr(l, o + 1, r - o - 1); gsub(/[ \\t]/, \"_\", c); split(substr(l, r + 2), f, \" \"); "
+    "print \"proc\", $1, f[1], f[12] + f[13], f[22], f[20], c}'; "
+    "for d in /proc/[0-9]*; do { read -r c < $d/comm; } 2>/dev/null && [ \"$c\" = java ] && "
+    f"echo \"cmd ${{d#/proc/}} $(tr '\\0' ' ' < $d/cmdline 2>/dev/null | cut -c1-{PROCESS_CMDLINE_MAX})\"; done"
+)
+# 进程列表显示的进程数
+PROCESS_TOP_N = 30
+
+# GM端口探测的连接超时（秒）；探测失败时命令的退出码
+PORT_PROBE_TIMEOUT = 2
+PORT_PROBE_FAILED = 1
+
+# 持续采集：每帧的结束标记、采样间隔（秒）的默认值和下限
+STREAM_FRAME_END = "@end"
+STREAM_INTERVAL = 2.0
+STREAM_MIN_INTERVAL = 0.5
+# 采集流中断后重新启动的间隔（秒）
+STREAM_RETRY_INTERVAL = 5.0
+
+# 历史数据：逐个采样保存的条数（最小间隔下约1小时），以及按分钟汇总保存的条数（24小时）
+HISTORY_SAMPLES = 7200
+HISTORY_MINUTES = 1440
+# 历史记录的指标；另外按名称记录各网卡（net_rx:网卡、net_tx:网卡）和各监听端口（tcp:端口）的数值，
+# 这类指标出现时才创建，总数不超过 HISTORY_MAX_SERIES
+HISTORY_METRICS = ("cpu", "mem", "disk", "load", "net_rx", "net_tx", "gm_latency", "tcp_est", "tcp_syn_recv")
+HISTORY_MAX_SERIES = 64
+
+# 多主机监控：采集线程数、采集间隔（秒）、连接超时（秒）、无法连接时的最长重试间隔（秒）
+DASHBOARD_WORKERS = 8
+DASHBOARD_INTERVAL = 5.0
+DASHBOARD_CONNECT_TIMEOUT = 10
+DASHBOARD_MAX_BACKOFF = 300.0
+
+
+class SystemStats:
+    """一次采集的结果（内存、磁盘单位为KB，网络为累计字节数）"""
+
+    def __init__(self):
+        self.timestamp = time.time()
+        self.cpu_total = 0
+        self.cpu_idle = 0
+        self.cpu_usage = 0.0
+        self.mem_total = 0
+        self.mem_available = 0
+        self.mem_usage = 0.0
+        self.disk_total = 0
+        self.disk_used = 0
+        self.disk_usage = 0.0
+        self.load = (0.0, 0.0, 0.0)
+        self.procs_running = 0
+        self.procs_total = 0
+        self.uptime = 0.0
+        self.net_rx = 0
+        self.net_tx = 0
+        self.net_rx_rate = 0.0
+        self.net_tx_rate = 0.0
+        self.interfaces = {}  # {网卡: (累计接收, 累计发送)}
+        self.interface_rates = {}  # {网卡: (接收速率, 发送速率)}
+        self.tcp_established = 0
+        self.tcp_syn_recv = 0
+        self.tcp_ports = {}  # {监听端口: 已建立的连接数}
+        # 进程采集（采集命令包含 PROCESS_COMMAND 时才有）
+        self.ncpu = 1
+        self.page_size = 4096
+        self.proc_rows = None  # [(进程号, 状态, 累计CPU时间, 常驻内存页数, 启动时间, 名称)]
+        self.cmdlines = {}  # {进程号: 命令行}
+        self.processes = None  # ProcessTable.update 计算的进程列表
+        # GM端口探测（采集命令包含 build_port_probe_command 时才有）
+        self.gm_port = None
+        self.gm_port_up = None
+        self.gm_latency = None  # 连接耗时（毫秒）
+
+    @property
+    def mem_used(self) -> int:
+        return max(0, self.mem_total - self.mem_available)
+
+    def compute_rates(self, previous: Optional["SystemStats"]):
+        """根据上一次采集的计数计算这段时间的CPU使用率和网络速率（字节/秒）"""
+        if previous is None:
+            return
+        total_delta = self.cpu_total - previous.cpu_total
+        idle_delta = self.cpu_idle - previous.cpu_idle
+        if total_delta > 0 and idle_delta >= 0:
+            self.cpu_usage = (total_delta - idle_delta) * 100.0 / total_delta
+        elapsed = self.timestamp - previous.timestamp
+        if elapsed <= 0:
+            return
+        # 计数器回绕或网卡重置时不计算
+        if self.net_rx >= previous.net_rx and self.net_tx >= previous.net_tx:
+            self.net_rx_rate = (self.net_rx - previous.net_rx) / elapsed
+            self.net_tx_rate = (self.net_tx - previous.net_tx) / elapsed
+        for name, (rx, tx) in self.interfaces.items():
+            last = previous.interfaces.get(name)
+            if last is not None and rx >= last[0] and tx >= last[1]:
+                self.interface_rates[name] = ((rx - last[0]) / elapsed, (tx - last[1]) / elapsed)
+
+
+def parse_system_stats(text: str) -> SystemStats:
+    """解析采集命令的输出（一次遍历），缺少的项保持为0"""
+    stats = SystemStats()
+    meminfo = {}
+    for line in text.splitlines():
+        fields = line.split()
+        if not fields:
+            continue
+        key = fields[0]
+        try:
+            if key == "proc" and len(fields) >= 7:
+                if stats.proc_rows is None:
+                    stats.proc_rows = []
+                stats.proc_rows.append((int(fields[1]), fields[2], int(fields[3]), int(fields[4]), int(fields[5]),
+                                        fields[6]))
+            elif key == "cmd" and len(fields) >= 2:
+                stats.cmdlines[int(fields[1])] = line.split(None, 2)[2].strip() if len(fields) > 2 else ""
+            elif key == "cpu":
+                counters = [int(value) for value in fields[1:9]]
+                # idle + iowait 视为空闲；guest 已包含在 user 中，不重复计算
+                stats.cpu_total = sum(counters)
+                stats.cpu_idle = counters[3] + (counters[4] if len(counters) > 4 else 0)
+            elif key == "mem" and len(fields) >= 3:
+                meminfo[fields[1].rstrip(":")] = int(fields[2])
+            elif key == "load" and len(fields) >= 5:
+                stats.load = (float(fields[1]), float(fields[2]), float(fields[3]))
+                running, _, total = fields[4].partition("/")
+                stats.procs_running, stats.procs_total = int(running), int(total or 0)
+            elif key == "up" and len(fields) >= 2:
+                stats.uptime = float(fields[1])
+            elif key == "net" and len(fields) >= 3:
+                stats.net_rx, stats.net_tx = int(fields[1]), int(fields[2])
+            elif key == "gm" and len(fields) >= 3:
+                stats.gm_port = int(fields[1])
+                stats.gm_port_up = fields[2] == "1"
+                if stats.gm_port_up and len(fields) >= 4:
+                    stats.gm_latency = int(fields[3]) / 1000.0
+            elif key == "ncpu" and len(fields) >= 2:
+                stats.ncpu = max(1, int(fields[1]))
+            elif key == "pagesize" and len(fields) >= 2:
+                stats.page_size = int(fields[1])
+            elif key == "if" and len(fields) >= 4:
+                stats.interfaces[fields[1]] = (int(fields[2]), int(fields[3]))
+            elif key == "tcp" and len(fields) >= 3:
+                stats.tcp_established, stats.tcp_syn_recv = int(fields[1]), int(fields[2])
+            elif key == "tport" and len(fields) >= 3:
+                stats.tcp_ports[int(fields[1])] = int(fields[2])
+            elif key == "disk" and len(fields) >= 4:
+                stats.disk_total, stats.disk_used = int(fields[1]), int(fields[2])
+                available = int(fields[3])
+                # 与 df 的使用率计算方式一致（已用 / (已用 + 可用)）
+                if stats.disk_used + available:
+                    stats.disk_usage = stats.disk_used * 100.0 / (stats.disk_used + available)
+        except ValueError:
+            continue
+
+    if stats.cpu_total:
+        # 单次采集只能得到开机以来的平均使用率，有上一次采样时由 compute_rates 改为区间使用率
+        stats.cpu_usage = (stats.cpu_total - stats.cpu_idle) * 100.0 / stats.cpu_total
+    stats.mem_total = meminfo.get("MemTotal", 0)
+    if "MemAvailable" in meminfo:
+        stats.mem_available = meminfo["MemAvailable"]
+    else:
+        # 旧内核没有 MemAvailable
+        stats.mem_available = meminfo.get("MemFree", 0) + meminfo.get("Buffers", 0) + meminfo.get("Cached", 0)
+    if stats.mem_total:
+        stats.mem_usage = stats.mem_used * 100.0 / stats.mem_total
+    return stats
+
+
+def build_port_probe_command(port: int) -> str:
+    """
+    在服务器上探测本机端口：用 bash 的 /dev/tcp 连接后立即关闭，输出“gm 端口 1 连接耗时(微秒)”，
+    无法连接或超时输出“gm 端口 0”并以 PORT_PROBE_FAILED 退出（可直接放在 && / || 前面）；
+    没有 bash 时用 ss 检查端口是否在监听（不测耗时）
+    """
+    port = int(port)
+    script = (f"s=${{EPOCHREALTIME/./}}; s=${{s:-$(date +%s%6N)}}; "
+              f"if exec 3<>/dev/tcp/127.0.0.1/{port}; then "
+              f"e=${{EPOCHREALTIME/./}}; e=${{e:-$(date +%s%6N)}}; exec 3>&-; echo gm {port} 1 $((e - s)); "
+              f"else echo gm {port} 0; exit {PORT_PROBE_FAILED}; fi")
+    # 脚本放在双引号中传给 bash -c，$ 需要转义
+    script = script.replace("$", "\\$")
+    return (f"if command -v bash >/dev/null 2>&1; then "
+            f"timeout {PORT_PROBE_TIMEOUT} bash -c \"{script}\" 2>/dev/null || "
+            f"{{ [ $? -eq {PORT_PROBE_FAILED} ] || echo gm {port} 0; (exit {PORT_PROBE_FAILED}); }}; "
+            f"else ss -ltnH 'sport = :{port}' 2>/dev/null | grep -q . && echo gm {port} 1 || "
+            f"{{ echo gm {port} 0; (exit {PORT_PROBE_FAILED}); }}; fi")
+
+
+def collect_system_stats(client, timeout: float = COLLECT_TIMEOUT, gm_port: Optional[int] = None) -> SystemStats:
+    """执行采集命令并解析（一次往返），指定 gm_port 时同时探测GM端口"""
+    command = COLLECTOR_COMMAND if gm_port is None else f"{COLLECTOR_COMMAND}; {build_port_probe_command(gm_port)}"
+    stdin, stdout, stderr = client.exec_command(command, timeout=timeout)
+    stdout.channel.settimeout(timeout)
+    output = stdout.read().decode("utf-8", errors="ignore")
+    stats = parse_system_stats(output)
+    if not stats.cpu_total and not stats.mem_total:
+        error = stderr.read().decode("utf-8", errors="ignore").strip()
+        raise IOError(f"读取系统状态失败: {error or '无输出'}")
+    return stats
+
+
+def format_uptime(seconds: float) -> str:
+    """格式化运行时间，如 3天4小时、5小时12分"""
+    seconds = int(seconds)
+    days, rest = divmod(seconds, 86400)
+    hours, rest = divmod(rest, 3600)
+    minutes = rest // 60
+    if days:
+        return f"{days}天{hours}小时"
+    if hours:
+        return f"{hours}小时{minutes}分"
+    return f"{minutes}分"
+
+
+class ProcessInfo:
+    """一个进程的状态（CPU使用率按单核100%计算，与 top 一致）"""
+    __slots__ = ("pid", "name", "state", "cpu", "rss", "cmdline")
+
+    def __init__(self, pid: int, name: str, state: str, cpu: float, rss: int, cmdline: str):
+        self.pid = pid
+        self.name = name
+        self.state = state
+        self.cpu = cpu
+        self.rss = rss  # 字节
+        self.cmdline = cmdline
+
+    @property
+    def is_java(self) -> bool:
+        return self.name == "java"
+
+
+class ProcessTable:
+    """根据相邻两次采集的进程CPU时间差值计算每个进程的CPU使用率（只保存上一次的计数）"""
+
+    def __init__(self):
+        self._previous = {}  # {进程号: (启动时间, 累计CPU时间)}
+        self._previous_total = None
+
+    def update(self, stats: SystemStats) -> List[ProcessInfo]:
+        total_delta = stats.cpu_total - self._previous_total if self._previous_total is not None else 0
+        current = {}
+        processes = []
+        for pid, state, ticks, pages, started, name in stats.proc_rows or ():
+            current[pid] = (started, ticks)
+            cpu = 0.0
+            previous = self._previous.get(pid)
+            # 进程号被复用时（启动时间不同）不计算
+            if total_delta > 0 and previous is not None and previous[0] == started:
+                cpu = max(0, ticks - previous[1]) * 100.0 * stats.ncpu / total_delta
+            processes.append(ProcessInfo(pid, name, state, cpu,
+                                         pages * stats.page_size, stats.cmdlines.get(pid, "")))
+        self._previous = current
+        self._previous_total = stats.cpu_total
+        return processes
+
+    def clear(self):
+        self._previous = {}
+        self._previous_total = None
+
+
+def top_processes(processes: List[ProcessInfo], key: str = "cpu", count: int = PROCESS_TOP_N) -> List[ProcessInfo]:
+    """按CPU（key="cpu"）或内存（key="rss"）取前 count 个进程"""
+    return heapq.nlargest(count, processes, key=lambda process: getattr(process, key))
+
+
+def build_stream_command(interval: float, processes: bool = False, gm_port: Optional[int] = None) -> str:
+    """持续采集命令：循环执行采集命令（可附加进程采集、GM端口探测），每帧后输出结束标记"""
+    interval = max(STREAM_MIN_INTERVAL, float(interval))
+    command = COLLECTOR_COMMAND
+    if gm_port is not None:
+        command += f"; {build_port_probe_command(gm_port)}"
+    if processes:
+        command += f"; {PROCESS_COMMAND}"
+    return f"while :; do {{ {command}; }}; echo {STREAM_FRAME_END}; sleep {interval:g} || break; done"
+
+
+class MetricsStream:
+    """
+    持续采集（一个长期运行的远程命令，后台线程逐行读取）
+    on_stats(SystemStats): 每收到一帧调用（已计算网络速率），在工作线程中调用
+    on_error(错误信息): 采集流中断时调用，之后每隔 STREAM_RETRY_INTERVAL 秒重新启动
+    开启进程采集（set_processes）后每帧的 stats.processes 为进程列表
+    """
+
+    def __init__(self, client, interval: float = STREAM_INTERVAL,
+                 on_stats: Optional[Callable] = None, on_error: Optional[Callable] = None):
+        self.client = client
+        self.interval = max(STREAM_MIN_INTERVAL, float(interval))
+        self.on_stats = on_stats or (lambda stats: None)
+        self.on_error = on_error or (lambda message: None)
+        self.last_stats = None
+        self.processes = False
+        self.gm_port = None
+        self.process_table = ProcessTable()
+        self._stop_event = threading.Event()
+        self._channel = None
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._stop_event.is_set()
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._close_channel()
+
+    def set_interval(self, interval: float):
+        """修改采样间隔：重新启动远程命令（当前帧结束后生效）"""
+        self.interval = max(STREAM_MIN_INTERVAL, float(interval))
+        self._close_channel()
+
+    def set_processes(self, enabled: bool):
+        """开启或关闭进程采集：重新启动远程命令"""
+        if self.processes == bool(enabled):
+            return
+        self.processes = bool(enabled)
+        self.process_table.clear()
+        self._close_channel()
+
+    def set_gm_port(self, port: Optional[int]):
+        """设置探测的GM端口（None 不探测）：重新启动远程命令"""
+        if self.gm_port == port:
+            return
+        self.gm_port = port
+        self._close_channel()
+
+    def _settings(self):
+        return self.interval, self.processes, self.gm_port
+
+    def _close_channel(self):
+        channel = self._channel
+        if channel is not None:
+            try:
+                channel.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            settings = self._settings()
+            try:
+                error = self._read_stream(settings)
+            except Exception as e:
+                error = str(e)
+            if self._stop_event.is_set():
+                return
+            if settings != self._settings():
+                # 修改了采样间隔或进程采集，立即以新的设置重新启动
+                continue
+            self.on_error(error or "采集命令已退出")
+            self._stop_event.wait(STREAM_RETRY_INTERVAL)
+
+    def _read_stream(self, settings: tuple) -> Optional[str]:
+        """运行一个远程采集命令并逐帧解析，命令结束时返回错误输出"""
+        interval, processes, gm_port = settings
+        stdin, stdout, stderr = self.client.exec_command(build_stream_command(interval, processes, gm_port))
+        channel = stdout.channel
+        self._channel = channel
+        # 超过几个间隔没有输出视为连接异常
+        channel.settimeout(max(interval * 3, COLLECT_TIMEOUT * 2))
+        lines = []
+        try:
+            # 进程名、java命令行中可能有GBK等非UTF-8字节，按字节读取后解码
+            for line in iter_output_lines(stdout):
+                if self._stop_event.is_set() or settings != self._settings():
+                    return None
+                if line.strip() != STREAM_FRAME_END:
+                    lines.append(line)
+                    continue
+                stats = parse_system_stats("".join(lines))
+                lines = []
+                if not stats.cpu_total and not stats.mem_total:
+                    continue
+                stats.compute_rates(self.last_stats)
+                if processes and stats.proc_rows is not None:
+                    stats.processes = self.process_table.update(stats)
+                self.last_stats = stats
+                self.on_stats(stats)
+            return stderr.read().decode("utf-8", errors="ignore").strip()
+        finally:
+            self._channel = None
+            try:
+                channel.close()
+            except Exception:
+                pass
+
+
+class RingSeries:
+    """固定容量的环形时间序列（每个字段一个 array('d')），写满后覆盖最旧的数据，内存占用不变"""
+
+    def __init__(self, capacity: int, fields: Tuple[str, ...]):
+        # 缺少的数值保存为 NaN（如GM端口无法连接时的延迟），查询时跳过
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self.times = array("d", bytes(8 * capacity))
+        self.values = {field: array("d", bytes(8 * capacity)) for field in fields}
+        self.count = 0
+        self._next = 0
+
+    def add_field(self, field: str):
+        """增加一个字段（之前的条目为 NaN）"""
+        self.fields += (field,)
+        self.values[field] = array("d", [math.nan]) * self.capacity
+
+    def append(self, timestamp: float, values: Dict[str, float]):
+        index = self._next
+        self.times[index] = timestamp
+        for field in self.fields:
+            self.values[field][index] = values.get(field, math.nan)
+        self._next = (index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def indices_since(self, since: float) -> List[int]:
+        """时间不早于 since 的条目下标（从旧到新）"""
+        start = (self._next - self.count) % self.capacity
+        indices = [(start + offset) % self.capacity for offset in range(self.count)]
+        # 时间递增，二分查找起点
+        low, high = 0, len(indices)
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[indices[middle]] < since:
+                low = middle + 1
+            else:
+                high = middle
+        return indices[low:]
+
+    @property
+    def oldest(self) -> Optional[float]:
+        if not self.count:
+            return None
+        return self.times[(self._next - self.count) % self.capacity]
+
+
+class MetricHistory:
+    """
+    监控历史
+    最近的采样逐个保存（约1小时），同时按分钟汇总平均值（24小时）；
+    查询时按需要的点数分桶降采样，返回每个桶的平均值和最大值
+    """
+
+    def __init__(self, samples: int = HISTORY_SAMPLES, minutes: int = HISTORY_MINUTES):
+        self.recent = RingSeries(samples, HISTORY_METRICS)
+        self.minutes = RingSeries(minutes, HISTORY_METRICS)
+        self._lock = threading.Lock()
+        self._minute = None
+        self._minute_sums = {}
+        self._minute_counts = {}
+
+    @staticmethod
+    def _values(stats: SystemStats) -> Dict[str, float]:
+        values = {"cpu": stats.cpu_usage, "mem": stats.mem_usage, "disk": stats.disk_usage,
+                  "load": stats.load[0], "net_rx": stats.net_rx_rate, "net_tx": stats.net_tx_rate,
+                  "gm_latency": stats.gm_latency if stats.gm_latency is not None else math.nan,
+                  "tcp_est": stats.tcp_established, "tcp_syn_recv": stats.tcp_syn_recv}
+        for name, (rx_rate, tx_rate) in stats.interface_rates.items():
+            values[f"net_rx:{name}"] = rx_rate
+            values[f"net_tx:{name}"] = tx_rate
+        for port, count in stats.tcp_ports.items():
+            values[f"tcp:{port}"] = count
+        return values
+
+    def add(self, stats: SystemStats):
+        values = self._values(stats)
+        minute = int(stats.timestamp // 60)
+        with self._lock:
+            for name in values:
+                if name not in self.recent.values and len(self.recent.fields) < HISTORY_MAX_SERIES:
+                    self.recent.add_field(name)
+                    self.minutes.add_field(name)
+            self.recent.append(stats.timestamp, values)
+            if self._minute is not None and minute != self._minute and self._minute_counts:
+                self.minutes.append(self._minute * 60.0 + 30,
+                                    {name: total / self._minute_counts[name] for name, total in self._minute_sums.items()})
+                self._minute_sums = {}
+                self._minute_counts = {}
+            self._minute = minute
+            for name, value in values.items():
+                if not math.isnan(value):
+                    self._minute_sums[name] = self._minute_sums.get(name, 0.0) + value
+                    self._minute_counts[name] = self._minute_counts.get(name, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self.recent = RingSeries(self.recent.capacity, HISTORY_METRICS)
+            self.minutes = RingSeries(self.minutes.capacity, HISTORY_METRICS)
+            self._minute = None
+            self._minute_sums = {}
+            self._minute_counts = {}
+
+    def query(self, metric: str, window: float, points: int, now: Optional[float] = None) -> List[Tuple[float, float, float]]:
+        """
+        最近 window 秒的数据，降采样为最多 points 个点 [(时间, 平均值, 最大值)]
+        逐个保存的采样能覆盖时使用原始采样，否则使用分钟汇总
+        """
+        now = now if now is not None else time.time()
+        since = now - window
+        with self._lock:
+            series = self.recent
+            oldest = self.recent.oldest
+            if oldest is None or (oldest > since and self.minutes.count and self.recent.count == self.recent.capacity):
+                series = self.minutes
+            column = series.values.get(metric)
+            if column is None:
+                return []
+            samples = [(series.times[index], column[index]) for index in series.indices_since(since)]
+        samples = [(t, v) for t, v in samples if not math.isnan(v)]
+        times = [t for t, _ in samples]
+        values = [v for _, v in samples]
+        if not values or points <= 0:
+            return []
+        if len(values) <= points:
+            return [(t, v, v) for t, v in zip(times, values)]
+        # 按时间等分为 points 个桶
+        bucket_width = window / points
+        buckets = {}
+        for t, v in zip(times, values):
+            bucket = min(points - 1, int((t - since) / bucket_width))
+            entry = buckets.get(bucket)
+            if entry is None:
+                buckets[bucket] = [v, v, 1]
+            else:
+                entry[0] += v
+                entry[1] = max(entry[1], v)
+                entry[2] += 1
+        return [(since + (bucket + 0.5) * bucket_width, total / count, peak)
+                for bucket, (total, peak, count) in sorted(buckets.items())]
+
+
+def connection_key(conn: dict) -> str:
+    """连接记录的唯一标识（用户@地址:端口）"""
+    return f"{conn.get('username', '').strip()}@{conn.get('host', '').strip()}:{str(conn.get('port', '22')).strip() or '22'}"
+
+
+class SessionPool:
+    """
+    SSH连接池（按 用户@地址:端口 复用连接）
+    同一主机的多次采集共用一个连接，连接断开后下次使用时重新建立
+    """
+
+    def __init__(self, connect_timeout: float = DASHBOARD_CONNECT_TIMEOUT):
+        self.connect_timeout = connect_timeout
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, conn: dict):
+        key = connection_key(conn)
+        with self._lock:
+            client = self._clients.get(key)
+        if client is not None:
+            transport = client.get_transport()
+            if transport is not None and transport.is_active():
+                return client
+            self.discard(key)
+        if not HAS_PARAMIKO:
+            raise IOError("缺少 paramiko 库")
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(hostname=conn.get("host", "").strip(), port=int(conn.get("port") or 22),
+                       username=conn.get("username", "").strip(), password=conn.get("password", ""),
+                       timeout=self.connect_timeout, banner_timeout=self.connect_timeout,
+                       auth_timeout=self.connect_timeout, allow_agent=False, look_for_keys=False)
+        transport = client.get_transport()
+        if transport:
+            transport.set_keepalive(30)
+        with self._lock:
+            self._clients[key] = client
+        return client
+
+    def discard(self, key: str):
+        with self._lock:
+            client = self._clients.pop(key, None)
+        if client is not None:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    def close_all(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+
+class HostStatus:
+    """多主机监控中一台主机的最新状态"""
+
+    def __init__(self, conn: dict):
+        self.conn = conn
+        self.key = connection_key(conn)
+        self.name = conn.get("name") or conn.get("host", "")
+        self.host = conn.get("host", "").strip()
+        self.status = "pending"  # pending/ok/unreachable
+        self.stats = None
+        self.latency = None  # 一次采集的往返时间（毫秒）
+        self.error = None
+        self.failures = 0
+        self.next_due = 0.0
+        self.updated = None
+
+
+class DashboardCollector:
+    """
+    多主机监控
+    调度线程把到期的主机放入队列，固定数量的采集线程取出后用连接池中的连接执行一次采集命令；
+    连续失败的主机按指数退避延后重试（最长 DASHBOARD_MAX_BACKOFF 秒）
+    on_sample(HostStatus): 每次采集后调用（成功或失败，由 status 区分），在采集线程中调用
+    """
+
+    def __init__(self, connections: List[dict], interval: float = DASHBOARD_INTERVAL,
+                 workers: int = DASHBOARD_WORKERS, on_sample: Optional[Callable] = None):
+        self.interval = interval
+        self.on_sample = on_sample or (lambda host: None)
+        self.pool = SessionPool()
+        self.hosts = []
+        seen = set()
+        for conn in connections:
+            host = HostStatus(conn)
+            if host.host and host.key not in seen:
+                seen.add(host.key)
+                self.hosts.append(host)
+        self._due = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._workers = max(1, min(workers, len(self.hosts) or 1))
+
+    def start(self):
+        threading.Thread(target=self._schedule_loop, daemon=True).start()
+        for _ in range(self._workers):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def stop(self):
+        self._stop_event.set()
+        for _ in range(self._workers):
+            self._due.put(None)
+        self.pool.close_all()
+
+    def refresh_now(self, keys=None):
+        """立即重新采集（keys 为 None 时全部主机），同时清除退避"""
+        now = time.time()
+        for host in self.hosts:
+            if keys is None or host.key in keys:
+                host.next_due = now
+                host.failures = 0
+
+    def snapshot(self) -> List[HostStatus]:
+        return list(self.hosts)
+
+    def _schedule_loop(self):
+        while not self._stop_event.is_set():
+            now = time.time()
+            for host in self.hosts:
+                with self._lock:
+                    if host.next_due <= now and host.key not in self._queued:
+                        self._queued.add(host.key)
+                        self._due.put(host)
+            self._stop_event.wait(0.5)
+
+    def _work(self):
+        while not self._stop_event.is_set():
+            host = self._due.get()
+            if host is None:
+                return
+            try:
+                self._collect(host)
+            finally:
+                with self._lock:
+                    self._queued.discard(host.key)
+
+    def _collect(self, host: HostStatus):
+        try:
+            client = self.pool.get(host.conn)
+            started = time.time()
+            stats = collect_system_stats(client)
+            host.latency = (time.time() - started) * 1000
+        except Exception as e:
+            if self._stop_event.is_set():
+                return
+            self.pool.discard(host.key)
+            host.failures += 1
+            host.status = "unreachable"
+            host.error = str(e) or e.__class__.__name__
+            host.next_due = time.time() + min(DASHBOARD_MAX_BACKOFF, self.interval * (2 ** host.failures))
+            self.on_sample(host)
+            return
+        stats.compute_rates(host.stats)
+        host.stats = stats
+        host.status = "ok"
+        host.error = None
+        host.failures = 0
+        host.updated = stats.timestamp
+        host.next_due = time.time() + self.interval
+        self.on_sample(host)
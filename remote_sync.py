@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录增量同步
+比较本地目录和远程目录的清单（大小、修改时间，可选SHA256），只上传有变化的文件；
+远程清单和哈希均由一条命令批量获取，本地哈希按（大小, 修改时间）缓存
+"""
+
+import fnmatch
+import hashlib
+import json
+import os
+import shlex
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# 修改时间比较的容差（秒，兼容只保存到2秒精度的文件系统）
+SYNC_MTIME_TOLERANCE = 2
+# 计算本地哈希的读取块大小
+SYNC_HASH_BLOCK_SIZE = 1024 * 1024
+# 远程清单命令的超时时间（秒）
+SYNC_REMOTE_TIMEOUT = 300
+
+# 同步操作
+ACTION_UPLOAD = "upload"
+ACTION_DELETE = "delete"
+
+
+class SyncAction:
+    """同步计划中的一项操作"""
+
+    def __init__(self, action: str, rel_path: str, reason: str,
+                 local_size: Optional[int] = None, remote_size: Optional[int] = None):
+        self.action = action
+        self.rel_path = rel_path
+        self.reason = reason
+        self.local_size = local_size
+        self.remote_size = remote_size
+
+
+class ManifestCache:
+    """
+    清单缓存（保存在程序目录的JSON文件中）
+    记录文件在某个（大小, 修改时间）下的SHA256，文件未变化时不再重新计算
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hashes = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.hashes = json.load(f).get("hashes", {})
+        except (OSError, ValueError):
+            pass
+
+    def get(self, side: str, rel_path: str, size: int, mtime: float) -> Optional[str]:
+        cached = self.hashes.get(f"{side}:{rel_path}")
+        if cached and cached[0] == size and int(cached[1]) == int(mtime):
+            return cached[2]
+        return None
+
+    def put(self, side: str, rel_path: str, size: int, mtime: float, digest: str):
+        self.hashes[f"{side}:{rel_path}"] = [size, mtime, digest]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"hashes": self.hashes}, f, ensure_ascii=False)
+
+
+def manifest_cache_path(cache_dir: str, host: str, local_root: str, remote_root: str) -> str:
+    """每组（主机, 本地目录, 远程目录）对应一个缓存文件"""
+    key = hashlib.sha1(f"{host}\n{local_root}\n{remote_root}".encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def parse_excludes(text: str) -> List[str]:
+    """解析排除规则（逗号或空格分隔的通配符，如 *.log, runtime/）"""
+    return [pattern.strip() for pattern in text.replace(",", " ").split() if pattern.strip()]
+
+
+def is_excluded(rel_path: str, excludes: List[str]) -> bool:
+    """规则匹配相对路径或其中任意一级名称；以 / 结尾的规则只匹配目录"""
+    parts = rel_path.split("/")
+    for pattern in excludes:
+        if pattern.endswith("/"):
+            if any(fnmatch.fnmatch(part, pattern.rstrip("/")) for part in parts[:-1]):
+                return True
+        elif fnmatch.fnmatch(rel_path, pattern) or any(fnmatch.fnmatch(part, pattern) for part in parts):
+            return True
+    return False
+
+
+def scan_local(root: str, excludes: List[str]) -> Dict[str, Tuple[int, float]]:
+    """本地清单：{相对路径: (大小, 修改时间)}，相对路径统一使用 /"""
+    manifest = {}
+    for current, dir_names, file_names in os.walk(root):
+        relative_dir = os.path.relpath(current, root)
+        prefix = "" if relative_dir == "." else relative_dir.replace(os.sep, "/") + "/"
+        for file_name in file_names:
+            rel_path = prefix + file_name
+            if is_excluded(rel_path, excludes):
+                continue
+            try:
+                st = os.stat(os.path.join(current, file_name))
+            except OSError:
+                continue
+            manifest[rel_path] = (st.st_size, st.st_mtime)
+    return manifest
+
+
+def scan_remote(client, root: str, excludes: List[str]) -> Dict[str, Tuple[int, float]]:
+    """远程清单（一条 find 命令），远程目录不存在时返回空清单"""
+    quoted = shlex.quote(root)
+    command = f"[ -d {quoted} ] || exit 0; cd {quoted} && find . -type f -printf '%P\\t%s\\t%T@\\0'"
+    stdin, stdout, stderr = client.exec_command(command, timeout=SYNC_REMOTE_TIMEOUT)
+    data = stdout.read()
+    exit_status = stdout.channel.recv_exit_status()
+    if exit_status != 0:
+        error = stderr.read().decode("utf-8", errors="ignore").strip()
+        raise IOError(f"读取远程清单失败: {error}")
+    manifest = {}
+    for record in data.split(b"\0"):
+        if not record:
+            continue
+        try:
+            rel_path, size, mtime = record.decode("utf-8", errors="surrogateescape").rsplit("\t", 2)
+            if not is_excluded(rel_path, excludes):
+                manifest[rel_path] = (int(size), float(mtime))
+        except ValueError:
+            continue
+    return manifest
+
+
+def local_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(SYNC_HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def remote_sha256(client, root: str, rel_paths: List[str]) -> Dict[str, str]:
+    """批量计算远程文件的SHA256（文件列表通过stdin传入，一条命令完成）"""
+    if not rel_paths:
+        return {}
+    command = f"cd {shlex.quote(root)} && xargs -0 sha256sum --"
+    stdin, stdout, stderr = client.exec_command(command, timeout=SYNC_REMOTE_TIMEOUT)
+    stdin.write(b"\0".join(path.encode("utf-8", errors="surrogateescape") for path in rel_paths))
+    stdin.channel.shutdown_write()
+    digests = {}
+    for line in stdout.read().decode("utf-8", errors="surrogateescape").splitlines():
+        digest, _, rel_path = line.partition("  ")
+        if rel_path:
+            digests[rel_path] = digest.lstrip("\\")
+    return digests
+
+
+def build_sync_plan(client, local_root: str, remote_root: str, use_hash: bool = False,
+                    delete_extra: bool = False, excludes: Optional[List[str]] = None,
+                    cache: Optional[ManifestCache] = None,
+                    progress: Optional[Callable[[str], None]] = None):
+    """
+    生成同步计划（本地 -> 远程），不修改任何文件
+    返回 (操作列表, 统计信息)；大小相同但修改时间不同的文件在 use_hash 时再比较哈希
+    """
+    excludes = excludes or []
+    report = progress or (lambda message: None)
+    report("正在扫描本地目录...")
+    local = scan_local(local_root, excludes)
+    report(f"本地 {len(local)} 个文件，正在读取远程清单...")
+    remote = scan_remote(client, remote_root, excludes)
+    report(f"远程 {len(remote)} 个文件，正在比较...")
+
+    actions = []
+    unchanged = 0
+    hash_candidates = []
+    for rel_path, (size, mtime) in local.items():
+        remote_entry = remote.get(rel_path)
+        if remote_entry is None:
+            actions.append(SyncAction(ACTION_UPLOAD, rel_path, "新文件", size, None))
+        elif remote_entry[0] != size:
+            actions.append(SyncAction(ACTION_UPLOAD, rel_path, "大小不同", size, remote_entry[0]))
+        elif abs(remote_entry[1] - mtime) <= SYNC_MTIME_TOLERANCE:
+            unchanged += 1
+        elif use_hash:
+            hash_candidates.append(rel_path)
+        else:
+            actions.append(SyncAction(ACTION_UPLOAD, rel_path, "修改时间不同", size, remote_entry[0]))
+
+    if hash_candidates:
+        remote_digests = {}
+        uncached = []
+        for rel_path in hash_candidates:
+            size, mtime = remote[rel_path]
+            digest = cache.get("R", rel_path, size, mtime) if cache else None
+            if digest:
+                remote_digests[rel_path] = digest
+            else:
+                uncached.append(rel_path)
+        report(f"正在计算 {len(hash_candidates)} 个文件的哈希...")
+        computed = remote_sha256(client, remote_root, uncached)
+        for rel_path, digest in computed.items():
+            remote_digests[rel_path] = digest
+            if cache and rel_path in remote:
+                cache.put("R", rel_path, remote[rel_path][0], remote[rel_path][1], digest)
+        for rel_path in hash_candidates:
+            size, mtime = local[rel_path]
+            local_digest = cache.get("L", rel_path, size, mtime) if cache else None
+            if not local_digest:
+                local_digest = local_sha256(os.path.join(local_root, *rel_path.split("/")))
+                if cache:
+                    cache.put("L", rel_path, size, mtime, local_digest)
+            if local_digest == remote_digests.get(rel_path):
+                unchanged += 1
+            else:
+                actions.append(SyncAction(ACTION_UPLOAD, rel_path, "内容不同", size, remote[rel_path][0]))
+        if cache:
+            cache.save()
+
+    extra = [rel_path for rel_path in remote if rel_path not in local]
+    if delete_extra:
+        for rel_path in extra:
+            actions.append(SyncAction(ACTION_DELETE, rel_path, "远程多余", None, remote[rel_path][0]))
+
+    actions.sort(key=lambda action: (action.action, action.rel_path))
+    summary = {
+        "local_files": len(local),
+        "remote_files": len(remote),
+        "unchanged": unchanged,
+        "upload": sum(1 for action in actions if action.action == ACTION_UPLOAD),
+        "upload_bytes": sum(action.local_size or 0 for action in actions if action.action == ACTION_UPLOAD),
+        "delete": sum(1 for action in actions if action.action == ACTION_DELETE),
+        "extra": len(extra),
+    }
+    return actions, summary
+
+
+def delete_remote_files(client, root: str, rel_paths: List[str]):
+    """批量删除远程文件（文件列表通过stdin传入，一条命令完成）"""
+    if not rel_paths:
+        return
+    command = f"cd {shlex.quote(root)} && xargs -0 rm -f --"
+    stdin, stdout, stderr = client.exec_command(command, timeout=SYNC_REMOTE_TIMEOUT)
+    stdin.write(b"\0".join(path.encode("utf-8", errors="surrogateescape") for path in rel_paths))
+    stdin.channel.shutdown_write()
+    if stdout.channel.recv_exit_status() != 0:
+        error = stderr.read().decode("utf-8", errors="ignore").strip()
+        raise IOError(f"删除远程文件失败: {error}")
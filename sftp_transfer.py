@@ -0,0 +1,1276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SFTP文件传输引擎
+支持流水线读写（下载预取、上传pipelined）、断点续传、进度和速度统计、后台运行，
+大量小文件目录的 tar 流压缩传输，以及传输后的SHA256校验（本地哈希在传输时顺带计算）
+"""
+
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import posixpath
+import shlex
+import stat
+import tarfile
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional
+
+from remote_sync import remote_sha256
+
+
+# 每次读写的块大小（下载配合预取使用较大的块，上传由paramiko拆分为32KB请求并流水线发送）
+DOWNLOAD_BLOCK_SIZE = 256 * 1024
+UPLOAD_BLOCK_SIZE = 256 * 1024
+# 下载预取的最大并发请求数
+PREFETCH_MAX_REQUESTS = 64
+# 未完成文件的后缀
+PART_SUFFIX = ".part"
+# 速度统计的平滑系数（指数移动平均）
+SPEED_SMOOTHING = 0.3
+# 速度统计的采样间隔（秒）
+SPEED_SAMPLE_INTERVAL = 0.5
+# 小于该大小的文件不记录续传状态（重新传输的代价很小）
+RESUME_MIN_SIZE = 4 * 1024 * 1024
+# 传输队列的并发数（每个并发使用同一SSH连接上的独立SFTP通道）
+QUEUE_MAX_WORKERS = 4
+# 目录传输自动选择 tar 流模式的条件：文件数不少于该值且平均大小不超过该值
+TAR_MIN_FILES = 50
+TAR_MAX_AVG_SIZE = 256 * 1024
+# 上传时本地gzip的压缩级别（兼顾速度和压缩比）
+TAR_COMPRESS_LEVEL = 6
+# tar 流读写的块大小
+TAR_BLOCK_SIZE = 64 * 1024
+# 保存编辑的文件时，不小于该大小且改动区域较小时只发送改动部分，由远程拼接
+DELTA_SAVE_MIN_SIZE = 256 * 1024
+# 改动区域超过新内容的该比例时直接完整上传
+DELTA_SAVE_MAX_RATIO = 0.5
+# 传输后校验：哈希不一致时自动重新传输的次数
+VERIFY_MAX_RETRIES = 2
+# 传输队列合并校验：等待更多文件完成的时间（秒）及每次 sha256sum 的最多文件数
+VERIFY_BATCH_DELAY = 0.5
+VERIFY_BATCH_MAX = 200
+
+
+class TransferCancelled(Exception):
+    """传输被用户取消"""
+    pass
+
+
+class VerifyMismatch(IOError):
+    """传输后本地和远程的SHA256不一致"""
+    pass
+
+
+def format_bytes(size: float) -> str:
+    """格式化字节数，如 1.5 MB"""
+    size = float(size)
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """格式化剩余时间，如 01:23 或 1:02:03"""
+    if seconds is None or seconds < 0:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+class TransferStats:
+    """传输进度和速度统计（工作线程更新，界面线程读取）"""
+
+    def __init__(self, total: int = 0):
+        self.total = total
+        self.done = 0
+        self.resumed_from = 0
+        self.started = time.time()
+        self.finished = None
+        self.speed = 0.0
+        self._last_time = self.started
+        self._last_done = 0
+
+    def start(self, total: int, offset: int = 0):
+        self.total = total
+        self.done = offset
+        self.resumed_from = offset
+        self.started = time.time()
+        self._last_time = self.started
+        self._last_done = offset
+
+    def add(self, count: int):
+        self.done += count
+        now = time.time()
+        elapsed = now - self._last_time
+        if elapsed >= SPEED_SAMPLE_INTERVAL:
+            current = (self.done - self._last_done) / elapsed
+            if self.speed:
+                self.speed = SPEED_SMOOTHING * current + (1 - SPEED_SMOOTHING) * self.speed
+            else:
+                self.speed = current
+            self._last_time = now
+            self._last_done = self.done
+
+    def finish(self):
+        self.finished = time.time()
+
+    @property
+    def percent(self) -> float:
+        return self.done * 100.0 / self.total if self.total else 100.0
+
+    @property
+    def average_speed(self) -> float:
+        """本次传输的平均速度（不含续传前已完成的部分）"""
+        elapsed = (self.finished or time.time()) - self.started
+        return (self.done - self.resumed_from) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        if not self.speed:
+            return None
+        return (self.total - self.done) / self.speed
+
+
+class ResumeStore:
+    """
+    断点续传状态
+    每个未完成的传输保存一个JSON文件，记录源文件的大小和修改时间，
+    续传前核对，源文件变化后重新开始
+    """
+
+    def __init__(self, state_dir: str):
+        self.state_dir = state_dir
+
+    def _state_path(self, direction: str, remote_path: str, local_path: str) -> str:
+        key = hashlib.sha1(f"{direction}\n{remote_path}\n{local_path}".encode("utf-8")).hexdigest()
+        return os.path.join(self.state_dir, f"{key}.json")
+
+    def load(self, direction: str, remote_path: str, local_path: str) -> Optional[dict]:
+        try:
+            with open(self._state_path(direction, remote_path, local_path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, direction: str, remote_path: str, local_path: str, source_size: int, source_mtime: float):
+        os.makedirs(self.state_dir, exist_ok=True)
+        state = {
+            "direction": direction,
+            "remote_path": remote_path,
+            "local_path": local_path,
+            "source_size": source_size,
+            "source_mtime": source_mtime,
+        }
+        with open(self._state_path(direction, remote_path, local_path), "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+
+    def clear(self, direction: str, remote_path: str, local_path: str):
+        try:
+            os.remove(self._state_path(direction, remote_path, local_path))
+        except OSError:
+            pass
+
+    @staticmethod
+    def matches(state: Optional[dict], source_size: int, source_mtime: float) -> bool:
+        return bool(state) and state.get("source_size") == source_size and \
+            int(state.get("source_mtime") or 0) == int(source_mtime or 0)
+
+
+class FileTransfer:
+    """
+    单个文件的SFTP传输
+    下载：远程文件预取（多个读请求并发）写入本地 .part 文件，完成后改名；
+    上传：本地文件以流水线方式写入远程 .part 文件，完成后原子改名。
+    中断后再次传输同一文件时，若源文件未变化则从 .part 的现有长度继续。
+    verify=True 时在读写的同时计算本地数据的SHA256（sha256 属性），供传输后与远程哈希比较。
+    """
+
+    DOWNLOAD = "download"
+    UPLOAD = "upload"
+
+    def __init__(self, sftp_factory: Callable, direction: str, remote_path: str, local_path: str,
+                 resume_store: Optional[ResumeStore] = None, pause_event: Optional[threading.Event] = None,
+                 verify: bool = False):
+        # sftp_factory: 返回一个SFTP客户端（通常为 client.open_sftp，每个传输使用独立通道）
+        self.sftp_factory = sftp_factory
+        self.direction = direction
+        self.remote_path = remote_path
+        self.local_path = local_path
+        self.resume_store = resume_store
+        # pause_event: 未设置时暂停传输（传输队列的暂停功能使用）
+        self.pause_event = pause_event
+        self.verify = verify
+        self.sha256 = None  # 传输的完整内容的SHA256（verify=True 时）
+        self.stats = TransferStats()
+        self._cancel_event = threading.Event()
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.remote_path if self.direction == self.DOWNLOAD else self.local_path)
+
+    def _start_digest(self, path: str, offset: int):
+        """开始计算哈希；续传时先补上已传输部分（从本地文件读取）"""
+        if not self.verify:
+            return None
+        digest = hashlib.sha256()
+        if offset:
+            with open(path, "rb") as f:
+                remaining = offset
+                while remaining > 0:
+                    block = f.read(min(DOWNLOAD_BLOCK_SIZE, remaining))
+                    if not block:
+                        break
+                    digest.update(block)
+                    remaining -= len(block)
+        return digest
+
+    def verify_remote(self, client):
+        """用一次 sha256sum 取远程哈希并与传输时计算的本地哈希比较，不一致时抛出 VerifyMismatch"""
+        remote_digest = remote_file_sha256(client, self.remote_path)
+        if remote_digest is None:
+            raise IOError("校验失败: 无法计算远程文件的SHA256")
+        if remote_digest != self.sha256:
+            raise VerifyMismatch(f"校验失败: SHA256不一致（本地 {self.sha256[:12]}，远程 {remote_digest[:12]}）")
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def run(self, sftp=None):
+        """执行传输（阻塞，在工作线程中调用）；可传入已打开的SFTP客户端复用"""
+        own_sftp = sftp is None
+        if own_sftp:
+            sftp = self.sftp_factory()
+        try:
+            if self.direction == self.DOWNLOAD:
+                self._download(sftp)
+            else:
+                self._upload(sftp)
+            self.stats.finish()
+        finally:
+            if own_sftp:
+                try:
+                    sftp.close()
+                except Exception:
+                    pass
+
+    def _check_cancel(self):
+        while self.pause_event is not None and not self.pause_event.is_set() and not self.cancelled:
+            self.pause_event.wait(0.2)
+        if self.cancelled:
+            raise TransferCancelled()
+
+    def _use_resume(self, size: int) -> bool:
+        return self.resume_store is not None and size >= RESUME_MIN_SIZE
+
+    def _resume_offset(self, source_size: int, source_mtime: float, part_size: Optional[int]) -> int:
+        """根据保存的续传状态计算续传位置，不能续传时返回0"""
+        if not self.resume_store or part_size is None:
+            return 0
+        state = self.resume_store.load(self.direction, self.remote_path, self.local_path)
+        if ResumeStore.matches(state, source_size, source_mtime) and 0 < part_size <= source_size:
+            return part_size
+        return 0
+
+    def _download(self, sftp):
+        remote_stat = sftp.stat(self.remote_path)
+        total = remote_stat.st_size or 0
+        part_path = self.local_path + PART_SUFFIX
+        part_size = os.path.getsize(part_path) if os.path.exists(part_path) else None
+        offset = self._resume_offset(total, remote_stat.st_mtime, part_size)
+        if self._use_resume(total):
+            self.resume_store.save(self.direction, self.remote_path, self.local_path, total, remote_stat.st_mtime)
+        self.stats.start(total, offset)
+        self.remote_mode = remote_stat.st_mode
+        digest = self._start_digest(part_path, offset)
+
+        with sftp.open(self.remote_path, "rb") as remote_file:
+            if offset:
+                remote_file.seek(offset)
+            # 预取：一次发出多个读请求，避免每个32KB块都等待一次往返
+            try:
+                remote_file.prefetch(total, PREFETCH_MAX_REQUESTS)
+            except TypeError:
+                # 旧版paramiko不支持max_concurrent_requests参数
+                remote_file.prefetch(total)
+            with open(part_path, "ab" if offset else "wb") as local_file:
+                remaining = total - offset
+                while remaining > 0:
+                    self._check_cancel()
+                    data = remote_file.read(min(DOWNLOAD_BLOCK_SIZE, remaining))
+                    if not data:
+                        break
+                    local_file.write(data)
+                    if digest is not None:
+                        digest.update(data)
+                    remaining -= len(data)
+                    self.stats.add(len(data))
+
+        if os.path.getsize(part_path) != total:
+            raise IOError(f"下载不完整: {os.path.getsize(part_path)}/{total} 字节")
+        if digest is not None:
+            self.sha256 = digest.hexdigest()
+        os.replace(part_path, self.local_path)
+        try:
+            os.utime(self.local_path, (remote_stat.st_atime or remote_stat.st_mtime, remote_stat.st_mtime))
+        except (OSError, TypeError):
+            pass
+        if self._use_resume(total):
+            self.resume_store.clear(self.direction, self.remote_path, self.local_path)
+
+    def _upload(self, sftp):
+        local_stat = os.stat(self.local_path)
+        total = local_stat.st_size
+        part_path = self.remote_path + PART_SUFFIX
+        try:
+            part_size = sftp.stat(part_path).st_size
+        except IOError:
+            part_size = None
+        offset = self._resume_offset(total, local_stat.st_mtime, part_size)
+        if self._use_resume(total):
+            self.resume_store.save(self.direction, self.remote_path, self.local_path, total, local_stat.st_mtime)
+        self.stats.start(total, offset)
+        digest = self._start_digest(self.local_path, offset)
+
+        with open(self.local_path, "rb") as local_file:
+            if offset:
+                local_file.seek(offset)
+            with sftp.open(part_path, "ab" if offset else "wb") as remote_file:
+                # 流水线写入：不等待每个写请求的确认，关闭文件时统一检查
+                remote_file.set_pipelined(True)
+                while True:
+                    self._check_cancel()
+                    data = local_file.read(UPLOAD_BLOCK_SIZE)
+                    if not data:
+                        break
+                    remote_file.write(data)
+                    if digest is not None:
+                        digest.update(data)
+                    self.stats.add(len(data))
+
+        # 续传时核对拼接后的大小（完整上传时写入错误会在关闭文件时抛出）
+        if offset and sftp.stat(part_path).st_size != total:
+            raise IOError("上传不完整，远程文件大小与本地不一致")
+        if digest is not None:
+            self.sha256 = digest.hexdigest()
+        # 改名会替换目标文件：沿用被覆盖文件的权限和属主（如0755的启动脚本）
+        try:
+            target_stat = sftp.stat(self.remote_path)
+        except IOError:
+            target_stat = None
+        if target_stat is not None:
+            try:
+                sftp.chmod(part_path, stat.S_IMODE(target_stat.st_mode))
+                sftp.chown(part_path, target_stat.st_uid, target_stat.st_gid)
+            except IOError:
+                # 非root用户无法修改属主，保持默认
+                pass
+        rename_remote(sftp, part_path, self.remote_path)
+        if self._use_resume(total):
+            self.resume_store.clear(self.direction, self.remote_path, self.local_path)
+
+
+def rename_remote(sftp, source: str, target: str):
+    """远程改名并覆盖目标（优先使用posix-rename扩展，保证原子性）"""
+    try:
+        sftp.posix_rename(source, target)
+    except (IOError, AttributeError):
+        # 服务器不支持posix-rename扩展：先删除目标再改名
+        try:
+            sftp.remove(target)
+        except IOError:
+            pass
+        sftp.rename(source, target)
+
+
+def remote_tree_summary(client, path: str):
+    """统计远程目录的文件数和总大小（一条命令完成），返回 (文件数, 总字节数, 是否有tar命令)"""
+    command = (f"command -v tar >/dev/null 2>&1 && t=1 || t=0; "
+               f"find {shlex.quote(path)} -type f -printf '%s\\n' 2>/dev/null | "
+               f"awk -v t=$t '{{n++; s+=$1}} END {{print n+0, s+0, t}}'")
+    stdin, stdout, stderr = client.exec_command(command, timeout=60)
+    fields = stdout.read().decode("utf-8", errors="ignore").split()
+    if len(fields) != 3:
+        raise IOError(f"统计远程目录失败: {path}")
+    return int(fields[0]), int(float(fields[1])), fields[2] == "1"
+
+
+def local_tree_summary(path: str):
+    """统计本地目录的文件数和总大小，返回 (文件数, 总字节数)"""
+    count = total = 0
+    for current, dir_names, file_names in os.walk(path):
+        for file_name in file_names:
+            try:
+                total += os.path.getsize(os.path.join(current, file_name))
+                count += 1
+            except OSError:
+                pass
+    return count, total
+
+
+def prefer_tar_stream(file_count: int, total_size: int) -> bool:
+    """文件多且平均较小时，逐个SFTP传输的往返开销占主导，改用 tar 流"""
+    if file_count < TAR_MIN_FILES:
+        return False
+    return total_size / file_count <= TAR_MAX_AVG_SIZE
+
+
+class _CountingReader:
+    """包装读取流，统计读取的字节数，并在每次读取前检查取消"""
+
+    def __init__(self, stream, on_read: Callable):
+        self.stream = stream
+        self.on_read = on_read
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.on_read(len(data))
+        return data
+
+
+class _CountingWriter:
+    """包装写入流，统计写入的字节数，并在每次写入前检查取消"""
+
+    def __init__(self, stream, on_write: Callable):
+        self.stream = stream
+        self.on_write = on_write
+
+    def write(self, data) -> int:
+        self.on_write(len(data))
+        self.stream.write(data)
+        return len(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _normalize_tar_member(tar_info: tarfile.TarInfo) -> tarfile.TarInfo:
+    """
+    上传打包时规范化条目：不带本地属主（Windows上为0，即root），
+    权限使用 0755（目录、可执行文件）/0644，不使用Windows上的 0o666/0o777
+    """
+    tar_info.uid = tar_info.gid = 0
+    tar_info.uname = tar_info.gname = ""
+    executable = os.name != "nt" and tar_info.mode & 0o111
+    tar_info.mode = 0o755 if tar_info.isdir() or executable else 0o644
+    return tar_info
+
+
+class TarStreamTransfer:
+    """
+    目录的 tar 流传输
+    下载：远程 tar czf 输出到exec通道，本地边接收边解包（保留权限和修改时间，不经过符号链接写入）；
+    上传：本地边打包边压缩写入exec通道，远程 tar xzf 解包（保留修改时间，属主为当前用户，权限按规范化后的值）。
+    整个目录只有一个通道的流式往返，适合大量小文件。
+    进度按未压缩字节统计，compressed_bytes 为实际传输的字节数。
+    """
+
+    def __init__(self, client, direction: str, remote_path: str, local_path: str,
+                 pause_event: Optional[threading.Event] = None, total: int = 0):
+        self.client = client
+        self.direction = direction
+        self.remote_path = remote_path.rstrip("/") or "/"
+        self.local_path = local_path
+        self.pause_event = pause_event
+        self.stats = TransferStats(total)
+        self.compressed_bytes = 0
+        self.file_count = 0
+        self._cancel_event = threading.Event()
+        self._channel = None
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.remote_path if self.direction == FileTransfer.DOWNLOAD else self.local_path)
+
+    def cancel(self):
+        self._cancel_event.set()
+        # 关闭通道，使阻塞中的读写立即返回
+        if self._channel is not None:
+            try:
+                self._channel.close()
+            except Exception:
+                pass
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.stats.done / self.compressed_bytes if self.compressed_bytes else 0.0
+
+    def describe(self) -> str:
+        """传输结果说明（压缩比和有效吞吐量）"""
+        return (f"tar流 {self.file_count} 个文件，压缩比 {self.compression_ratio:.1f}x，"
+                f"有效速度 {format_bytes(self.stats.average_speed)}/s")
+
+    def _check_cancel(self):
+        while self.pause_event is not None and not self.pause_event.is_set() and not self.cancelled:
+            self.pause_event.wait(0.2)
+        if self.cancelled:
+            raise TransferCancelled()
+
+    def _count_compressed(self, count: int):
+        self._check_cancel()
+        self.compressed_bytes += count
+
+    def run(self, sftp=None):
+        """执行传输（阻塞）；sftp参数仅为与FileTransfer接口一致，不使用"""
+        if self.direction == FileTransfer.DOWNLOAD:
+            self._download()
+        else:
+            self._upload()
+        self.stats.finish()
+
+    def _finish_command(self, stdout, stderr):
+        exit_status = stdout.channel.recv_exit_status()
+        if self.cancelled:
+            raise TransferCancelled()
+        if exit_status != 0:
+            error = stderr.read().decode("utf-8", errors="ignore").strip()
+            raise IOError(f"远程tar执行失败（退出码 {exit_status}）: {error}")
+
+    def _download(self):
+        if not self.stats.total:
+            self.file_count, total, _ = remote_tree_summary(self.client, self.remote_path)
+            self.stats.total = total
+        self.stats.start(self.stats.total)
+        parent, name = posixpath.split(self.remote_path)
+        command = f"tar czf - -C {shlex.quote(parent or '/')} {shlex.quote(name)}"
+        stdin, stdout, stderr = self.client.exec_command(command)
+        self._channel = stdout.channel
+        stdin.close()
+
+        os.makedirs(self.local_path, exist_ok=True)
+        dir_times = []
+        files = 0
+        reader = _CountingReader(stdout, self._count_compressed)
+        try:
+            with tarfile.open(fileobj=reader, mode="r|gz") as tar:
+                for member in tar:
+                    self._check_cancel()
+                    target = self._local_target(member.name)
+                    if target is None:
+                        continue
+                    if member.isdir():
+                        if os.path.islink(target):
+                            continue
+                        os.makedirs(target, exist_ok=True)
+                        dir_times.append((target, member))
+                    elif member.isfile():
+                        self._extract_file(tar, member, target)
+                        files += 1
+                    elif member.issym() and hasattr(os, "symlink"):
+                        # 只创建指向目录内部的相对链接
+                        if member.linkname.startswith("/") or ".." in member.linkname.split("/"):
+                            continue
+                        try:
+                            if os.path.lexists(target):
+                                os.remove(target)
+                            os.symlink(member.linkname, target)
+                        except OSError:
+                            pass
+        except (tarfile.TarError, EOFError, OSError) as e:
+            if self.cancelled:
+                raise TransferCancelled()
+            raise IOError(f"解包失败: {e}")
+        self._finish_command(stdout, stderr)
+        self.file_count = files
+        # 目录的修改时间在其中的文件写完后再设置
+        for target, member in reversed(dir_times):
+            self._apply_attributes(target, member)
+
+    def _local_target(self, member_name: str) -> Optional[str]:
+        """
+        把tar条目（以目录名开头）映射到本地路径，拒绝绝对路径和 .. 路径；
+        上级目录中有符号链接时也拒绝（之前的条目创建的链接可能指向本地目录之外）
+        """
+        parts = [part for part in member_name.split("/") if part not in ("", ".")]
+        if not parts or ".." in parts or member_name.startswith("/"):
+            return None
+        current = self.local_path
+        for part in parts[1:-1]:
+            current = os.path.join(current, part)
+            if os.path.islink(current):
+                return None
+        return os.path.join(self.local_path, *parts[1:])
+
+    def _extract_file(self, tar, member, target: str):
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        # 替换同名的符号链接，而不是写入它指向的文件
+        if os.path.islink(target):
+            os.remove(target)
+        source = tar.extractfile(member)
+        with open(target, "wb") as local_file:
+            while True:
+                data = source.read(TAR_BLOCK_SIZE)
+                if not data:
+                    break
+                local_file.write(data)
+                self.stats.add(len(data))
+        self._apply_attributes(target, member)
+
+    @staticmethod
+    def _apply_attributes(target: str, member):
+        try:
+            os.chmod(target, stat.S_IMODE(member.mode))
+            os.utime(target, (member.mtime, member.mtime))
+        except OSError:
+            pass
+
+    def _upload(self):
+        if not self.stats.total:
+            self.file_count, total = local_tree_summary(self.local_path)
+            self.stats.total = total
+        self.stats.start(self.stats.total)
+        parent, name = posixpath.split(self.remote_path)
+        parent = parent or "/"
+        # 不恢复tar中的属主和权限（root执行时 -p 是默认行为），按当前用户和umask创建
+        command = f"mkdir -p {shlex.quote(parent)} && tar xzf - --no-same-owner -C {shlex.quote(parent)}"
+        stdin, stdout, stderr = self.client.exec_command(command)
+        self._channel = stdout.channel
+
+        writer = _CountingWriter(stdin, self._count_compressed)
+        files = 0
+        try:
+            with gzip.GzipFile(fileobj=writer, mode="wb", compresslevel=TAR_COMPRESS_LEVEL) as compressed:
+                with tarfile.open(fileobj=compressed, mode="w|", format=tarfile.GNU_FORMAT) as tar:
+                    for current, dir_names, file_names in os.walk(self.local_path):
+                        self._check_cancel()
+                        relative = os.path.relpath(current, self.local_path)
+                        arc_dir = name if relative == "." else posixpath.join(name, *relative.split(os.sep))
+                        tar.add(current, arcname=arc_dir, recursive=False, filter=_normalize_tar_member)
+                        for file_name in file_names:
+                            local_file = os.path.join(current, file_name)
+                            tar_info = tar.gettarinfo(local_file, arcname=posixpath.join(arc_dir, file_name))
+                            if not tar_info.isfile():
+                                continue
+                            tar_info = _normalize_tar_member(tar_info)
+                            with open(local_file, "rb") as f:
+                                tar.addfile(tar_info, _CountingReader(f, self.stats.add))
+                            files += 1
+        except (OSError, EOFError) as e:
+            if self.cancelled:
+                raise TransferCancelled()
+            raise IOError(f"打包上传失败: {e}")
+        stdin.channel.shutdown_write()
+        self._finish_command(stdout, stderr)
+        self.file_count = files
+
+
+class TransferJob:
+    """
+    在后台线程中运行一个传输，界面定时读取 status/stats 显示进度
+    client: 提供且传输开启了校验时，完成后比较远程SHA256，不一致时自动重新传输
+    """
+
+    def __init__(self, transfer: FileTransfer, client=None):
+        self.transfer = transfer
+        self.client = client
+        self.status = "pending"  # pending/running/verifying/done/failed/cancelled
+        self.error = None
+        self.verified = False
+        self.verify_retries = 0
+        self._thread = None
+
+    @property
+    def stats(self) -> TransferStats:
+        return self.transfer.stats
+
+    def start(self):
+        self.status = "running"
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self.transfer.cancel()
+
+    def run(self):
+        """执行传输和校验（阻塞；start() 在后台线程中调用）"""
+        try:
+            while True:
+                self.status = "running"
+                self.transfer.run()
+                if not self.transfer.verify or self.client is None:
+                    break
+                self.status = "verifying"
+                try:
+                    self.transfer.verify_remote(self.client)
+                    self.verified = True
+                    break
+                except VerifyMismatch:
+                    if self.verify_retries >= VERIFY_MAX_RETRIES:
+                        raise
+                    self.verify_retries += 1
+            self.status = "done"
+        except TransferCancelled:
+            self.status = "cancelled"
+        except Exception as e:
+            self.error = str(e)
+            self.status = "failed"
+
+
+class TransferItem:
+    """传输队列中的一个文件"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, direction: str, remote_path: str, local_path: str, size: int = 0):
+        self.id = next(self._ids)
+        self.direction = direction
+        self.remote_path = remote_path
+        self.local_path = local_path
+        self.size = size
+        self.status = "pending"  # pending/running/verifying/done/failed/cancelled
+        self.error = None
+        self.transfer = None
+        self.attempts = 0
+        self.verify_retries = 0  # 校验不一致后自动重新传输的次数
+        self.tar_stream = False  # 是否以 tar 流传输整个目录
+        self.note = None  # 完成后的说明（如 tar 流的压缩比）
+
+    @property
+    def name(self) -> str:
+        name = self.remote_path if self.direction == FileTransfer.DOWNLOAD else self.local_path
+        return f"{name} [tar流]" if self.tar_stream else name
+
+    @property
+    def done_bytes(self) -> int:
+        if self.status in ("verifying", "done"):
+            return self.size
+        return self.transfer.stats.done if self.transfer else 0
+
+    @property
+    def speed(self) -> float:
+        return self.transfer.stats.speed if self.transfer and self.status == "running" else 0.0
+
+
+def ensure_remote_dir(sftp, path: str, known_dirs: Optional[set] = None):
+    """确保远程目录存在（逐级创建），known_dirs 记录已确认存在的目录，减少往返"""
+    missing = []
+    current = path.rstrip("/") or "/"
+    while current not in ("", "/") and (known_dirs is None or current not in known_dirs):
+        try:
+            if stat.S_ISDIR(sftp.stat(current).st_mode):
+                break
+            raise IOError(f"远程路径已存在但不是目录: {current}")
+        except FileNotFoundError:
+            missing.append(current)
+        current = posixpath.dirname(current)
+    for directory in reversed(missing):
+        try:
+            sftp.mkdir(directory)
+        except IOError:
+            # 其他线程可能已创建
+            if not stat.S_ISDIR(sftp.stat(directory).st_mode):
+                raise
+    if known_dirs is not None:
+        known_dirs.add(path.rstrip("/") or "/")
+
+
+class TransferQueue:
+    """
+    并行传输队列
+    多个工作线程各自在同一SSH连接上打开独立的SFTP通道并行传输文件；
+    支持整个目录（边展开边传输）、暂停/继续、取消、失败重试，并保留权限和修改时间。
+    verify=True 时逐个文件校验SHA256：本地哈希在传输时计算，远程哈希由校验线程合并为一次 sha256sum 获取，
+    不一致的文件自动重新传输（tar 流传输的目录不校验）。
+    """
+
+    def __init__(self, sftp_factory: Callable, resume_store: Optional[ResumeStore] = None,
+                 max_workers: int = QUEUE_MAX_WORKERS, client=None, verify: bool = False):
+        self.sftp_factory = sftp_factory
+        # client: SSH连接，提供时目录传输可自动选择 tar 流模式，并可进行传输后校验
+        self.client = client
+        self.resume_store = resume_store
+        self.max_workers = max_workers
+        self.verify = verify
+        self.items = []  # 所有条目（按加入顺序，界面读取）
+        self.expanding = 0  # 正在展开的目录数
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._running_event = threading.Event()  # 未设置时表示暂停
+        self._running_event.set()
+        self._closed = False
+        self._workers = []
+        self._remote_dirs = set()
+        self._remote_dirs_lock = threading.Lock()
+        self._verify_pending = deque()
+        self._verifier = None
+
+    # ---------- 添加任务 ----------
+
+    def add_download(self, remote_path: str, local_path: str, is_dir: bool = False):
+        """下载文件或整个目录（目录在后台展开，展开过程中已发现的文件立即开始传输）"""
+        if is_dir:
+            self._expand_in_background(FileTransfer.DOWNLOAD, self._expand_remote_dir, remote_path, local_path)
+        else:
+            self._enqueue([TransferItem(FileTransfer.DOWNLOAD, remote_path, local_path)])
+
+    def add_upload(self, local_path: str, remote_path: str):
+        """上传文件或整个目录"""
+        if os.path.isdir(local_path):
+            self._expand_in_background(FileTransfer.UPLOAD, self._expand_local_dir, local_path, remote_path)
+        else:
+            self._enqueue([TransferItem(FileTransfer.UPLOAD, remote_path, local_path, os.path.getsize(local_path))])
+
+    def _expand_in_background(self, direction: str, target, source: str, destination: str):
+        with self._condition:
+            self.expanding += 1
+
+        def run():
+            try:
+                target(source, destination)
+            except Exception as e:
+                if direction == FileTransfer.DOWNLOAD:
+                    item = TransferItem(direction, source, destination)
+                else:
+                    item = TransferItem(direction, destination, source)
+                item.status = "failed"
+                item.error = f"展开目录失败: {e}"
+                with self._condition:
+                    self.items.append(item)
+            finally:
+                with self._condition:
+                    self.expanding -= 1
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _expand_remote_dir(self, remote_dir: str, local_dir: str):
+        if self.client is not None:
+            count, total, has_tar = remote_tree_summary(self.client, remote_dir)
+            if has_tar and prefer_tar_stream(count, total):
+                self._enqueue_tar(FileTransfer.DOWNLOAD, remote_dir, local_dir, total)
+                return
+        sftp = self.sftp_factory()
+        try:
+            stack = [(remote_dir, local_dir)]
+            while stack and not self._closed:
+                current_remote, current_local = stack.pop()
+                os.makedirs(current_local, exist_ok=True)
+                batch = []
+                for attr in sftp.listdir_attr(current_remote):
+                    if attr.filename in (".", ".."):
+                        continue
+                    child_remote = posixpath.join(current_remote, attr.filename)
+                    child_local = os.path.join(current_local, attr.filename)
+                    if stat.S_ISDIR(attr.st_mode or 0):
+                        stack.append((child_remote, child_local))
+                    elif stat.S_ISREG(attr.st_mode or 0):
+                        batch.append(TransferItem(FileTransfer.DOWNLOAD, child_remote, child_local, attr.st_size or 0))
+                self._enqueue(batch)
+        finally:
+            sftp.close()
+
+    def _expand_local_dir(self, local_dir: str, remote_dir: str):
+        if self.client is not None:
+            count, total = local_tree_summary(local_dir)
+            if prefer_tar_stream(count, total):
+                self._enqueue_tar(FileTransfer.UPLOAD, remote_dir, local_dir, total)
+                return
+        sftp = self.sftp_factory()
+        try:
+            for current_local, dir_names, file_names in os.walk(local_dir):
+                if self._closed:
+                    return
+                relative = os.path.relpath(current_local, local_dir)
+                current_remote = remote_dir if relative == "." else \
+                    posixpath.join(remote_dir, *relative.split(os.sep))
+                # 先创建目录，再加入其中的文件（避免工作线程并发创建目录）
+                with self._remote_dirs_lock:
+                    ensure_remote_dir(sftp, current_remote, self._remote_dirs)
+                batch = []
+                for file_name in file_names:
+                    local_file = os.path.join(current_local, file_name)
+                    try:
+                        size = os.path.getsize(local_file)
+                    except OSError:
+                        continue
+                    batch.append(TransferItem(FileTransfer.UPLOAD, posixpath.join(current_remote, file_name),
+                                              local_file, size))
+                self._enqueue(batch)
+        finally:
+            sftp.close()
+
+    def _enqueue_tar(self, direction: str, remote_path: str, local_path: str, total: int):
+        item = TransferItem(direction, remote_path, local_path, total)
+        item.tar_stream = True
+        self._enqueue([item])
+
+    def _enqueue(self, items: List[TransferItem]):
+        if not items:
+            return
+        with self._condition:
+            if self._closed:
+                return
+            self.items.extend(items)
+            self._pending.extend(items)
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._condition.notify_all()
+
+    # ---------- 控制 ----------
+
+    @property
+    def paused(self) -> bool:
+        return not self._running_event.is_set()
+
+    def pause(self):
+        self._running_event.clear()
+
+    def resume(self):
+        self._running_event.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def cancel(self, item_ids=None):
+        """取消指定条目（None表示全部未完成的条目）"""
+        with self._condition:
+            for item in self.items:
+                if item_ids is not None and item.id not in item_ids:
+                    continue
+                if item.status == "pending":
+                    item.status = "cancelled"
+                elif item.status == "running" and item.transfer:
+                    item.transfer.cancel()
+            self._pending = deque(item for item in self._pending if item.status == "pending")
+
+    def retry(self, item_ids=None):
+        """重新传输失败或已取消的条目（大文件从中断处续传）"""
+        retried = []
+        with self._condition:
+            for item in self.items:
+                if item_ids is not None and item.id not in item_ids:
+                    continue
+                if item.status in ("failed", "cancelled"):
+                    item.status = "pending"
+                    item.error = None
+                    item.transfer = None
+                    retried.append(item)
+        if retried:
+            retried_ids = {item.id for item in retried}
+            with self._condition:
+                self.items = [item for item in self.items if item.id not in retried_ids]
+            self._enqueue(retried)
+
+    def clear_finished(self):
+        with self._condition:
+            self.items = [item for item in self.items if item.status not in ("done", "cancelled")]
+
+    def close(self):
+        """关闭队列（断开连接时调用）：取消所有传输并结束工作线程"""
+        self.cancel()
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify_all()
+        self._running_event.set()
+
+    def summary(self) -> dict:
+        """队列汇总：各状态数量、总字节数、已完成字节数、总速度"""
+        counts = {"pending": 0, "running": 0, "verifying": 0, "done": 0, "failed": 0, "cancelled": 0}
+        total = done = 0
+        speed = 0.0
+        with self._condition:
+            items = list(self.items)
+            expanding = self.expanding
+        for item in items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+            if item.status == "cancelled":
+                continue
+            total += item.size
+            done += item.done_bytes
+            speed += item.speed
+        counts.update(total_bytes=total, done_bytes=done, speed=speed, expanding=expanding)
+        return counts
+
+    # ---------- 工作线程 ----------
+
+    def _next_item(self) -> Optional[TransferItem]:
+        with self._condition:
+            while not self._closed and (not self._pending or self.paused):
+                self._condition.wait(0.5)
+            if self._closed:
+                return None
+            item = self._pending.popleft()
+            item.status = "running"
+            item.attempts += 1
+            if item.tar_stream:
+                item.transfer = TarStreamTransfer(self.client, item.direction, item.remote_path, item.local_path,
+                                                  self._running_event, item.size)
+            else:
+                item.transfer = FileTransfer(self.sftp_factory, item.direction, item.remote_path,
+                                             item.local_path, self.resume_store, self._running_event,
+                                             verify=self.verify and self.client is not None)
+            return item
+
+    def _work(self):
+        sftp = None
+        try:
+            while True:
+                item = self._next_item()
+                if item is None:
+                    return
+                try:
+                    if item.tar_stream:
+                        item.transfer.run()
+                        item.size = item.transfer.stats.total
+                        item.note = item.transfer.describe()
+                        item.status = "done"
+                        continue
+                    if sftp is None:
+                        sftp = self.sftp_factory()
+                    if item.direction == FileTransfer.UPLOAD:
+                        with self._remote_dirs_lock:
+                            ensure_remote_dir(sftp, posixpath.dirname(item.remote_path), self._remote_dirs)
+                    else:
+                        os.makedirs(os.path.dirname(item.local_path) or ".", exist_ok=True)
+                    item.transfer.run(sftp)
+                    item.size = item.transfer.stats.total
+                    self._preserve_attributes(sftp, item)
+                    if item.transfer.sha256 is not None:
+                        self._queue_verify(item)
+                    else:
+                        item.status = "done"
+                except TransferCancelled:
+                    item.status = "cancelled"
+                except Exception as e:
+                    item.error = str(e)
+                    item.status = "failed"
+                    if item.tar_stream:
+                        continue
+                    # 通道可能已损坏，下一个文件重新打开
+                    if sftp is not None:
+                        channel = sftp.get_channel() if hasattr(sftp, "get_channel") else None
+                        if channel is None or channel.closed:
+                            try:
+                                sftp.close()
+                            except Exception:
+                                pass
+                            sftp = None
+        finally:
+            if sftp is not None:
+                try:
+                    sftp.close()
+                except Exception:
+                    pass
+
+    # ---------- 传输后校验 ----------
+
+    def _queue_verify(self, item: TransferItem):
+        with self._condition:
+            item.status = "verifying"
+            self._verify_pending.append(item)
+            if self._verifier is None:
+                self._verifier = threading.Thread(target=self._verify_loop, daemon=True)
+                self._verifier.start()
+            self._condition.notify_all()
+
+    def _verify_loop(self):
+        """校验线程：把同时完成的文件合并为一次 sha256sum 调用"""
+        while True:
+            with self._condition:
+                while not self._closed and not self._verify_pending:
+                    self._condition.wait(0.5)
+                if self._closed:
+                    return
+            time.sleep(VERIFY_BATCH_DELAY)
+            with self._condition:
+                batch = [self._verify_pending.popleft()
+                         for _ in range(min(len(self._verify_pending), VERIFY_BATCH_MAX))]
+            try:
+                digests = remote_sha256(self.client, "/", [item.remote_path for item in batch])
+            except Exception as e:
+                for item in batch:
+                    item.error = f"校验失败: {e}"
+                    item.status = "failed"
+                continue
+            for item in batch:
+                self._check_digest(item, digests.get(item.remote_path))
+
+    def _check_digest(self, item: TransferItem, remote_digest: Optional[str]):
+        if remote_digest is not None and remote_digest == item.transfer.sha256:
+            item.note = "已校验" if not item.verify_retries else f"已校验，重传{item.verify_retries}次"
+            item.status = "done"
+            return
+        with self._condition:
+            if remote_digest is not None and item.verify_retries < VERIFY_MAX_RETRIES and not self._closed:
+                # 内容不一致：重新完整传输（续传状态已在上次完成时清除）
+                item.verify_retries += 1
+                item.note = f"校验不一致，重新传输（第{item.verify_retries}次）"
+                item.transfer = None
+                item.status = "pending"
+                self._pending.append(item)
+                self._condition.notify_all()
+                return
+        item.error = "校验失败: SHA256不一致" if remote_digest is not None else "校验失败: 无法计算远程文件的SHA256"
+        item.status = "failed"
+
+    @staticmethod
+    def _preserve_attributes(sftp, item: TransferItem):
+        """
+        上传时保留修改时间（权限不从本地复制：Windows上总是0o666；覆盖的文件沿用原权限，新文件使用服务器默认权限）；
+        下载时保留权限（修改时间已在FileTransfer中设置）
+        """
+        try:
+            if item.direction == FileTransfer.UPLOAD:
+                local_stat = os.stat(item.local_path)
+                sftp.utime(item.remote_path, (local_stat.st_atime, local_stat.st_mtime))
+            else:
+                remote_mode = getattr(item.transfer, "remote_mode", None)
+                if remote_mode:
+                    os.chmod(item.local_path, stat.S_IMODE(remote_mode))
+        except (IOError, OSError):
+            # 权限不足或文件系统不支持时忽略
+            pass
+
+
+class SaveConflict(Exception):
+    """远程文件在打开后已被其他人修改"""
+
+    def __init__(self, remote_version: "RemoteVersion"):
+        super().__init__("远程文件已被修改")
+        self.remote_version = remote_version
+
+
+class RemoteVersion:
+    """打开或保存时远程文件的版本（大小、修改时间、SHA256），用于保存前的冲突检查"""
+
+    def __init__(self, size: int, mtime: float, sha256: Optional[str] = None):
+        self.size = size
+        self.mtime = mtime
+        self.sha256 = sha256
+
+    def same_stat(self, other: "RemoteVersion") -> bool:
+        return self.size == other.size and int(self.mtime or 0) == int(other.mtime or 0)
+
+
+def read_remote_file(sftp, path: str):
+    """读取整个远程文件，返回 (内容字节, 版本)；版本取自同一个文件句柄，与读到的内容一致"""
+    with sftp.open(path, "rb") as remote_file:
+        attr = remote_file.stat()
+        remote_file.prefetch(attr.st_size)
+        data = remote_file.read()
+    return data, RemoteVersion(attr.st_size, attr.st_mtime, hashlib.sha256(data).hexdigest())
+
+
+def remote_file_sha256(client, path: str) -> Optional[str]:
+    stdin, stdout, stderr = client.exec_command(f"sha256sum -- {shlex.quote(path)}", timeout=60)
+    fields = stdout.read().decode("utf-8", errors="ignore").split()
+    return fields[0].lstrip("\\") if fields else None
+
+
+def atomic_save(client, sftp, path: str, data: bytes, expected: Optional[RemoteVersion] = None,
+                original: Optional[bytes] = None, force: bool = False):
+    """
+    原子保存远程文件：先写入同目录下的临时文件，核对后改名覆盖原文件，
+    中途断开也不会留下写了一半的文件。
+    expected: 打开时的版本，远程文件已变化（大小或修改时间不同且内容哈希不同）时抛出 SaveConflict，force=True 跳过检查；
+    original: 打开时的内容，较大的文件只发送改动区域，远程用原文件的首尾拼接。
+    返回 (新版本, 实际发送的字节数, 是否使用了增量保存)
+    """
+    target = path
+    try:
+        if stat.S_ISLNK(sftp.lstat(path).st_mode):
+            # 符号链接：保存到链接指向的文件，保留链接本身
+            target = sftp.normalize(path)
+        current_stat = sftp.stat(target)
+    except FileNotFoundError:
+        current_stat = None
+
+    if expected is not None and not force:
+        if current_stat is None:
+            raise SaveConflict(RemoteVersion(0, 0))
+        current = RemoteVersion(current_stat.st_size, current_stat.st_mtime)
+        if not current.same_stat(expected):
+            current.sha256 = remote_file_sha256(client, target)
+            if current.sha256 != expected.sha256:
+                raise SaveConflict(current)
+
+    directory, name = posixpath.split(target)
+    temp_path = posixpath.join(directory, f".{name}.{os.getpid()}-{int(time.time() * 1000)}.tmp")
+    new_sha256 = hashlib.sha256(data).hexdigest()
+    sent = None
+    try:
+        if current_stat is not None and original is not None and len(data) >= DELTA_SAVE_MIN_SIZE and \
+                expected is not None and current_stat.st_size == len(original):
+            sent = _delta_save(client, target, temp_path, original, data, new_sha256)
+        delta = sent is not None
+        if not delta:
+            with sftp.open(temp_path, "wb") as remote_file:
+                remote_file.set_pipelined(True)
+                remote_file.write(data)
+            if current_stat is not None:
+                try:
+                    sftp.chmod(temp_path, stat.S_IMODE(current_stat.st_mode))
+                    sftp.chown(temp_path, current_stat.st_uid, current_stat.st_gid)
+                except IOError:
+                    # 非root用户无法修改属主，保持默认
+                    pass
+            if sftp.stat(temp_path).st_size != len(data):
+                raise IOError("保存不完整，临时文件大小不一致")
+            sent = len(data)
+        rename_remote(sftp, temp_path, target)
+    except Exception:
+        try:
+            sftp.remove(temp_path)
+        except IOError:
+            pass
+        raise
+    saved_stat = sftp.stat(target)
+    return RemoteVersion(saved_stat.st_size, saved_stat.st_mtime, new_sha256), sent, delta
+
+
+def _delta_save(client, target: str, temp_path: str, original: bytes, data: bytes, new_sha256: str) -> Optional[int]:
+    """
+    只发送改动区域：计算新旧内容相同的前缀和后缀，远程用原文件的前缀 + 收到的中间部分 + 原文件的后缀
+    拼出临时文件，并返回SHA256核对；改动过大或核对失败时返回 None（改为完整上传）
+    """
+    # 按块跳过相同部分，再逐字节找到分界
+    limit = min(len(original), len(data))
+    prefix = 0
+    while prefix + TAR_BLOCK_SIZE <= limit and \
+            original[prefix:prefix + TAR_BLOCK_SIZE] == data[prefix:prefix + TAR_BLOCK_SIZE]:
+        prefix += TAR_BLOCK_SIZE
+    while prefix < limit and original[prefix] == data[prefix]:
+        prefix += 1
+    max_suffix = limit - prefix
+    suffix = 0
+    while suffix + TAR_BLOCK_SIZE <= max_suffix and \
+            original[len(original) - suffix - TAR_BLOCK_SIZE:len(original) - suffix] == \
+            data[len(data) - suffix - TAR_BLOCK_SIZE:len(data) - suffix]:
+        suffix += TAR_BLOCK_SIZE
+    while suffix < max_suffix and original[len(original) - suffix - 1] == data[len(data) - suffix - 1]:
+        suffix += 1
+    middle = data[prefix:len(data) - suffix]
+    if len(middle) > len(data) * DELTA_SAVE_MAX_RATIO:
+        return None
+
+    quoted_target, quoted_temp = shlex.quote(target), shlex.quote(temp_path)
+    command = (f"set -e; head -c {prefix} {quoted_target} > {quoted_temp}; cat >> {quoted_temp}; "
+               f"tail -c {suffix} {quoted_target} >> {quoted_temp}; "
+               f"chown --reference={quoted_target} {quoted_temp} 2>/dev/null || true; "
+               f"chmod --reference={quoted_target} {quoted_temp}; sha256sum -- {quoted_temp}")
+    stdin, stdout, stderr = client.exec_command(command, timeout=120)
+    stdin.write(middle)
+    stdin.channel.shutdown_write()
+    output = stdout.read().decode("utf-8", errors="ignore").split()
+    if stdout.channel.recv_exit_status() != 0 or not output or output[0].lstrip("\\") != new_sha256:
+        return None
+    return len(middle)
@@ -12,6 +12,7 @@ import threading
 import queue
 import json
 import os
+import posixpath
 import re
 import stat
 import socket
@@ -20,6 +21,8 @@ import base64
 import subprocess
 import tempfile
 import shutil
+import time
+from collections import deque
 from pathlib import Path
 from datetime import datetime
 import urllib.request
@@ -44,6 +47,80 @@ try:
 except ImportError:
     HAS_LICENSE = False
 
+from remote_files import (
+    DISK_USAGE_DEPTH, DirectoryListingJob, DirectoryModel, DirectoryPrefetcher, DiskUsageCache, DiskUsageJob,
+    LineIndex, LineIndexJob, ListingCache, PagedRemoteFile, RemoteSearchJob, SharedSFTPSession, TailJob,
+    build_search_command, build_tail_command,
+)
+from file_watcher import FileWatcher
+from remote_monitor import (
+    PROCESS_TOP_N, STREAM_INTERVAL, STREAM_MIN_INTERVAL, DashboardCollector, MetricHistory, MetricsStream,
+    build_port_probe_command, connection_key, format_uptime, top_processes,
+)
+from metric_alerts import (
+    ALERT_LEVELS, ALERT_METRICS, ALERT_OPERATORS, AlertEngine, AlertRule, default_alert_rules, format_metric_value,
+)
+from metrics_store import MetricsStore
+from remote_sync import (
+    ACTION_DELETE, ACTION_UPLOAD, ManifestCache, build_sync_plan, delete_remote_files,
+    manifest_cache_path, parse_excludes,
+)
+from sftp_transfer import (
+    FileTransfer, ResumeStore, SaveConflict, TransferJob, TransferQueue, atomic_save, format_bytes,
+    format_duration, read_remote_file,
+)
+from db_transfer import DatabaseExport, DatabaseImport
+
+# 文件浏览器：每次定时器最多处理的目录块数、定时器间隔（毫秒）
+LISTING_CHUNKS_PER_TICK = 5
+LISTING_PUMP_INTERVAL_MS = 30
+# 目录项超过该数量时使用虚拟列表（只显示可见窗口内的行）
+VIRTUAL_LIST_THRESHOLD = 1000
+# Treeview标题栏高度（像素），用于计算可见行数
+TREEVIEW_HEADING_HEIGHT = 25
+# 预取：当前目录中预取的子目录数、记录的最近访问目录数
+PREFETCH_TOP_DIRS = 5
+PREFETCH_HISTORY_SIZE = 10
+# 远程搜索：每次定时器最多插入的结果数
+SEARCH_RESULTS_PER_TICK = 200
+# 传输进度窗口的刷新间隔（毫秒）
+TRANSFER_REFRESH_MS = 200
+# 传输队列窗口的刷新间隔（毫秒）
+TRANSFER_QUEUE_REFRESH_MS = 300
+# 超过该大小的文件用分页只读查看器打开，不整体读入编辑器
+EDIT_MAX_SIZE = 2 * 1024 * 1024
+# 分页查看器每屏显示的字节数、后台结果的轮询间隔（毫秒）
+VIEWER_WINDOW_BYTES = 256 * 1024
+VIEWER_POLL_MS = 50
+# 计算当前位置行号时，最多从索引点向后读取的字节数
+VIEWER_LINE_COUNT_MAX_BYTES = 4 * 1024 * 1024
+# 实时日志：刷新间隔（毫秒）、每个标签页显示的最多行数、默认高亮规则
+TAIL_RENDER_MS = 200
+TAIL_DISPLAY_LINES = 5000
+TAIL_DEFAULT_HIGHLIGHTS = "ERROR:red, Exception:red, WARN:orange, GM:blue"
+# 磁盘占用分析：后台结果的轮询间隔（毫秒）、占比条的长度
+DISK_USAGE_POLL_MS = 100
+DISK_USAGE_BAR_WIDTH = 20
+# 监控面板迷你曲线显示的时间范围（秒）；历史曲线窗口的可选范围和刷新间隔（毫秒）
+SPARKLINE_WINDOW = 600
+HISTORY_WINDOWS = (("10分钟", 600), ("1小时", 3600), ("6小时", 6 * 3600), ("24小时", 24 * 3600),
+                   ("7天", 7 * 86400), ("30天", 30 * 86400), ("1年", 365 * 86400))
+HISTORY_REFRESH_MS = 2000
+# 监控历史查询前等待缓冲数据写入本地存储的最长时间（秒）
+HISTORY_FLUSH_WAIT = 2.0
+# 多主机监控窗口的刷新间隔（毫秒）、使用率高亮的阈值（%）
+DASHBOARD_REFRESH_MS = 1000
+DASHBOARD_WARN_PERCENT = 85
+# 告警提示窗口的显示时间（毫秒）和同时显示的最大数量（更多的只写入日志），告警窗口的刷新间隔（毫秒）
+ALERT_TOAST_MS = 8000
+ALERT_TOAST_MAX = 4
+ALERTS_REFRESH_MS = 1000
+# 进程列表窗口的刷新间隔（毫秒）
+PROCESS_REFRESH_MS = 1000
+# GM端口探测结果的有效时间（秒，至少为3个采样间隔），发送GM命令前端口无法连接时命令的退出码
+GM_PROBE_FRESH = 10
+GM_PORT_DOWN_EXIT = 111
+
 
 def get_app_dir():
     """获取应用程序目录（兼容打包后的exe和开发环境）"""
@@ -145,10 +222,29 @@ class SSHToolGUI:
         self.shell = None
         self.is_connected = False
         self.output_queue = queue.Queue()
+        # 共享SFTP会话和目录缓存（文件浏览器使用，断开连接时清理）
+        self.shared_sftp = None
+        self.listing_cache = ListingCache()
+        # 并行传输队列及其窗口（断开连接时取消未完成的传输）
+        self.transfer_queue = None
+        self.transfer_queue_window = None
+        # 实时日志窗口（多个日志以标签页显示）
+        self.tail_window = None
+        self.tail_open_callback = None
+        # 外部编辑器自动同步服务（所有文件共用）及其状态窗口
+        self.file_watcher = None
+        self.watch_list_window = None
+        # 打开的文件浏览器的刷新函数（自动同步完成后刷新正在显示该目录的浏览器）
+        self.browser_refreshers = set()
+        self.process_window = None
         
         # 监控相关
         self.monitoring_active = False
-        self.monitoring_thread = None
+        self.metrics_stream = None  # 持续采集的远程命令
+        self.last_system_stats = None  # 上一次采集结果（计算CPU使用率和网络速率）
+        self.metric_history = MetricHistory()  # 监控历史（固定大小的环形数组）
+        self.monitor_host_key = None  # 正在监控的主机（用户@地址:端口）
+        self.sparklines = {}  # 监控面板的迷你曲线 {指标: Canvas}
         
         # 文件路径（使用绝对路径，确保保存在程序目录）
         # 兼容打包后的exe和开发环境
@@ -157,6 +253,29 @@ class SSHToolGUI:
         self.gm_templates_file = os.path.join(app_dir, 'gm_templates.json')
         self.item_ids_file = os.path.join(app_dir, 'item_ids.json')  # 物品ID历史记录
         self.config_file = os.path.join(app_dir, 'client_config.json')  # 客户端配置文件
+        # 文件传输的断点续传状态
+        self.transfer_resume_store = ResumeStore(os.path.join(app_dir, 'transfer_state'))
+        # 目录同步的清单缓存目录
+        self.sync_cache_dir = os.path.join(app_dir, 'sync_manifests')
+        # 磁盘占用分析结果缓存（按主机）
+        self.disk_usage_cache_file = os.path.join(app_dir, 'disk_usage_cache.json')
+        # 监控数据的本地存储（所有主机，自动汇总和清理）
+        try:
+            self.metrics_store = MetricsStore(os.path.join(app_dir, 'metrics.db'))
+        except Exception as e:
+            print(f"打开监控数据存储失败: {e}")
+            self.metrics_store = None
+        # 传输后是否校验SHA256（文件传输、传输队列和数据库导入导出共用）
+        self.verify_transfers = bool(self.load_client_option('verify_transfers', False))
+        # 监控采样间隔（秒）
+        try:
+            self.monitor_interval = max(STREAM_MIN_INTERVAL, float(self.load_client_option('monitor_interval', STREAM_INTERVAL)))
+        except (TypeError, ValueError):
+            self.monitor_interval = STREAM_INTERVAL
+        # 监控告警（当前主机和多主机监控共用；通知在主线程中显示）
+        self.alert_engine = AlertEngine(self.load_alert_rules(),
+                                        on_event=lambda event: self.root.after(0, lambda: self.on_alert_event(event)))
+        self.alert_toasts = []  # 正在显示的告警提示窗口
         
         # 加载母机服务器地址配置（使用默认值，避免文件读取阻塞）
         self.server_url = "http://localhost:8888"  # 默认值
@@ -632,6 +751,54 @@ class SSHToolGUI:
         except Exception as e:
             print(f"保存服务器地址配置失败: {e}")
     
+    def load_client_option(self, key, default=None):
+        """读取客户端配置中的一项"""
+        if os.path.exists(self.config_file):
+            try:
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    return json.load(f).get(key, default)
+            except:
+                pass
+        return default
+    
+    def save_client_option(self, key, value):
+        """保存客户端配置中的一项（保留其他配置）"""
+        try:
+            config = {}
+            if os.path.exists(self.config_file):
+                try:
+                    with open(self.config_file, 'r', encoding='utf-8') as f:
+                        config = json.load(f)
+                except:
+                    pass
+            config[key] = value
+            with open(self.config_file, 'w', encoding='utf-8') as f:
+                json.dump(config, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            print(f"保存客户端配置失败: {e}")
+    
+    def load_alert_rules(self):
+        """读取告警规则（客户端配置中没有或格式错误时使用默认规则）"""
+        saved = self.load_client_option('alert_rules')
+        if saved is not None:
+            try:
+                return [AlertRule.from_dict(data) for data in saved]
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"告警规则格式错误，使用默认规则: {e}")
+        return default_alert_rules()
+    
+    def set_alert_rules(self, rules):
+        self.alert_engine.set_rules(rules)
+        self.save_client_option('alert_rules', [rule.to_dict() for rule in rules])
+        self.update_alert_status()
+    
+    def set_verify_transfers(self, enabled):
+        """开启或关闭传输后校验（对之后开始的传输生效）"""
+        self.verify_transfers = bool(enabled)
+        if self.transfer_queue is not None:
+            self.transfer_queue.verify = self.verify_transfers
+        self.save_client_option('verify_transfers', self.verify_transfers)
+    
     def get_local_ip(self):
         """获取本机IP地址（优化：添加超时，避免阻塞）"""
         try:
@@ -999,6 +1166,8 @@ GM工具连接信息通知
         self.cpu_progress.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=4)
         self.cpu_status_var = tk.StringVar(value="等待连接...")
         ttk.Label(cpu_frame, textvariable=self.cpu_status_var, font=("Microsoft YaHei", 7), foreground="#7f8c8d").grid(row=2, column=0, sticky=tk.W)
+        self.sparklines["cpu"] = tk.Canvas(cpu_frame, height=26, bg="white", highlightthickness=0)
+        self.sparklines["cpu"].grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(2, 0))
         
         # 内存使用
         mem_frame = ttk.Frame(monitor_frame)
@@ -1012,6 +1181,8 @@ GM工具连接信息通知
         self.mem_progress.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=4)
         self.mem_status_var = tk.StringVar(value="等待连接...")
         ttk.Label(mem_frame, textvariable=self.mem_status_var, font=("Microsoft YaHei", 7), foreground="#7f8c8d").grid(row=2, column=0, sticky=tk.W)
+        self.sparklines["mem"] = tk.Canvas(mem_frame, height=26, bg="white", highlightthickness=0)
+        self.sparklines["mem"].grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(2, 0))
         
         # 磁盘使用
         disk_frame = ttk.Frame(monitor_frame)
@@ -1025,13 +1196,36 @@ GM工具连接信息通知
         self.disk_progress.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=4)
         self.disk_status_var = tk.StringVar(value="等待连接...")
         ttk.Label(disk_frame, textvariable=self.disk_status_var, font=("Microsoft YaHei", 7), foreground="#7f8c8d").grid(row=2, column=0, sticky=tk.W)
+        self.sparklines["disk"] = tk.Canvas(disk_frame, height=26, bg="white", highlightthickness=0)
+        self.sparklines["disk"].grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(2, 0))
+        
+        # 网络、进程数、运行时间
+        self.sys_info_var = tk.StringVar(value="")
+        ttk.Label(monitor_frame, textvariable=self.sys_info_var, font=("Microsoft YaHei", 7), foreground="#7f8c8d").grid(row=3, column=0, columnspan=2, sticky=tk.W)
         
         # 监控按钮（更美观）
         monitor_btn_frame = ttk.Frame(monitor_frame)
-        monitor_btn_frame.grid(row=3, column=0, columnspan=2, pady=8)
+        monitor_btn_frame.grid(row=4, column=0, columnspan=2, pady=8)
         self.monitor_btn = ttk.Button(monitor_btn_frame, text="▶ 开始监控", command=self.toggle_monitoring, width=12)
         self.monitor_btn.grid(row=0, column=0, padx=4)
         ttk.Button(monitor_btn_frame, text="⏹ 停止监控", command=self.stop_monitoring, width=12).grid(row=0, column=1, padx=4)
+        ttk.Button(monitor_btn_frame, text="📈 历史曲线", command=self.show_metric_history, width=12).grid(row=2, column=0, pady=(6, 0))
+        ttk.Button(monitor_btn_frame, text="🔔 告警", command=self.show_alerts, width=12).grid(row=2, column=1, pady=(6, 0))
+        ttk.Button(monitor_btn_frame, text="🌐 网络详情", command=self.show_network_detail, width=12).grid(row=3, column=0, columnspan=2, pady=(6, 0))
+        self.alert_status_var = tk.StringVar(value="")
+        alert_status_label = ttk.Label(monitor_btn_frame, textvariable=self.alert_status_var, foreground="#e74c3c",
+                                       font=("Microsoft YaHei", 8), cursor="hand2")
+        alert_status_label.grid(row=4, column=0, columnspan=2, pady=(4, 0))
+        alert_status_label.bind("<Button-1>", lambda e: self.show_alerts())
+        interval_frame = ttk.Frame(monitor_btn_frame)
+        interval_frame.grid(row=1, column=0, columnspan=2, pady=(6, 0))
+        ttk.Label(interval_frame, text="采样间隔(秒):", font=("Microsoft YaHei", 8)).pack(side=tk.LEFT)
+        self.monitor_interval_var = tk.StringVar(value=f"{self.monitor_interval:g}")
+        interval_combo = ttk.Combobox(interval_frame, textvariable=self.monitor_interval_var, width=5,
+                                      values=("0.5", "1", "2", "5", "10"))
+        interval_combo.pack(side=tk.LEFT, padx=4)
+        interval_combo.bind("<<ComboboxSelected>>", lambda e: self.set_monitor_interval(self.monitor_interval_var.get()))
+        interval_combo.bind("<Return>", lambda e: self.set_monitor_interval(self.monitor_interval_var.get()))
         
         # ========== 管理按钮区域（现代化样式）==========
         mgmt_frame = ttk.LabelFrame(left_frame, text="⚙️ 管理工具", padding="8")
@@ -1040,6 +1234,9 @@ GM工具连接信息通知
         ttk.Button(mgmt_frame, text="🎮 游戏服务器管理", command=self.game_server_manage, width=20).grid(row=0, column=0, pady=4)
         ttk.Button(mgmt_frame, text="📁 文件浏览器", command=self.file_browser, width=20).grid(row=1, column=0, pady=4)
         ttk.Button(mgmt_frame, text="💾 数据库管理", command=self.database_manage, width=20).grid(row=2, column=0, pady=4)
+        ttk.Button(mgmt_frame, text="📜 实时日志", command=self.log_tail_viewer, width=20).grid(row=3, column=0, pady=4)
+        ttk.Button(mgmt_frame, text="🖥 多主机监控", command=self.monitor_dashboard, width=20).grid(row=4, column=0, pady=4)
+        ttk.Button(mgmt_frame, text="⚡ 进程列表", command=self.process_viewer, width=20).grid(row=5, column=0, pady=4)
         
         # 右侧面板（可调整大小，使用PanedWindow垂直分割）
         right_paned = ttk.PanedWindow(paned, orient=tk.VERTICAL)
@@ -1151,6 +1348,12 @@ GM工具连接信息通知
         ttk.Label(port_role_frame, text="RoleID:", font=("Microsoft YaHei", 9)).grid(row=0, column=2, sticky=tk.W, padx=(12, 5))
         self.roleid_var = tk.StringVar(value="4097")
         ttk.Entry(port_role_frame, textvariable=self.roleid_var, width=13, font=("Consolas", 9)).grid(row=0, column=3, sticky=tk.W, padx=3)
+        # GM端口状态（监控运行时每次采样探测一次）
+        self.gm_port_status_var = tk.StringVar(value="● 未检测")
+        self.gm_port_status_label = ttk.Label(port_role_frame, textvariable=self.gm_port_status_var, foreground="gray",
+                                              font=("Microsoft YaHei", 8))
+        self.gm_port_status_label.grid(row=0, column=4, sticky=tk.W, padx=(12, 0))
+        self.gm_port_var.trace_add("write", lambda *args: self.on_gm_port_changed())
         
         # 命令选择
         cmd_select_frame = ttk.Frame(gm_frame)
@@ -3532,6 +3735,13 @@ GM工具连接信息通知
         if not port:
             messagebox.showwarning("提示", "端口不能为空")
             return
+        if not port.isdigit():
+            messagebox.showwarning("提示", "端口必须是数字")
+            return
+        # 监控已探测到GM端口无法连接时直接提示，不再等待命令超时
+        if self.gm_port_known_down(int(port)):
+            messagebox.showerror("错误", f"GM端口 {port} 无法连接（游戏进程可能未运行），命令未发送")
+            return
         
         # 获取UserID（从userid_var获取，如果没有则使用默认值）
         userid = "4096"
@@ -3591,6 +3801,8 @@ GM工具连接信息通知
         # 格式: java -jar /path/to/jar "" "" 127.0.0.1 port gm userId=xxx roleId=xxx "command content"
         # 使用shell命令字符串格式
         full_command = f'java -jar {jar_path} "" "" {ip} {port} gm userId={userid} roleId={roleid} "{gm_command_content}"'
+        # 先探测GM端口（同一条命令中，端口无法连接时立即返回，不启动java）
+        full_command = f"{build_port_probe_command(port)} >/dev/null || exit {GM_PORT_DOWN_EXIT}; {full_command}"
         
         # 在后台线程中执行命令
         def execute_gm_command():
@@ -3643,7 +3855,9 @@ GM工具连接信息通知
                     if error:
                         self.output_queue.put(("error", f"{error}\n"))
                     
-                    if exit_status == 0:
+                    if exit_status == GM_PORT_DOWN_EXIT:
+                        messagebox.showerror("错误", f"GM端口 {port} 无法连接（游戏进程可能未运行），命令未发送")
+                    elif exit_status == 0:
                         messagebox.showinfo("成功", "GM命令发送成功！")
                     else:
                         messagebox.showwarning("提示", f"GM命令执行完成，退出码: {exit_status}")
@@ -4851,6 +5065,17 @@ GM工具连接信息通知
         if self.monitoring_active:
             self.stop_monitoring()
         
+        if self.shared_sftp:
+            self.shared_sftp.close()
+            self.shared_sftp = None
+        self.listing_cache.clear()
+        if self.transfer_queue:
+            self.transfer_queue.close()
+            self.transfer_queue = None
+        if self.file_watcher:
+            self.file_watcher.stop()
+            self.file_watcher = None
+        
         if self.shell:
             try:
                 self.shell.close()
@@ -4875,6 +5100,13 @@ GM工具连接信息通知
         if hasattr(self, 'disk_var'):
             self.disk_var.set("0%")
             self.disk_status_var.set("等待连接...")
+        if hasattr(self, 'sys_info_var'):
+            self.sys_info_var.set("")
+        self.last_system_stats = None
+        self.metric_history.clear()
+        self.update_gm_port_status(None)
+        for canvas in self.sparklines.values():
+            canvas.delete("all")
         if hasattr(self, 'cpu_progress'):
             self.cpu_progress['value'] = 0
             self.mem_progress['value'] = 0
@@ -5628,172 +5860,721 @@ GM工具连接信息通知
             self.start_monitoring()
     
     def start_monitoring(self):
-        """开始监控"""
+        """开始监控（一个持续运行的远程采集命令按间隔输出，不再每次采样启动新命令）"""
         self.monitoring_active = True
         if hasattr(self, 'monitor_btn'):
             self.monitor_btn.config(text="停止监控")
         
-        def monitoring_loop():
-            while self.monitoring_active and self.is_connected:
-                try:
-                    self.update_monitoring()
-                    import time
-                    time.sleep(2)
-                except Exception as e:
-                    if self.monitoring_active:
-                        self.root.after(0, lambda: messagebox.showerror("监控错误", f"监控失败: {e}"))
-                    break
+        self.monitor_host_key = self.current_host_key()
+        
+        def on_stats(stats):
+            self.last_system_stats = stats
+            self.metric_history.add(stats)
+            if self.metrics_store:
+                self.metrics_store.add(self.monitor_host_key, stats)
+            self.alert_engine.observe(self.monitor_host_key, stats)
+            self.root.after(0, lambda: self.update_monitoring_ui(stats))
         
-        self.monitoring_thread = threading.Thread(target=monitoring_loop, daemon=True)
-        self.monitoring_thread.start()
+        def on_error(error_msg):
+            # 采集流会自动重新启动，这里只显示状态
+            self.root.after(0, lambda: self.update_monitoring_error(error_msg))
+        
+        self.metrics_stream = MetricsStream(self.client, self.monitor_interval, on_stats, on_error)
+        self.metrics_stream.set_gm_port(self.current_gm_port())
+        self.metrics_stream.start()
     
     def stop_monitoring(self):
         """停止监控"""
         self.monitoring_active = False
+        if self.metrics_stream:
+            self.metrics_stream.stop()
+            self.metrics_stream = None
+        if self.monitor_host_key:
+            self.alert_engine.forget(self.monitor_host_key)
+            self.update_alert_status()
+        self.update_gm_port_status(None)
         if hasattr(self, 'monitor_btn'):
             self.monitor_btn.config(text="开始监控")
     
-    def update_monitoring(self):
-        """更新监控数据（带超时保护，避免阻塞）"""
-        if not self.client or not self.is_connected:
+    def current_gm_port(self):
+        """GM端口设置（不是有效端口号时返回None，不探测）"""
+        try:
+            port = int(self.gm_port_var.get().strip())
+        except (AttributeError, ValueError):
+            return None
+        return port if 0 < port < 65536 else None
+    
+    def on_gm_port_changed(self):
+        """修改了GM端口：监控运行中立即改为探测新端口"""
+        if self.metrics_stream:
+            self.metrics_stream.set_gm_port(self.current_gm_port())
+        self.update_gm_port_status(None)
+    
+    def update_gm_port_status(self, stats):
+        """更新GM端口状态标记（stats 为 None 或未探测当前端口时显示未检测）"""
+        if not hasattr(self, 'gm_port_status_var'):
             return
-        
-        cpu_usage = 0.0
-        mem_usage = 0.0
-        mem_used = 0
-        mem_total = 0
-        disk_usage = 0.0
-        
+        if stats is None or stats.gm_port_up is None or stats.gm_port != self.current_gm_port():
+            self.gm_port_status_var.set("● 未检测")
+            self.gm_port_status_label.config(foreground="gray")
+        elif stats.gm_port_up:
+            latency = f" {stats.gm_latency:.1f}ms" if stats.gm_latency is not None else ""
+            self.gm_port_status_var.set(f"● 正常{latency}")
+            self.gm_port_status_label.config(foreground="#27ae60")
+        else:
+            self.gm_port_status_var.set("● 无法连接")
+            self.gm_port_status_label.config(foreground="#e74c3c")
+    
+    def gm_port_known_down(self, port):
+        """最近一次监控采样探测到该GM端口无法连接（结果在有效时间内）"""
+        stats = self.last_system_stats
+        if not self.monitoring_active or stats is None or stats.gm_port != port or stats.gm_port_up is not False:
+            return False
+        return time.time() - stats.timestamp <= max(GM_PROBE_FRESH, self.monitor_interval * 3)
+    
+    def current_host_key(self):
+        """当前连接的主机标识（用户@地址:端口），与多主机监控和监控数据存储使用的一致"""
+        return connection_key({'host': self.host_var.get(), 'port': self.port_var.get(),
+                               'username': self.username_var.get()})
+    
+    def set_monitor_interval(self, interval):
+        """修改监控采样间隔（秒），监控运行中立即生效"""
         try:
-            import time
-            timeout = 5  # 每个命令最多5秒超时
-            
-            # CPU使用率 - 使用更简单的命令，设置超时
-            try:
-                # 优先使用更快的命令
-                cpu_cmd = "grep 'cpu ' /proc/stat | awk '{usage=($2+$4)*100/($2+$3+$4+$5)} END {print usage}' 2>/dev/null || echo 0"
-                stdin, stdout, stderr = self.client.exec_command(cpu_cmd, timeout=timeout)
-                stdout.channel.settimeout(timeout)
-                
-                start_time = time.time()
-                cpu_output = ""
-                while time.time() - start_time < timeout:
-                    if stdout.channel.recv_ready():
-                        data = stdout.channel.recv(1024)
-                        if data:
-                            cpu_output += data.decode('utf-8', errors='ignore')
-                        else:
-                            break
-                    elif stdout.channel.exit_status_ready():
-                        break
-                    else:
-                        time.sleep(0.1)
-                
-                cpu_output = cpu_output.strip()
-                if cpu_output:
-                    try:
-                        cpu_usage = float(cpu_output)
-                    except:
-                        cpu_usage = 0.0
-                else:
-                    cpu_usage = 0.0
-            except Exception as e:
-                cpu_usage = 0.0
-            
-            # 内存使用情况 - 简化命令，添加超时
-            try:
-                mem_cmd = "free -m 2>/dev/null | grep Mem | awk '{printf \"%.1f %.0f %.0f\", $3/$2*100, $3, $2}' || echo '0 0 0'"
-                stdin, stdout, stderr = self.client.exec_command(mem_cmd, timeout=timeout)
-                stdout.channel.settimeout(timeout)
-                
-                start_time = time.time()
-                mem_output = ""
-                while time.time() - start_time < timeout:
-                    if stdout.channel.recv_ready():
-                        data = stdout.channel.recv(1024)
-                        if data:
-                            mem_output += data.decode('utf-8', errors='ignore')
-                        else:
-                            break
-                    elif stdout.channel.exit_status_ready():
-                        break
-                    else:
-                        time.sleep(0.1)
-                
-                mem_output = mem_output.strip()
-                if mem_output:
-                    parts = mem_output.split()
-                    if len(parts) >= 3:
-                        try:
-                            mem_usage = float(parts[0])
-                            mem_used = int(float(parts[1]))
-                            mem_total = int(float(parts[2]))
-                        except:
-                            pass
-            except Exception as e:
-                pass
-            
-            # 磁盘使用情况 - 简化命令，添加超时
-            try:
-                disk_cmd = "df -h / 2>/dev/null | tail -1 | awk '{print $5}' | sed 's/%//' || echo '0'"
-                stdin, stdout, stderr = self.client.exec_command(disk_cmd, timeout=timeout)
-                stdout.channel.settimeout(timeout)
-                
-                start_time = time.time()
-                disk_output = ""
-                while time.time() - start_time < timeout:
-                    if stdout.channel.recv_ready():
-                        data = stdout.channel.recv(1024)
-                        if data:
-                            disk_output += data.decode('utf-8', errors='ignore')
-                        else:
-                            break
-                    elif stdout.channel.exit_status_ready():
-                        break
-                    else:
-                        time.sleep(0.1)
-                
-                disk_output = disk_output.strip()
-                if disk_output:
-                    try:
-                        disk_usage = float(disk_output)
-                    except:
-                        disk_usage = 0.0
-                else:
-                    disk_usage = 0.0
-            except Exception as e:
-                disk_usage = 0.0
-            
-            # 更新UI（在主线程中执行）
-            self.root.after(0, lambda: self.update_monitoring_ui(cpu_usage, mem_usage, mem_used, mem_total, disk_usage))
-            
-        except Exception as e:
-            # 发生错误时，更新错误状态
-            self.root.after(0, lambda: self.update_monitoring_error(str(e)))
+            interval = max(STREAM_MIN_INTERVAL, float(interval))
+        except (TypeError, ValueError):
+            return
+        self.monitor_interval = interval
+        if self.metrics_stream:
+            self.metrics_stream.set_interval(interval)
+        self.save_client_option('monitor_interval', interval)
     
-    def update_monitoring_ui(self, cpu_usage, mem_usage, mem_used, mem_total, disk_usage):
+    def update_monitoring_ui(self, stats):
         """更新监控UI"""
         if hasattr(self, 'cpu_var') and hasattr(self, 'cpu_progress'):
-            cpu_value = min(100, max(0, cpu_usage))
+            cpu_value = min(100, max(0, stats.cpu_usage))
             self.cpu_var.set(f"{cpu_value:.1f}%")
             self.cpu_progress['value'] = cpu_value
-            self.cpu_status_var.set(f"使用率: {cpu_value:.1f}%")
-            # 根据使用率设置颜色
-            if cpu_value > 80:
-                self.cpu_var.set(f"{cpu_value:.1f}%")
-                # 可以设置进度条颜色
+            self.cpu_status_var.set(f"使用率: {cpu_value:.1f}%  负载: {stats.load[0]:.2f} {stats.load[1]:.2f} {stats.load[2]:.2f}")
         
         if hasattr(self, 'mem_var') and hasattr(self, 'mem_progress'):
-            mem_value = min(100, max(0, mem_usage))
+            mem_value = min(100, max(0, stats.mem_usage))
             self.mem_var.set(f"{mem_value:.1f}%")
             self.mem_progress['value'] = mem_value
-            self.mem_status_var.set(f"{mem_used}MB / {mem_total}MB")
+            self.mem_status_var.set(f"{stats.mem_used // 1024}MB / {stats.mem_total // 1024}MB")
         
         if hasattr(self, 'disk_var') and hasattr(self, 'disk_progress'):
-            disk_value = min(100, max(0, disk_usage))
+            disk_value = min(100, max(0, stats.disk_usage))
             self.disk_var.set(f"{disk_value:.1f}%")
             self.disk_progress['value'] = disk_value
-            self.disk_status_var.set(f"使用率: {disk_value:.1f}%")
+            self.disk_status_var.set(f"{format_bytes(stats.disk_used * 1024)} / {format_bytes(stats.disk_total * 1024)}")
+        
+        self.update_gm_port_status(stats)
+        
+        if hasattr(self, 'sys_info_var'):
+            self.sys_info_var.set(f"网络 ↓{format_bytes(stats.net_rx_rate)}/s ↑{format_bytes(stats.net_tx_rate)}/s  "
+                                  f"TCP {stats.tcp_established}  进程 {stats.procs_total}  运行 {format_uptime(stats.uptime)}")
+        
+        # 最近一段时间的迷你曲线
+        colors = {"cpu": "#27ae60", "mem": "#3498db", "disk": "#9b59b6"}
+        for metric, canvas in self.sparklines.items():
+            points = max(10, canvas.winfo_width() // 2)
+            self._draw_metric_chart(canvas, [self.metric_history.query(metric, SPARKLINE_WINDOW, points)],
+                                    SPARKLINE_WINDOW, maximum=100, colors=(colors[metric],))
+    
+    def _draw_metric_chart(self, canvas, series, window, maximum=None, colors=("#27ae60",), label=None, show_peak=False):
+        """
+        在Canvas上绘制折线（横轴为最近 window 秒）
+        series: 多条曲线，每条为 [(时间, 平均值, 最大值)]；show_peak=True 时用虚线绘制每个点的最大值
+        """
+        canvas.delete("all")
+        width = canvas.winfo_width()
+        height = canvas.winfo_height()
+        if width < 10 or height < 10:
+            return
+        if not maximum:
+            maximum = max((peak for points in series for _, _, peak in points), default=0) or 1
+        now = time.time()
+        pad = 2
+        
+        def coords(points, index):
+            result = []
+            for point in points:
+                x = pad + (width - 2 * pad) * (1 - (now - point[0]) / window)
+                y = height - pad - (height - 2 * pad) * min(1.0, point[index] / maximum)
+                result.extend((x, y))
+            return result
+        
+        for points, color in zip(series, colors):
+            if len(points) < 2:
+                continue
+            if show_peak:
+                canvas.create_line(*coords(points, 2), fill=color, dash=(2, 2))
+            canvas.create_line(*coords(points, 1), fill=color, width=1.5)
+        if label:
+            canvas.create_text(4, 2, text=label, anchor=tk.NW, font=("Microsoft YaHei", 8), fill="#555555")
+    
+    def monitor_dashboard(self):
+        """多主机监控：同时监控连接记录中的所有主机（有限数量的采集线程 + 连接池），可按列排序"""
+        if not HAS_PARAMIKO:
+            messagebox.showerror("错误", "缺少 paramiko 库\n请运行: pip install paramiko")
+            return
+        if not self.connections:
+            messagebox.showinfo("提示", "没有连接记录")
+            return
+        
+        dashboard_window = tk.Toplevel(self.root)
+        dashboard_window.title("多主机监控")
+        dashboard_window.geometry("1000x560")
+        
+        main_frame = ttk.Frame(dashboard_window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        summary_var = tk.StringVar(value="正在连接...")
+        ttk.Label(main_frame, textvariable=summary_var).pack(anchor=tk.W, pady=(0, 5))
+        
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        columns = ("地址", "状态", "CPU", "内存", "磁盘", "负载", "延迟", "更新时间")
+        host_tree = ttk.Treeview(tree_frame, columns=columns, show="tree headings")
+        host_tree.heading("#0", text="名称", command=lambda: sort_by("#0"))
+        host_tree.column("#0", width=160)
+        for col, width in zip(columns, (130, 200, 70, 70, 70, 60, 70, 80)):
+            host_tree.heading(col, text=col, command=lambda c=col: sort_by(c))
+            host_tree.column(col, width=width, anchor=tk.W if col in ("地址", "状态") else tk.E)
+        host_tree.tag_configure("unreachable", foreground="red")
+        host_tree.tag_configure("warning", foreground="#e67e22")
+        host_tree.tag_configure("pending", foreground="gray")
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=host_tree.yview)
+        host_tree.configure(yscrollcommand=scrollbar.set)
+        host_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        def on_sample(host):
+            if host.status != "ok":
+                self.alert_engine.observe_value(host.key, "reachable", 0)
+                return
+            if self.metrics_store:
+                self.metrics_store.add(host.key, host.stats)
+            self.alert_engine.observe(host.key, host.stats)
+        
+        collector = DashboardCollector(self.connections, on_sample=on_sample)
+        collector.start()
+        # 当前排序 (列, 是否降序)
+        sort_state = {'column': None, 'reverse': False}
+        
+        def sort_value(host, column):
+            stats = host.stats if host.status == "ok" else None
+            if column == "#0":
+                return host.name.lower()
+            if column == "地址":
+                return host.host
+            if column == "状态":
+                return {"unreachable": 0, "pending": 1, "ok": 2}[host.status]
+            if column == "延迟":
+                return host.latency if host.latency is not None and stats else float("inf")
+            if column == "更新时间":
+                return host.updated or 0
+            if stats is None:
+                return -1
+            return {"CPU": stats.cpu_usage, "内存": stats.mem_usage, "磁盘": stats.disk_usage,
+                    "负载": stats.load[0]}[column]
+        
+        def sort_by(column):
+            if sort_state['column'] == column:
+                sort_state['reverse'] = not sort_state['reverse']
+            else:
+                # 数值列默认从大到小，便于找出最忙的主机
+                sort_state.update(column=column, reverse=column not in ("#0", "地址", "状态"))
+            refresh()
+        
+        def row_values(host):
+            stats = host.stats
+            updated = datetime.fromtimestamp(host.updated).strftime("%H:%M:%S") if host.updated else "-"
+            if host.status == "pending":
+                return ("连接中...", "-", "-", "-", "-", "-", updated), "pending"
+            if host.status == "unreachable":
+                retry = max(0, int(host.next_due - time.time()))
+                status = f"无法连接（{retry}秒后重试）: {host.error}"
+                if stats is None:
+                    return (status, "-", "-", "-", "-", "-", updated), "unreachable"
+            else:
+                status = "正常"
+            values = (status, f"{stats.cpu_usage:.1f}%", f"{stats.mem_usage:.1f}%", f"{stats.disk_usage:.1f}%",
+                      f"{stats.load[0]:.2f}", f"{host.latency:.0f}ms" if host.latency is not None else "-", updated)
+            if host.status == "unreachable":
+                return values, "unreachable"
+            busy = max(stats.cpu_usage, stats.mem_usage, stats.disk_usage) >= DASHBOARD_WARN_PERCENT
+            return values, "warning" if busy else "ok"
+        
+        def refresh():
+            hosts = collector.snapshot()
+            if sort_state['column']:
+                hosts.sort(key=lambda host: sort_value(host, sort_state['column']), reverse=sort_state['reverse'])
+            for index, host in enumerate(hosts):
+                values, tag = row_values(host)
+                if host_tree.exists(host.key):
+                    host_tree.item(host.key, values=(host.host,) + values, tags=(tag,))
+                    host_tree.move(host.key, "", index)
+                else:
+                    host_tree.insert("", index, iid=host.key, text=host.name, values=(host.host,) + values, tags=(tag,))
+            counts = {"ok": 0, "unreachable": 0, "pending": 0}
+            for host in hosts:
+                counts[host.status] += 1
+            summary_var.set(f"共 {len(hosts)} 台主机：正常 {counts['ok']}，无法连接 {counts['unreachable']}，"
+                            f"连接中 {counts['pending']}    （双击连接该主机）")
+        
+        def tick():
+            try:
+                if not dashboard_window.winfo_exists():
+                    return
+            except tk.TclError:
+                return
+            refresh()
+            dashboard_window.after(DASHBOARD_REFRESH_MS, tick)
+        
+        def connect_selected(event=None):
+            selection = host_tree.selection()
+            if not selection:
+                return
+            for index, conn in enumerate(self.connections):
+                if connection_key(conn) == selection[0]:
+                    self.record_combo.current(index)
+                    self.on_record_selected()
+                    return
+        
+        def on_close():
+            collector.stop()
+            # 不再监控的主机清除告警状态（当前连接的主机仍由监控面板负责）
+            for host in collector.snapshot():
+                if not (self.monitoring_active and host.key == self.monitor_host_key):
+                    self.alert_engine.forget(host.key)
+            self.update_alert_status()
+            dashboard_window.destroy()
+        
+        host_tree.bind("<Double-1>", connect_selected)
+        dashboard_window.protocol("WM_DELETE_WINDOW", on_close)
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X, pady=(8, 0))
+        ttk.Button(btn_frame, text="立即刷新", command=lambda: collector.refresh_now(), width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="重试所选", command=lambda: collector.refresh_now(set(host_tree.selection())),
+                   width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="连接所选", command=connect_selected, width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="关闭", command=on_close, width=12).pack(side=tk.RIGHT, padx=2)
+        tick()
+    
+    def process_viewer(self):
+        """
+        进程列表：在监控的采集命令中附加进程采集（不另开远程命令），
+        按CPU或内存显示前N个进程，java进程高亮并显示命令行；可结束进程、调整优先级
+        """
+        if not self.is_connected or not self.client:
+            messagebox.showwarning("提示", "请先连接SSH服务器")
+            return
+        if self.process_window is not None and self.process_window.winfo_exists():
+            self.process_window.lift()
+            return
+        if not self.monitoring_active:
+            self.start_monitoring()
+        self.metrics_stream.set_processes(True)
+        
+        process_window = tk.Toplevel(self.root)
+        self.process_window = process_window
+        process_window.title("进程列表")
+        process_window.geometry("1000x600")
+        
+        main_frame = ttk.Frame(process_window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        top_frame = ttk.Frame(main_frame)
+        top_frame.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(top_frame, text="排序:").pack(side=tk.LEFT)
+        sort_var = tk.StringVar(value="cpu")
+        ttk.Radiobutton(top_frame, text="CPU", variable=sort_var, value="cpu", command=lambda: refresh(force=True)).pack(side=tk.LEFT, padx=3)
+        ttk.Radiobutton(top_frame, text="内存", variable=sort_var, value="rss", command=lambda: refresh(force=True)).pack(side=tk.LEFT, padx=3)
+        java_only_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(top_frame, text="只显示java进程", variable=java_only_var,
+                        command=lambda: refresh(force=True)).pack(side=tk.LEFT, padx=10)
+        summary_var = tk.StringVar(value="正在采集...")
+        ttk.Label(top_frame, textvariable=summary_var, foreground="gray").pack(side=tk.RIGHT)
+        
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        columns = ("PID", "名称", "状态", "CPU", "内存", "命令行")
+        process_tree = ttk.Treeview(tree_frame, columns=columns, show="headings", selectmode="browse")
+        for col, width in zip(columns, (70, 130, 50, 70, 90, 560)):
+            process_tree.heading(col, text=col)
+            process_tree.column(col, width=width, anchor=tk.E if col in ("PID", "CPU", "内存") else tk.W)
+        process_tree.heading("CPU", text="CPU", command=lambda: (sort_var.set("cpu"), refresh(force=True)))
+        process_tree.heading("内存", text="内存", command=lambda: (sort_var.set("rss"), refresh(force=True)))
+        process_tree.tag_configure("java", foreground="#1f5f99", background="#eaf2fb")
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=process_tree.yview)
+        process_tree.configure(yscrollcommand=scrollbar.set)
+        process_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        last_update = {'timestamp': None}
+        
+        def refresh(force=False):
+            stats = self.last_system_stats
+            if not self.monitoring_active or self.metrics_stream is None:
+                summary_var.set("监控已停止")
+                return
+            if stats is None or stats.processes is None:
+                summary_var.set("正在采集...")
+                return
+            if stats.timestamp == last_update['timestamp'] and not force:
+                return
+            last_update['timestamp'] = stats.timestamp
+            processes = stats.processes
+            if java_only_var.get():
+                processes = [process for process in processes if process.is_java]
+            top = top_processes(processes, sort_var.get(), PROCESS_TOP_N)
+            # 按进程号更新行，刷新时保持选中
+            keep = set()
+            for index, process in enumerate(top):
+                iid = str(process.pid)
+                keep.add(iid)
+                values = (process.pid, process.name, process.state, f"{process.cpu:.1f}%",
+                          format_bytes(process.rss), process.cmdline)
+                tags = ("java",) if process.is_java else ()
+                if process_tree.exists(iid):
+                    process_tree.item(iid, values=values, tags=tags)
+                    process_tree.move(iid, "", index)
+                else:
+                    process_tree.insert("", index, iid=iid, values=values, tags=tags)
+            for iid in process_tree.get_children():
+                if iid not in keep:
+                    process_tree.delete(iid)
+            java_count = sum(1 for process in stats.processes if process.is_java)
+            summary_var.set(f"共 {len(stats.processes)} 个进程，java {java_count} 个    "
+                            f"更新于 {datetime.fromtimestamp(stats.timestamp).strftime('%H:%M:%S')}")
+        
+        def tick():
+            try:
+                if not process_window.winfo_exists():
+                    return
+            except tk.TclError:
+                return
+            # 监控重新开始后采集流是新的，需要重新开启进程采集
+            if self.metrics_stream is not None and not self.metrics_stream.processes:
+                self.metrics_stream.set_processes(True)
+            refresh()
+            process_window.after(PROCESS_REFRESH_MS, tick)
+        
+        def selected_process():
+            selection = process_tree.selection()
+            if not selection:
+                messagebox.showinfo("提示", "请先选择进程", parent=process_window)
+                return None
+            values = process_tree.item(selection[0], "values")
+            return int(values[0]), values[1]
+        
+        def run_action(command, description):
+            client = self.client
+            
+            def worker():
+                try:
+                    stdin, stdout, stderr = client.exec_command(command, timeout=10)
+                    status = stdout.channel.recv_exit_status()
+                    error = stderr.read().decode("utf-8", errors="ignore").strip()
+                    if status != 0:
+                        raise IOError(error or f"退出码 {status}")
+                    self.output_queue.put(("success", f"✓ {description}\n"))
+                except Exception as e:
+                    message = str(e)
+                    self.output_queue.put(("error", f"✗ {description}失败: {message}\n"))
+                    self.root.after(0, lambda: messagebox.showerror("错误", f"{description}失败:\n{message}",
+                                                                    parent=process_window))
+            
+            threading.Thread(target=worker, daemon=True).start()
+        
+        def kill_selected(signal_name):
+            selected = selected_process()
+            if selected is None:
+                return
+            pid, name = selected
+            action = "强制结束" if signal_name == "KILL" else "结束"
+            if not messagebox.askyesno("确认", f"确定要{action}进程 {pid} ({name}) 吗？", parent=process_window):
+                return
+            run_action(f"kill -{signal_name} {pid}", f"{action}进程 {pid} ({name})")
+        
+        def renice_selected():
+            selected = selected_process()
+            if selected is None:
+                return
+            pid, name = selected
+            nice = simpledialog.askinteger("调整优先级", f"进程 {pid} ({name}) 的nice值（-20 ~ 19，越小优先级越高）:",
+                                           parent=process_window, minvalue=-20, maxvalue=19, initialvalue=0)
+            if nice is None:
+                return
+            run_action(f"renice -n {nice} -p {pid}", f"调整进程 {pid} ({name}) 的优先级为 {nice}")
+        
+        def on_close():
+            if self.metrics_stream is not None:
+                self.metrics_stream.set_processes(False)
+            self.process_window = None
+            process_window.destroy()
+        
+        process_window.protocol("WM_DELETE_WINDOW", on_close)
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X, pady=(8, 0))
+        ttk.Button(btn_frame, text="结束进程", command=lambda: kill_selected("TERM"), width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="强制结束", command=lambda: kill_selected("KILL"), width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="调整优先级", command=renice_selected, width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="关闭", command=on_close, width=12).pack(side=tk.RIGHT, padx=2)
+        tick()
+    
+    def show_network_detail(self):
+        """网络详情：各网卡的收发速率、TCP连接数和各监听端口的连接数（来自监控采样），选中一行显示其历史曲线"""
+        if not self.is_connected or not self.client:
+            messagebox.showwarning("提示", "请先连接SSH服务器")
+            return
+        if not self.monitoring_active:
+            self.start_monitoring()
+        
+        network_window = tk.Toplevel(self.root)
+        network_window.title("网络详情")
+        network_window.geometry("820x680")
+        
+        main_frame = ttk.Frame(network_window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        top_frame = ttk.Frame(main_frame)
+        top_frame.pack(fill=tk.X, pady=(0, 5))
+        summary_var = tk.StringVar(value="正在采集...")
+        ttk.Label(top_frame, textvariable=summary_var, font=("Microsoft YaHei", 9, "bold")).pack(side=tk.LEFT)
+        window_var = tk.StringVar(value=HISTORY_WINDOWS[0][0])
+        # 网卡和端口的历史只保存在内存中（最长24小时）
+        window_combo = ttk.Combobox(top_frame, textvariable=window_var, state="readonly", width=8,
+                                    values=[name for name, seconds in HISTORY_WINDOWS if seconds <= 24 * 3600])
+        window_combo.pack(side=tk.RIGHT)
+        ttk.Label(top_frame, text="曲线范围:").pack(side=tk.RIGHT, padx=(0, 5))
+        
+        def make_tree(parent, columns, widths, height):
+            frame = ttk.Frame(parent)
+            frame.pack(fill=tk.BOTH, expand=True, pady=(0, 5))
+            tree = ttk.Treeview(frame, columns=columns, show="headings", height=height, selectmode="browse")
+            for col, width in zip(columns, widths):
+                tree.heading(col, text=col)
+                tree.column(col, width=width, anchor=tk.W if col in (columns[0], "说明") else tk.E)
+            tree.tag_configure("gm", foreground="#1f5f99", background="#eaf2fb")
+            scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            return tree
+        
+        ttk.Label(main_frame, text="网卡:").pack(anchor=tk.W)
+        iface_tree = make_tree(main_frame, ("网卡", "接收速率", "发送速率", "累计接收", "累计发送"), (160, 120, 120, 120, 120), 5)
+        ttk.Label(main_frame, text="监听端口的TCP连接:").pack(anchor=tk.W)
+        port_tree = make_tree(main_frame, ("端口", "已建立连接", "说明"), (120, 120, 300), 6)
+        chart_title_var = tk.StringVar(value="全部网卡 ↓接收 ↑发送")
+        ttk.Label(main_frame, textvariable=chart_title_var).pack(anchor=tk.W)
+        canvas = tk.Canvas(main_frame, height=140, bg="white", highlightthickness=1, highlightbackground="#dddddd")
+        canvas.pack(fill=tk.BOTH, expand=True, pady=(2, 0))
+        # 曲线显示的内容: (标题, 指标列表, 数值格式)
+        chart = {'title': "全部网卡 ↓接收 ↑发送", 'metrics': ("net_rx", "net_tx"), 'format': lambda v: f"{format_bytes(v)}/s"}
+        last_update = {'timestamp': None}
+        
+        def update_rows(tree, rows):
+            """按首列更新行（保持选中）"""
+            keep = set()
+            for index, (values, tags) in enumerate(rows):
+                iid = str(values[0])
+                keep.add(iid)
+                if tree.exists(iid):
+                    tree.item(iid, values=values, tags=tags)
+                    tree.move(iid, "", index)
+                else:
+                    tree.insert("", index, iid=iid, values=values, tags=tags)
+            for iid in tree.get_children():
+                if iid not in keep:
+                    tree.delete(iid)
+        
+        def refresh_tables():
+            stats = self.last_system_stats
+            if stats is None or stats.timestamp == last_update['timestamp']:
+                return
+            last_update['timestamp'] = stats.timestamp
+            summary_var.set(f"TCP 已建立 {stats.tcp_established}  半连接 {stats.tcp_syn_recv}    "
+                            f"↓{format_bytes(stats.net_rx_rate)}/s ↑{format_bytes(stats.net_tx_rate)}/s")
+            iface_rows = []
+            for name, (rx, tx) in sorted(stats.interfaces.items()):
+                rx_rate, tx_rate = stats.interface_rates.get(name, (0.0, 0.0))
+                iface_rows.append(((name, f"{format_bytes(rx_rate)}/s", f"{format_bytes(tx_rate)}/s",
+                                    format_bytes(rx), format_bytes(tx)), ()))
+            update_rows(iface_tree, iface_rows)
+            gm_port = self.current_gm_port()
+            port_rows = []
+            for port, count in sorted(stats.tcp_ports.items(), key=lambda item: (-item[1], item[0])):
+                is_gm = port == gm_port
+                port_rows.append(((port, count, "GM端口" if is_gm else ""), ("gm",) if is_gm else ()))
+            update_rows(port_tree, port_rows)
+        
+        def redraw(event=None):
+            window = dict(HISTORY_WINDOWS)[window_var.get()]
+            points = max(10, canvas.winfo_width() // 3)
+            series = [self.metric_history.query(metric, window, points) for metric in chart['metrics']]
+            latest = "  ".join(chart['format'](values[-1][1]) for values in series if values)
+            peak = max((p for values in series for _, _, p in values), default=0)
+            self._draw_metric_chart(canvas, series, window, colors=("#16a085", "#c0392b"),
+                                    label=f"最近 {latest or '-'}  最大 {chart['format'](peak)}", show_peak=True)
+        
+        def select_chart(title, metrics, value_format):
+            chart.update(title=title, metrics=metrics, format=value_format)
+            chart_title_var.set(title)
+            redraw()
+        
+        def on_iface_selected(event=None):
+            selection = iface_tree.selection()
+            if selection:
+                port_tree.selection_remove(port_tree.selection())
+                name = selection[0]
+                select_chart(f"{name} ↓接收 ↑发送", (f"net_rx:{name}", f"net_tx:{name}"), lambda v: f"{format_bytes(v)}/s")
+        
+        def on_port_selected(event=None):
+            selection = port_tree.selection()
+            if selection:
+                iface_tree.selection_remove(iface_tree.selection())
+                select_chart(f"端口 {selection[0]} 已建立连接数", (f"tcp:{selection[0]}",), lambda v: f"{v:.0f}")
+        
+        def tick():
+            try:
+                if not network_window.winfo_exists():
+                    return
+            except tk.TclError:
+                return
+            refresh_tables()
+            redraw()
+            network_window.after(HISTORY_REFRESH_MS, tick)
+        
+        iface_tree.bind("<<TreeviewSelect>>", on_iface_selected)
+        port_tree.bind("<<TreeviewSelect>>", on_port_selected)
+        window_combo.bind("<<ComboboxSelected>>", redraw)
+        canvas.bind("<Configure>", redraw)
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X, pady=(8, 0))
+        ttk.Button(btn_frame, text="显示总流量", width=12,
+                   command=lambda: (iface_tree.selection_remove(iface_tree.selection()),
+                                    port_tree.selection_remove(port_tree.selection()),
+                                    select_chart("全部网卡 ↓接收 ↑发送", ("net_rx", "net_tx"),
+                                                 lambda v: f"{format_bytes(v)}/s"))).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="TCP连接数", width=12,
+                   command=lambda: select_chart("TCP 已建立连接数", ("tcp_est",), lambda v: f"{v:.0f}")).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="关闭", command=network_window.destroy, width=12).pack(side=tk.RIGHT, padx=2)
+        network_window.after(100, tick)
+    
+    def show_metric_history(self):
+        """
+        监控历史曲线
+        正在监控的主机最近1小时使用内存中的采样，其他主机和更长的范围从本地存储查询（自动选择精度）；
+        按窗口宽度降采样
+        """
+        history_window = tk.Toplevel(self.root)
+        history_window.title("监控历史")
+        history_window.geometry("800x780")
+        
+        main_frame = ttk.Frame(history_window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        top_frame = ttk.Frame(main_frame)
+        top_frame.pack(fill=tk.X)
+        ttk.Label(top_frame, text="主机:").pack(side=tk.LEFT)
+        host_keys = self.metrics_store.hosts() if self.metrics_store else []
+        live_key = self.monitor_host_key if self.monitoring_active else None
+        if live_key and live_key not in host_keys:
+            host_keys.insert(0, live_key)
+        host_var = tk.StringVar(value=live_key or (host_keys[0] if host_keys else ""))
+        host_combo = ttk.Combobox(top_frame, textvariable=host_var, values=host_keys, state="readonly", width=32)
+        host_combo.pack(side=tk.LEFT, padx=5)
+        ttk.Label(top_frame, text="时间范围:").pack(side=tk.LEFT, padx=(10, 0))
+        window_names = [name for name, _ in HISTORY_WINDOWS]
+        window_var = tk.StringVar(value=window_names[1])
+        window_combo = ttk.Combobox(top_frame, textvariable=window_var, values=window_names, state="readonly", width=10)
+        window_combo.pack(side=tk.LEFT, padx=5)
+        ttk.Label(top_frame, text="实线为平均值，虚线为区间最大值", foreground="gray").pack(side=tk.LEFT, padx=10)
+        
+        # (标题, 指标列表, 颜色, 固定最大值, 数值格式)
+        charts = [
+            ("CPU使用率", ("cpu",), ("#27ae60",), 100, lambda v: f"{v:.1f}%"),
+            ("内存使用", ("mem",), ("#3498db",), 100, lambda v: f"{v:.1f}%"),
+            ("磁盘使用", ("disk",), ("#9b59b6",), 100, lambda v: f"{v:.1f}%"),
+            ("系统负载(1分钟)", ("load",), ("#e67e22",), None, lambda v: f"{v:.2f}"),
+            ("网络 ↓接收 ↑发送", ("net_rx", "net_tx"), ("#16a085", "#c0392b"), None, lambda v: f"{format_bytes(v)}/s"),
+            ("GM端口延迟", ("gm_latency",), ("#d35400",), None, lambda v: f"{v:.2f}ms"),
+        ]
+        canvases = []
+        for _ in charts:
+            canvas = tk.Canvas(main_frame, height=100, bg="white", highlightthickness=1, highlightbackground="#dddddd")
+            canvas.pack(fill=tk.BOTH, expand=True, pady=4)
+            canvases.append(canvas)
+        
+        def uses_store(host_key, window):
+            live = host_key == self.monitor_host_key and self.monitoring_active and window <= 3600
+            return not live and self.metrics_store is not None and bool(host_key)
+        
+        def query(host_key, metric, window, points):
+            if not uses_store(host_key, window):
+                if host_key == self.monitor_host_key and self.monitoring_active:
+                    return self.metric_history.query(metric, window, points)
+                return []
+            now = time.time()
+            return self.metrics_store.query(host_key, metric, now - window, now, points)
+        
+        # SQLite查询在后台线程中执行；同一时间只有一个查询，期间的刷新请求合并为一次
+        query_state = {'running': False, 'pending': False}
+        
+        def redraw(event=None):
+            if query_state['running']:
+                query_state['pending'] = True
+                return
+            window = dict(HISTORY_WINDOWS)[window_var.get()]
+            host_key = host_var.get()
+            requests = [(metrics, max(10, canvas.winfo_width() // 3)) for canvas, (_, metrics, _, _, _)
+                        in zip(canvases, charts)]
+            query_state['running'] = True
+            
+            def worker():
+                try:
+                    if uses_store(host_key, window):
+                        # 等待缓冲中的采样写入，查询结果包含最新的数据
+                        self.metrics_store.flush(timeout=HISTORY_FLUSH_WAIT)
+                    results = [[query(host_key, metric, window, points) for metric in metrics]
+                               for metrics, points in requests]
+                except Exception as e:
+                    print(f"查询监控历史失败: {e}")
+                    results = None
+                self.root.after(0, lambda: draw(window, results))
+            
+            threading.Thread(target=worker, daemon=True).start()
+        
+        def draw(window, results):
+            query_state['running'] = False
+            try:
+                if not history_window.winfo_exists():
+                    return
+            except tk.TclError:
+                return
+            if results is not None:
+                for canvas, (title, metrics, colors, maximum, fmt), series in zip(canvases, charts, results):
+                    latest = "  ".join(fmt(values[-1][1]) for values in series if values)
+                    peak = max((p for values in series for _, _, p in values), default=0)
+                    label = f"{title}  最近 {latest or '-'}  最大 {fmt(peak)}"
+                    self._draw_metric_chart(canvas, series, window, maximum=maximum, colors=colors,
+                                            label=label, show_peak=True)
+            if query_state['pending']:
+                query_state['pending'] = False
+                redraw()
+        
+        def tick():
+            try:
+                if not history_window.winfo_exists():
+                    return
+            except tk.TclError:
+                return
+            redraw()
+            history_window.after(HISTORY_REFRESH_MS, tick)
+        
+        window_combo.bind("<<ComboboxSelected>>", redraw)
+        host_combo.bind("<<ComboboxSelected>>", redraw)
+        for canvas in canvases:
+            canvas.bind("<Configure>", redraw)
+        history_window.after(100, tick)
     
     def update_monitoring_error(self, error_msg):
         """更新监控错误信息"""
@@ -5806,6 +6587,253 @@ GM工具连接信息通知
         if hasattr(self, 'disk_var'):
             self.disk_var.set("错误")
             self.disk_status_var.set("获取失败")
+        if hasattr(self, 'sys_info_var'):
+            self.sys_info_var.set(f"获取失败: {error_msg}")
+        if self.monitoring_active and self.monitor_host_key:
+            self.alert_engine.observe_value(self.monitor_host_key, "reachable", 0)
+    
+    def on_alert_event(self, event):
+        """告警或恢复：写入日志、显示提示窗口、更新告警数量"""
+        time_text = datetime.fromtimestamp(event.timestamp).strftime("%H:%M:%S")
+        tag = event.rule.level if event.kind == "fire" else "success"
+        self.output_queue.put((tag, f"{time_text} {event.message}\n"))
+        self.update_alert_status()
+        if event.kind == "fire":
+            self.show_alert_toast(event)
+    
+    def update_alert_status(self):
+        if hasattr(self, 'alert_status_var'):
+            count = len(self.alert_engine.active())
+            self.alert_status_var.set(f"⚠ {count} 条告警（点击查看）" if count else "")
+    
+    def show_alert_toast(self, event):
+        """在屏幕右下角显示告警提示，几秒后自动关闭（同时显示的数量有限）"""
+        self.alert_toasts = [toast for toast in self.alert_toasts if toast.winfo_exists()]
+        if len(self.alert_toasts) >= ALERT_TOAST_MAX:
+            return
+        toast = tk.Toplevel(self.root)
+        toast.overrideredirect(True)
+        toast.attributes("-topmost", True)
+        color = "#e74c3c" if event.rule.level == "error" else "#e67e22"
+        frame = tk.Frame(toast, bg=color, padx=2, pady=2)
+        frame.pack(fill=tk.BOTH, expand=True)
+        body = tk.Frame(frame, bg="white", padx=10, pady=6)
+        body.pack(fill=tk.BOTH, expand=True)
+        tk.Label(body, text=f"⚠ {event.rule.name}", bg="white", fg=color,
+                 font=("Microsoft YaHei", 10, "bold")).pack(anchor=tk.W)
+        tk.Label(body, text=f"{event.host}\n{event.rule.describe()}（当前 {format_metric_value(event.rule.metric, event.value)}）",
+                 bg="white", justify=tk.LEFT, font=("Microsoft YaHei", 9)).pack(anchor=tk.W)
+        
+        def close(e=None):
+            try:
+                toast.destroy()
+            except tk.TclError:
+                pass
+        
+        def open_alerts(e=None):
+            close()
+            self.show_alerts()
+        
+        for widget in (toast, frame, body) + tuple(body.winfo_children()):
+            widget.bind("<Button-1>", open_alerts)
+        toast.update_idletasks()
+        width, height = toast.winfo_reqwidth(), toast.winfo_reqheight()
+        offset = sum(other.winfo_height() + 8 for other in self.alert_toasts)
+        x = self.root.winfo_screenwidth() - width - 20
+        y = self.root.winfo_screenheight() - height - 60 - offset
+        toast.geometry(f"+{x}+{y}")
+        self.alert_toasts.append(toast)
+        toast.after(ALERT_TOAST_MS, close)
+    
+    def show_alerts(self):
+        """告警窗口：正在告警的主机、最近的告警记录和告警规则设置"""
+        alerts_window = tk.Toplevel(self.root)
+        alerts_window.title("监控告警")
+        alerts_window.geometry("820x620")
+        
+        notebook = ttk.Notebook(alerts_window)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        def make_tree(parent, columns, widths):
+            frame = ttk.Frame(parent)
+            frame.pack(fill=tk.BOTH, expand=True)
+            tree = ttk.Treeview(frame, columns=columns, show="headings")
+            for col, width in zip(columns, widths):
+                tree.heading(col, text=col)
+                tree.column(col, width=width, anchor=tk.W)
+            tree.tag_configure("error", foreground="red")
+            tree.tag_configure("warning", foreground="#e67e22")
+            tree.tag_configure("resolve", foreground="#27ae60")
+            tree.tag_configure("disabled", foreground="gray")
+            scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            return tree
+        
+        # 当前告警和最近记录
+        active_tab = ttk.Frame(notebook, padding="5")
+        notebook.add(active_tab, text="当前告警")
+        active_tree = make_tree(active_tab, ("主机", "规则", "条件", "当前值", "开始时间"), (180, 120, 220, 90, 140))
+        ttk.Label(active_tab, text="最近记录:").pack(anchor=tk.W, pady=(8, 2))
+        events_tree = make_tree(active_tab, ("时间", "类型", "主机", "内容"), (140, 50, 180, 380))
+        
+        # 按主机和规则（当前告警）、按事件（最近记录）更新行，保留用户的选择和滚动位置
+        event_rows = {}  # {AlertEvent: 行id}
+        
+        def refresh():
+            active_rows = {}
+            for event in self.alert_engine.active():
+                active_rows[f"{event.host}\n{event.rule.name}"] = (event.rule.level, (
+                    event.host, event.rule.name, event.rule.describe(),
+                    format_metric_value(event.rule.metric, event.value),
+                    datetime.fromtimestamp(event.timestamp).strftime("%Y-%m-%d %H:%M:%S")))
+            stale = [iid for iid in active_tree.get_children() if iid not in active_rows]
+            if stale:
+                active_tree.delete(*stale)
+            for index, (iid, (level, values)) in enumerate(active_rows.items()):
+                if active_tree.exists(iid):
+                    active_tree.item(iid, values=values, tags=(level,))
+                    active_tree.move(iid, "", index)
+                else:
+                    active_tree.insert("", index, iid=iid, tags=(level,), values=values)
+            
+            # 最近记录只会追加新事件、淘汰最旧的事件
+            recent = self.alert_engine.recent_events()
+            current = set(recent)
+            for event in [event for event in event_rows if event not in current]:
+                events_tree.delete(event_rows.pop(event))
+            for event in recent:
+                if event in event_rows:
+                    continue
+                kind = "告警" if event.kind == "fire" else "恢复"
+                event_rows[event] = events_tree.insert(
+                    "", 0, tags=(event.rule.level if event.kind == "fire" else "resolve",), values=(
+                        datetime.fromtimestamp(event.timestamp).strftime("%Y-%m-%d %H:%M:%S"), kind, event.host,
+                        event.message))
+        
+        def tick():
+            try:
+                if not alerts_window.winfo_exists():
+                    return
+            except tk.TclError:
+                return
+            refresh()
+            alerts_window.after(ALERTS_REFRESH_MS, tick)
+        
+        # 规则设置
+        rules_tab = ttk.Frame(notebook, padding="5")
+        notebook.add(rules_tab, text="告警规则")
+        rules_tree = make_tree(rules_tab, ("启用", "名称", "条件", "级别"), (50, 160, 420, 80))
+        rules = list(self.alert_engine.rules)
+        metric_names = {label: metric for metric, (label, _) in ALERT_METRICS.items()}
+        level_names = {"warning": "警告", "error": "严重"}
+        
+        def refresh_rules():
+            rules_tree.delete(*rules_tree.get_children())
+            for index, rule in enumerate(rules):
+                rules_tree.insert("", tk.END, iid=str(index), tags=(() if rule.enabled else ("disabled",)),
+                                  values=("✓" if rule.enabled else "", rule.name, rule.describe(), level_names[rule.level]))
+        
+        def apply_rules():
+            self.set_alert_rules(rules)
+            refresh_rules()
+        
+        def edit_rule(index=None):
+            rule = rules[index] if index is not None else None
+            dialog = tk.Toplevel(alerts_window)
+            dialog.title("编辑告警规则" if rule else "添加告警规则")
+            dialog.transient(alerts_window)
+            dialog.grab_set()
+            frame = ttk.Frame(dialog, padding="15")
+            frame.pack(fill=tk.BOTH, expand=True)
+            name_var = tk.StringVar(value=rule.name if rule else "")
+            metric_var = tk.StringVar(value=ALERT_METRICS[rule.metric][0] if rule else ALERT_METRICS["cpu"][0])
+            op_var = tk.StringVar(value=rule.op if rule else ">")
+            threshold_var = tk.StringVar(value=f"{rule.threshold:g}" if rule else "90")
+            duration_var = tk.StringVar(value=f"{rule.duration:g}" if rule else "60")
+            level_var = tk.StringVar(value=level_names[rule.level] if rule else level_names["warning"])
+            fields = (
+                ("名称:", ttk.Entry(frame, textvariable=name_var, width=30)),
+                ("指标:", ttk.Combobox(frame, textvariable=metric_var, values=list(metric_names), state="readonly", width=28)),
+                ("比较:", ttk.Combobox(frame, textvariable=op_var, values=list(ALERT_OPERATORS), state="readonly", width=28)),
+                ("阈值:", ttk.Entry(frame, textvariable=threshold_var, width=30)),
+                ("持续时间(秒):", ttk.Entry(frame, textvariable=duration_var, width=30)),
+                ("级别:", ttk.Combobox(frame, textvariable=level_var, values=[level_names[level] for level in ALERT_LEVELS],
+                                      state="readonly", width=28)),
+            )
+            for row, (label, widget) in enumerate(fields):
+                ttk.Label(frame, text=label).grid(row=row, column=0, sticky=tk.W, pady=4)
+                widget.grid(row=row, column=1, sticky=tk.W, pady=4, padx=5)
+            ttk.Label(frame, text="主机连接、GM端口：正常为1，无法连接为0（如“< 1”）",
+                      foreground="gray").grid(row=len(fields), column=0, columnspan=2, sticky=tk.W)
+            
+            def save():
+                name = name_var.get().strip()
+                if not name:
+                    messagebox.showwarning("提示", "请输入名称", parent=dialog)
+                    return
+                if any(other.name == name for i, other in enumerate(rules) if i != index):
+                    messagebox.showwarning("提示", f"已存在名为 {name} 的规则", parent=dialog)
+                    return
+                level = next(level for level, text in level_names.items() if text == level_var.get())
+                try:
+                    new_rule = AlertRule(name, metric_names[metric_var.get()], op_var.get(), float(threshold_var.get()),
+                                         float(duration_var.get() or 0), level, rule.enabled if rule else True)
+                except ValueError:
+                    messagebox.showwarning("提示", "阈值和持续时间必须是数字", parent=dialog)
+                    return
+                if index is None:
+                    rules.append(new_rule)
+                else:
+                    rules[index] = new_rule
+                apply_rules()
+                dialog.destroy()
+            
+            btn_frame = ttk.Frame(frame)
+            btn_frame.grid(row=len(fields) + 1, column=0, columnspan=2, pady=(10, 0))
+            ttk.Button(btn_frame, text="保存", command=save, width=10).pack(side=tk.LEFT, padx=5)
+            ttk.Button(btn_frame, text="取消", command=dialog.destroy, width=10).pack(side=tk.LEFT, padx=5)
+        
+        def selected_index():
+            selection = rules_tree.selection()
+            return int(selection[0]) if selection else None
+        
+        def edit_selected(event=None):
+            index = selected_index()
+            if index is not None:
+                edit_rule(index)
+        
+        def toggle_selected():
+            index = selected_index()
+            if index is not None:
+                rules[index].enabled = not rules[index].enabled
+                apply_rules()
+        
+        def delete_selected():
+            index = selected_index()
+            if index is not None and messagebox.askyesno("确认", f"删除规则 {rules[index].name}？", parent=alerts_window):
+                del rules[index]
+                apply_rules()
+        
+        def restore_defaults():
+            if messagebox.askyesno("确认", "恢复默认的告警规则？", parent=alerts_window):
+                rules[:] = default_alert_rules()
+                apply_rules()
+        
+        rules_tree.bind("<Double-1>", edit_selected)
+        rules_btn_frame = ttk.Frame(rules_tab)
+        rules_btn_frame.pack(fill=tk.X, pady=(8, 0))
+        ttk.Button(rules_btn_frame, text="添加", command=edit_rule, width=10).pack(side=tk.LEFT, padx=2)
+        ttk.Button(rules_btn_frame, text="编辑", command=edit_selected, width=10).pack(side=tk.LEFT, padx=2)
+        ttk.Button(rules_btn_frame, text="启用/停用", command=toggle_selected, width=10).pack(side=tk.LEFT, padx=2)
+        ttk.Button(rules_btn_frame, text="删除", command=delete_selected, width=10).pack(side=tk.LEFT, padx=2)
+        ttk.Button(rules_btn_frame, text="恢复默认", command=restore_defaults, width=10).pack(side=tk.RIGHT, padx=2)
+        ttk.Label(rules_tab, text="修改规则后所有规则重新计时；正在监控的主机和多主机监控中的主机都会检查",
+                  foreground="gray").pack(anchor=tk.W, pady=(5, 0))
+        
+        refresh_rules()
+        tick()
     def manage_users(self):
         """管理SSH登录用户名和密码（连接记录中的用户）"""
         manage_window = tk.Toplevel(self.root)
@@ -6538,11 +7566,1184 @@ nginx -t && nginx -s reload
         ttk.Button(btn_frame, text="创建网站", command=create_site, width=15).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="清空输出", command=lambda: output_text.delete(1.0, tk.END), width=15).pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="关闭", command=manage_window.destroy, width=15).pack(side=tk.RIGHT, padx=5)
-    def file_browser(self):
-        """文件浏览器"""
-        if not self.is_connected:
-            messagebox.showwarning("提示", "请先连接服务器")
-            return
+    def get_shared_sftp(self):
+        """获取当前SSH连接共享的SFTP会话（切换连接后自动重建，并清空目录缓存）"""
+        if self.shared_sftp is None or self.shared_sftp.client is not self.client:
+            if self.shared_sftp:
+                self.shared_sftp.close()
+            self.shared_sftp = SharedSFTPSession(self.client)
+            self.listing_cache.clear()
+        return self.shared_sftp
+    
+    def get_transfer_queue(self):
+        """
+        获取当前连接的并行传输队列（每个并发在同一SSH连接上使用独立的SFTP通道）；
+        大量小文件的目录自动改用 tar 流压缩传输
+        """
+        if self.transfer_queue is None:
+            self.transfer_queue = TransferQueue(self.client.open_sftp, self.transfer_resume_store,
+                                                client=self.client, verify=self.verify_transfers)
+        return self.transfer_queue
+    
+    def get_file_watcher(self):
+        """获取外部编辑器自动同步服务（一个监视器和一个上传线程服务所有文件）"""
+        if self.file_watcher is None:
+            def on_event(level, message, watched):
+                self.output_queue.put((level, message + "\n"))
+                if level == "success":
+                    directory = watched.remote_path.rsplit('/', 1)[0] or "/"
+                    self.listing_cache.invalidate(directory)
+                    # 刷新文件列表中的大小和修改时间（在UI线程中执行）
+                    self.root.after(0, lambda: self.refresh_file_browsers(directory))
+            self.file_watcher = FileWatcher(self.get_shared_sftp, on_event)
+        return self.file_watcher
+    
+    def refresh_file_browsers(self, directory):
+        """重新读取正在显示指定目录的文件浏览器"""
+        for refresh in list(self.browser_refreshers):
+            refresh(directory)
+    
+    def show_watched_files(self, parent=None):
+        """显示自动同步的文件列表（状态、同步次数），可立即同步、强制覆盖或停止监视"""
+        if self.watch_list_window is not None:
+            try:
+                if self.watch_list_window.winfo_exists():
+                    self.watch_list_window.deiconify()
+                    self.watch_list_window.lift()
+                    return
+            except tk.TclError:
+                pass
+        
+        watch_window = tk.Toplevel(parent or self.root)
+        watch_window.title("自动同步的文件")
+        watch_window.geometry("900x350")
+        self.watch_list_window = watch_window
+        
+        main_frame = ttk.Frame(watch_window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        mode_var = tk.StringVar()
+        ttk.Label(main_frame, textvariable=mode_var, foreground="gray").pack(anchor=tk.W)
+        
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        columns = ("本地文件", "状态", "同步次数", "最后同步")
+        watch_tree = ttk.Treeview(tree_frame, columns=columns, show="tree headings")
+        watch_tree.heading("#0", text="远程文件")
+        watch_tree.column("#0", width=280)
+        for col, width in zip(columns, (280, 160, 70, 80)):
+            watch_tree.heading(col, text=col)
+            watch_tree.column(col, width=width)
+        watch_tree.tag_configure("error", foreground="red")
+        watch_tree.tag_configure("conflict", foreground="orange")
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=watch_tree.yview)
+        watch_tree.configure(yscrollcommand=scrollbar.set)
+        watch_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        status_text = {"idle": "监视中", "pending": "等待上传", "uploading": "上传中", "synced": "已同步",
+                       "conflict": "冲突（远程已修改）", "error": "失败"}
+        
+        def selected_paths():
+            return [watch_tree.item(iid, "text") for iid in watch_tree.selection()]
+        
+        def sync_selected(force=False):
+            watcher = self.file_watcher
+            paths = selected_paths()
+            if not watcher or not paths:
+                return
+            if force and not messagebox.askyesno("确认", "将用本地内容覆盖远程文件（忽略远程的修改），是否继续？",
+                                                 parent=watch_window):
+                return
+            for remote_path in paths:
+                watcher.sync_now(remote_path, force)
+        
+        def unwatch_selected():
+            if self.file_watcher:
+                for remote_path in selected_paths():
+                    self.file_watcher.unwatch(remote_path)
+                refresh()
+        
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X)
+        ttk.Button(btn_frame, text="立即同步", command=sync_selected, width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="强制覆盖上传", command=lambda: sync_selected(True), width=14).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="停止监视", command=unwatch_selected, width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="关闭", command=watch_window.destroy, width=12).pack(side=tk.RIGHT, padx=2)
+        
+        def refresh():
+            watcher = self.file_watcher
+            watched_files = watcher.files() if watcher else []
+            if watcher:
+                mode_var.set(f"共 {len(watched_files)} 个文件，"
+                             + ("使用系统文件变化通知" if watcher.use_notifications else "轮询检查（安装 watchdog 可改用系统通知）"))
+            else:
+                mode_var.set("没有自动同步的文件")
+            live = set()
+            for watched in watched_files:
+                iid = watched.remote_path
+                live.add(iid)
+                status = status_text.get(watched.status, watched.status)
+                if watched.error and watched.status == "error":
+                    status = f"失败: {watched.error}"
+                last_sync = datetime.fromtimestamp(watched.last_sync).strftime('%H:%M:%S') if watched.last_sync else ""
+                values = (watched.local_path, status, watched.sync_count, last_sync)
+                if watch_tree.exists(iid):
+                    watch_tree.item(iid, values=values, tags=(watched.status,))
+                else:
+                    watch_tree.insert("", tk.END, iid=iid, text=watched.remote_path, values=values, tags=(watched.status,))
+            for iid in watch_tree.get_children():
+                if iid not in live:
+                    watch_tree.delete(iid)
+        
+        def tick():
+            try:
+                if not watch_window.winfo_exists():
+                    return
+            except tk.TclError:
+                return
+            refresh()
+            watch_window.after(1000, tick)
+        
+        tick()
+    
+    def show_transfer_queue(self, parent=None):
+        """显示传输队列窗口（暂停/继续、取消、重试失败的文件）"""
+        if self.transfer_queue_window is not None:
+            try:
+                if self.transfer_queue_window.winfo_exists():
+                    self.transfer_queue_window.deiconify()
+                    self.transfer_queue_window.lift()
+                    return
+            except tk.TclError:
+                pass
+        
+        queue_window = tk.Toplevel(parent or self.root)
+        queue_window.title("传输队列")
+        queue_window.geometry("1000x450")
+        self.transfer_queue_window = queue_window
+        
+        main_frame = ttk.Frame(queue_window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        summary_var = tk.StringVar(value="队列为空")
+        ttk.Label(main_frame, textvariable=summary_var).pack(anchor=tk.W)
+        total_progress = ttk.Progressbar(main_frame, mode='determinate', maximum=100)
+        total_progress.pack(fill=tk.X, pady=5)
+        
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        columns = ("方向", "大小", "进度", "速度", "状态")
+        queue_tree = ttk.Treeview(tree_frame, columns=columns, show="tree headings")
+        queue_tree.heading("#0", text="文件")
+        queue_tree.column("#0", width=400)
+        for col, width in zip(columns, (60, 90, 70, 90, 260)):
+            queue_tree.heading(col, text=col)
+            queue_tree.column(col, width=width)
+        queue_tree.tag_configure("failed", foreground="red")
+        queue_tree.tag_configure("done", foreground="green")
+        queue_tree.tag_configure("cancelled", foreground="gray")
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=queue_tree.yview)
+        queue_tree.configure(yscrollcommand=scrollbar.set)
+        queue_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        status_text = {"pending": "等待中", "running": "传输中", "verifying": "校验中", "done": "完成",
+                       "failed": "失败", "cancelled": "已取消"}
+        # 上次显示的行内容 {iid: values}，只更新有变化的行
+        shown_rows = {}
+        idle_state = {'idle': True}
+        
+        def selected_ids():
+            return {int(iid) for iid in queue_tree.selection()}
+        
+        def toggle_pause():
+            transfer_queue = self.transfer_queue
+            if not transfer_queue:
+                return
+            if transfer_queue.paused:
+                transfer_queue.resume()
+            else:
+                transfer_queue.pause()
+            refresh()
+        
+        def cancel_selected():
+            if self.transfer_queue and queue_tree.selection():
+                self.transfer_queue.cancel(selected_ids())
+        
+        def cancel_all():
+            if self.transfer_queue and messagebox.askyesno("确认", "是否取消所有未完成的传输？", parent=queue_window):
+                self.transfer_queue.cancel()
+        
+        def retry_failed():
+            if self.transfer_queue:
+                # 有选中时重试选中的条目，否则重试全部失败的条目
+                self.transfer_queue.retry(selected_ids() if queue_tree.selection() else None)
+        
+        def clear_finished():
+            if self.transfer_queue:
+                self.transfer_queue.clear_finished()
+                refresh()
+        
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X, pady=(8, 0))
+        pause_btn = ttk.Button(btn_frame, text="暂停", command=toggle_pause, width=10)
+        pause_btn.pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="取消选中", command=cancel_selected, width=10).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="全部取消", command=cancel_all, width=10).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="重试失败", command=retry_failed, width=10).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="清除已完成", command=clear_finished, width=10).pack(side=tk.LEFT, padx=2)
+        verify_var = tk.BooleanVar(value=self.verify_transfers)
+        ttk.Checkbutton(btn_frame, text="传输后校验（SHA256）", variable=verify_var,
+                        command=lambda: self.set_verify_transfers(verify_var.get())).pack(side=tk.LEFT, padx=10)
+        ttk.Button(btn_frame, text="关闭", command=queue_window.destroy, width=10).pack(side=tk.RIGHT, padx=2)
+        
+        def refresh():
+            transfer_queue = self.transfer_queue
+            items = list(transfer_queue.items) if transfer_queue else []
+            live_iids = set()
+            for item in items:
+                iid = str(item.id)
+                live_iids.add(iid)
+                percent = item.done_bytes * 100.0 / item.size if item.size else (100.0 if item.status == "done" else 0.0)
+                status = status_text.get(item.status, item.status)
+                if item.status == "failed" and item.error:
+                    status = f"失败: {item.error}"
+                elif item.status == "done" and item.note:
+                    status = f"完成（{item.note}）"
+                elif item.status == "pending" and item.note:
+                    status = item.note
+                elif item.attempts > 1 and item.status == "running":
+                    status = f"重试中（第{item.attempts}次）"
+                values = ("下载" if item.direction == FileTransfer.DOWNLOAD else "上传",
+                          format_bytes(item.size), f"{percent:.0f}%",
+                          f"{format_bytes(item.speed)}/s" if item.speed else "", status)
+                if shown_rows.get(iid) == values:
+                    continue
+                if iid in shown_rows:
+                    queue_tree.item(iid, values=values, tags=(item.status,))
+                else:
+                    queue_tree.insert("", tk.END, iid=iid, text=item.name, values=values, tags=(item.status,))
+                shown_rows[iid] = values
+            for iid in list(shown_rows):
+                if iid not in live_iids:
+                    queue_tree.delete(iid)
+                    del shown_rows[iid]
+            
+            if transfer_queue:
+                summary = transfer_queue.summary()
+                total = summary['total_bytes']
+                total_progress['value'] = summary['done_bytes'] * 100.0 / total if total else 0
+                active = summary['pending'] + summary['running'] + summary['verifying']
+                text = (f"完成 {summary['done']}  传输中 {summary['running']}  等待 {summary['pending']}  "
+                        f"失败 {summary['failed']}  已取消 {summary['cancelled']}    "
+                        f"{format_bytes(summary['done_bytes'])} / {format_bytes(total)}")
+                if summary['verifying']:
+                    text += f"    校验中 {summary['verifying']}"
+                if summary['speed']:
+                    text += f"    总速度 {format_bytes(summary['speed'])}/s"
+                if summary['expanding']:
+                    text += "    正在展开目录..."
+                if transfer_queue.paused:
+                    text += "    （已暂停）"
+                summary_var.set(text)
+                pause_btn.config(text="继续" if transfer_queue.paused else "暂停")
+                # 队列全部结束时记录日志
+                idle = active == 0 and summary['expanding'] == 0
+                if idle and not idle_state['idle'] and items:
+                    tag = "error" if summary['failed'] else "success"
+                    self.output_queue.put((tag, f"传输队列完成: 成功 {summary['done']} 个，失败 {summary['failed']} 个\n"))
+                idle_state['idle'] = idle
+            else:
+                summary_var.set("队列为空")
+                total_progress['value'] = 0
+        
+        def tick():
+            try:
+                if not queue_window.winfo_exists():
+                    return
+            except tk.TclError:
+                return
+            refresh()
+            queue_window.after(TRANSFER_QUEUE_REFRESH_MS, tick)
+        
+        tick()
+    
+    def directory_sync(self, parent, remote_root):
+        """目录增量同步（本地 -> 远程）：预览差异后只上传有变化的文件，删除远程多余文件需勾选"""
+        host = self.host_var.get().strip()
+        pairs_file = os.path.join(self.sync_cache_dir, 'pairs.json')
+        try:
+            with open(pairs_file, 'r', encoding='utf-8') as f:
+                sync_pairs = json.load(f)
+        except (OSError, ValueError):
+            sync_pairs = {}
+        
+        sync_window = tk.Toplevel(parent)
+        sync_window.title("目录同步")
+        sync_window.geometry("900x600")
+        sync_window.transient(parent)
+        
+        main_frame = ttk.Frame(sync_window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        option_frame = ttk.Frame(main_frame)
+        option_frame.pack(fill=tk.X)
+        option_frame.columnconfigure(1, weight=1)
+        
+        remote_var = tk.StringVar(value=remote_root)
+        local_var = tk.StringVar(value=sync_pairs.get(f"{host}|{remote_root}", ""))
+        exclude_var = tk.StringVar(value=sync_pairs.get(f"{host}|{remote_root}|exclude", ""))
+        hash_var = tk.BooleanVar(value=False)
+        delete_var = tk.BooleanVar(value=False)
+        
+        def browse_local():
+            directory = filedialog.askdirectory(title="选择本地目录", parent=sync_window)
+            if directory:
+                local_var.set(directory)
+        
+        ttk.Label(option_frame, text="本地目录:").grid(row=0, column=0, sticky=tk.W, pady=2)
+        ttk.Entry(option_frame, textvariable=local_var).grid(row=0, column=1, sticky=(tk.W, tk.E), padx=5)
+        ttk.Button(option_frame, text="浏览", command=browse_local, width=8).grid(row=0, column=2)
+        ttk.Label(option_frame, text="远程目录:").grid(row=1, column=0, sticky=tk.W, pady=2)
+        ttk.Entry(option_frame, textvariable=remote_var).grid(row=1, column=1, sticky=(tk.W, tk.E), padx=5)
+        ttk.Label(option_frame, text="排除:").grid(row=2, column=0, sticky=tk.W, pady=2)
+        ttk.Entry(option_frame, textvariable=exclude_var).grid(row=2, column=1, sticky=(tk.W, tk.E), padx=5)
+        ttk.Label(option_frame, text="如 *.log, runtime/", foreground="gray").grid(row=2, column=2, sticky=tk.W)
+        check_frame = ttk.Frame(option_frame)
+        check_frame.grid(row=3, column=0, columnspan=3, sticky=tk.W, pady=2)
+        ttk.Checkbutton(check_frame, text="修改时间不同时比较内容哈希（SHA256）", variable=hash_var).pack(side=tk.LEFT)
+        ttk.Checkbutton(check_frame, text="删除远程多余文件", variable=delete_var).pack(side=tk.LEFT, padx=15)
+        
+        status_var = tk.StringVar(value="点击“预览差异”查看需要同步的文件（不会修改任何文件）")
+        ttk.Label(main_frame, textvariable=status_var).pack(anchor=tk.W, pady=5)
+        
+        tree_frame = ttk.Frame(main_frame)
+        tree_frame.pack(fill=tk.BOTH, expand=True)
+        columns = ("操作", "原因", "本地大小", "远程大小")
+        plan_tree = ttk.Treeview(tree_frame, columns=columns, show="tree headings")
+        plan_tree.heading("#0", text="文件")
+        plan_tree.column("#0", width=420)
+        for col, width in zip(columns, (60, 100, 100, 100)):
+            plan_tree.heading(col, text=col)
+            plan_tree.column(col, width=width)
+        plan_tree.tag_configure(ACTION_DELETE, foreground="red")
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=plan_tree.yview)
+        plan_tree.configure(yscrollcommand=scrollbar.set)
+        plan_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # 最近一次预览的计划及其参数（参数变化后需要重新预览）
+        plan_state = {'params': None, 'actions': None, 'summary': None, 'busy': False}
+        
+        def current_params():
+            local_root = os.path.normpath(local_var.get().strip()) if local_var.get().strip() else ""
+            remote = remote_var.get().strip().rstrip('/') or "/"
+            return (local_root, remote, exclude_var.get().strip(), hash_var.get(), delete_var.get())
+        
+        def show_plan(params, actions, summary):
+            plan_state.update(params=params, actions=actions, summary=summary, busy=False)
+            plan_tree.delete(*plan_tree.get_children())
+            for action in actions:
+                plan_tree.insert("", tk.END, text=action.rel_path, values=(
+                    "上传" if action.action == ACTION_UPLOAD else "删除", action.reason,
+                    format_bytes(action.local_size) if action.local_size is not None else "",
+                    format_bytes(action.remote_size) if action.remote_size is not None else ""),
+                    tags=(action.action,))
+            text = (f"本地 {summary['local_files']} 个文件，远程 {summary['remote_files']} 个文件，"
+                    f"未变化 {summary['unchanged']} 个；需上传 {summary['upload']} 个"
+                    f"（{format_bytes(summary['upload_bytes'])}）")
+            if params[4]:
+                text += f"，删除 {summary['delete']} 个"
+            elif summary['extra']:
+                text += f"，远程多余 {summary['extra']} 个（未勾选删除）"
+            status_var.set(text)
+        
+        def compute_plan(on_ready=None):
+            if plan_state['busy']:
+                return
+            params = current_params()
+            local_root, remote, exclude_text, use_hash, delete_extra = params
+            if not local_root or not os.path.isdir(local_root):
+                messagebox.showwarning("提示", "请选择有效的本地目录", parent=sync_window)
+                return
+            plan_state['busy'] = True
+            client = self.client
+            cache = ManifestCache(manifest_cache_path(self.sync_cache_dir, host, local_root, remote))
+            
+            def report(message):
+                self.root.after(0, lambda: status_var.set(message))
+            
+            def worker():
+                try:
+                    actions, summary = build_sync_plan(client, local_root, remote, use_hash, delete_extra,
+                                                       parse_excludes(exclude_text), cache, report)
+                except Exception as e:
+                    error_msg = str(e)
+                    plan_state['busy'] = False
+                    self.root.after(0, lambda: status_var.set(f"比较失败: {error_msg}"))
+                    return
+                
+                def done():
+                    show_plan(params, actions, summary)
+                    if on_ready:
+                        on_ready()
+                self.root.after(0, done)
+            
+            threading.Thread(target=worker, daemon=True).start()
+        
+        def save_pair(params):
+            local_root, remote, exclude_text = params[:3]
+            sync_pairs[f"{host}|{remote}"] = local_root
+            sync_pairs[f"{host}|{remote}|exclude"] = exclude_text
+            try:
+                os.makedirs(self.sync_cache_dir, exist_ok=True)
+                with open(pairs_file, 'w', encoding='utf-8') as f:
+                    json.dump(sync_pairs, f, ensure_ascii=False, indent=2)
+            except OSError:
+                pass
+        
+        def run_sync():
+            if plan_state['params'] != current_params():
+                # 参数变化或尚未预览，先生成计划再执行
+                compute_plan(on_ready=run_sync)
+                return
+            params, actions, summary = plan_state['params'], plan_state['actions'], plan_state['summary']
+            local_root, remote = params[0], params[1]
+            uploads = [action for action in actions if action.action == ACTION_UPLOAD]
+            deletes = [action for action in actions if action.action == ACTION_DELETE]
+            if not uploads and not deletes:
+                messagebox.showinfo("提示", "两边已一致，无需同步", parent=sync_window)
+                return
+            message = f"将上传 {len(uploads)} 个文件（{format_bytes(summary['upload_bytes'])}）"
+            if deletes:
+                message += f"，并删除远程 {len(deletes)} 个文件（不可恢复）"
+            if not messagebox.askyesno("确认同步", message + "\n\n是否继续？", parent=sync_window):
+                return
+            save_pair(params)
+            
+            transfer_queue = self.get_transfer_queue()
+            for action in uploads:
+                transfer_queue.add_upload(os.path.join(local_root, *action.rel_path.split('/')),
+                                          f"{remote.rstrip('/')}/{action.rel_path}")
+            if deletes:
+                client = self.client
+                rel_paths = [action.rel_path for action in deletes]
+                
+                def delete_worker():
+                    try:
+                        delete_remote_files(client, remote, rel_paths)
+                        self.output_queue.put(("success", f"同步：已删除远程 {len(rel_paths)} 个多余文件\n"))
+                    except Exception as e:
+                        self.output_queue.put(("error", f"同步删除失败: {e}\n"))
+                threading.Thread(target=delete_worker, daemon=True).start()
+            self.output_queue.put(("info", f"同步 {local_root} -> {remote}: 上传 {len(uploads)} 个文件，删除 {len(deletes)} 个\n"))
+            # 计划已执行，再次同步前需重新比较
+            plan_state['params'] = None
+            if uploads:
+                self.show_transfer_queue(parent)
+        
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X, pady=(8, 0))
+        ttk.Button(btn_frame, text="预览差异", command=lambda: compute_plan(), width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="开始同步", command=run_sync, width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="关闭", command=sync_window.destroy, width=12).pack(side=tk.RIGHT, padx=2)
+    
+    def disk_usage_analyzer(self, parent, root_path, on_open=None):
+        """
+        磁盘占用分析
+        一条 du 命令（不跨文件系统、限制深度）统计目录大小，另列出子树中最大的文件；
+        结果按大小从大到小显示，可单独重新扫描某个子目录；每台主机的结果缓存在本地并显示扫描时间
+        on_open: 回调 (目录, 要选中的名称)，在文件浏览器中打开
+        """
+        host = self.host_var.get().strip()
+        cache = DiskUsageCache(self.disk_usage_cache_file)
+        
+        usage_window = tk.Toplevel(parent)
+        usage_window.title("磁盘占用分析")
+        usage_window.geometry("1000x650")
+        usage_window.transient(parent)
+        
+        main_frame = ttk.Frame(usage_window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        option_frame = ttk.Frame(main_frame)
+        option_frame.pack(fill=tk.X)
+        root_var = tk.StringVar(value=root_path.rstrip('/') or "/")
+        depth_var = tk.IntVar(value=DISK_USAGE_DEPTH)
+        ttk.Label(option_frame, text="目录:").pack(side=tk.LEFT)
+        root_entry = ttk.Entry(option_frame, textvariable=root_var, width=50)
+        root_entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        ttk.Label(option_frame, text="深度:").pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Spinbox(option_frame, from_=1, to=8, textvariable=depth_var, width=4).pack(side=tk.LEFT, padx=5)
+        
+        status_var = tk.StringVar(value="")
+        ttk.Label(main_frame, textvariable=status_var).pack(anchor=tk.W, pady=5)
+        
+        paned = ttk.PanedWindow(main_frame, orient=tk.HORIZONTAL)
+        paned.pack(fill=tk.BOTH, expand=True)
+        
+        # 左侧：目录树（子目录按大小从大到小，展开时才插入）
+        dir_frame = ttk.LabelFrame(paned, text="目录", padding="5")
+        paned.add(dir_frame, weight=3)
+        columns = ("大小", "占比", "")
+        dir_tree = ttk.Treeview(dir_frame, columns=columns, show="tree headings")
+        dir_tree.heading("#0", text="名称")
+        dir_tree.column("#0", width=260)
+        for col, width in zip(columns, (90, 60, 150)):
+            dir_tree.heading(col, text=col)
+            dir_tree.column(col, width=width, anchor=tk.W)
+        dir_scrollbar = ttk.Scrollbar(dir_frame, orient=tk.VERTICAL, command=dir_tree.yview)
+        dir_tree.configure(yscrollcommand=dir_scrollbar.set)
+        dir_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        dir_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # 右侧：最大的文件
+        file_frame = ttk.LabelFrame(paned, text="最大的文件", padding="5")
+        paned.add(file_frame, weight=2)
+        file_tree = ttk.Treeview(file_frame, columns=("大小",), show="tree headings")
+        file_tree.heading("#0", text="路径")
+        file_tree.column("#0", width=300)
+        file_tree.heading("大小", text="大小")
+        file_tree.column("大小", width=90)
+        file_scrollbar = ttk.Scrollbar(file_frame, orient=tk.VERTICAL, command=file_tree.yview)
+        file_tree.configure(yscrollcommand=file_scrollbar.set)
+        file_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        file_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # 当前结果和正在运行的扫描
+        usage_state = {'tree': None, 'job': None}
+        placeholder = "\0placeholder"
+        
+        def node_values(size_kb, parent_kb):
+            ratio = size_kb / parent_kb if parent_kb else 1.0
+            bar = "█" * max(0, round(ratio * DISK_USAGE_BAR_WIDTH))
+            return (format_bytes(size_kb * 1024), f"{ratio * 100:.1f}%", bar)
+        
+        def populate(path):
+            """插入某个目录的子目录（从大到小），有下级的子目录先放一个占位项"""
+            usage = usage_state['tree']
+            dir_tree.delete(*dir_tree.get_children(path))
+            parent_kb = usage.sizes.get(path, 0)
+            for child, size_kb in usage.children(path):
+                dir_tree.insert(path, tk.END, iid=child, text=posixpath.basename(child),
+                                values=node_values(size_kb, parent_kb))
+                if usage.children(child):
+                    dir_tree.insert(child, tk.END, iid=child + placeholder, text="")
+        
+        def on_tree_open(event=None):
+            path = dir_tree.focus()
+            if dir_tree.exists(path + placeholder):
+                populate(path)
+        
+        def render(open_paths=()):
+            """显示结果；open_paths 中的目录重新展开（子目录刷新后保持展开状态）"""
+            usage = usage_state['tree']
+            dir_tree.delete(*dir_tree.get_children())
+            file_tree.delete(*file_tree.get_children())
+            dir_tree.insert("", tk.END, iid=usage.root, text=usage.root, open=True,
+                            values=node_values(usage.sizes.get(usage.root, 0), 0))
+            populate(usage.root)
+            for path in sorted(open_paths, key=usage.depth_of):
+                if path != usage.root and dir_tree.exists(path):
+                    populate(path)
+                    dir_tree.item(path, open=True)
+            for size_kb, path in usage.files:
+                file_tree.insert("", tk.END, text=path, values=(format_bytes(size_kb * 1024),))
+            scanned = datetime.fromtimestamp(usage.scanned_at).strftime("%Y-%m-%d %H:%M:%S") if usage.scanned_at else "-"
+            status_var.set(f"{usage.root} 共 {format_bytes(usage.sizes.get(usage.root, 0) * 1024)}，"
+                           f"{len(usage.sizes)} 个目录（深度 {usage.max_depth}），扫描时间 {scanned}")
+        
+        def open_paths():
+            return [iid for iid in self._treeview_iids(dir_tree) if dir_tree.item(iid, "open")]
+        
+        def start_scan(path, depth, subtree=False):
+            if usage_state['job'] is not None:
+                return
+            if not self.client or not self.is_connected:
+                messagebox.showwarning("警告", "请先连接SSH服务器", parent=usage_window)
+                return
+            job = DiskUsageJob(self.client, path, depth)
+            usage_state['job'] = job
+            keep_open = open_paths() if subtree else ()
+            status_var.set(f"正在扫描 {path} ...")
+            job.start()
+            
+            def pump():
+                if not usage_window.winfo_exists():
+                    job.cancel()
+                    return
+                while True:
+                    try:
+                        kind, payload = job.results.get_nowait()
+                    except queue.Empty:
+                        usage_window.after(DISK_USAGE_POLL_MS, pump)
+                        return
+                    if kind == "progress":
+                        status_var.set(f"正在扫描 {path} ... 已统计 {payload} 个目录")
+                        continue
+                    usage_state['job'] = None
+                    if kind == "error":
+                        status_var.set(f"扫描失败: {payload}")
+                        return
+                    if subtree and usage_state['tree'] is not None:
+                        usage_state['tree'].replace_subtree(payload)
+                        usage_state['tree'].scanned_at = payload.scanned_at
+                    else:
+                        usage_state['tree'] = payload
+                    cache.put(host, usage_state['tree'])
+                    render(keep_open)
+                    if subtree and dir_tree.exists(path):
+                        dir_tree.see(path)
+                        dir_tree.selection_set(path)
+                    return
+            
+            pump()
+        
+        def scan_all():
+            try:
+                depth = max(1, int(depth_var.get()))
+            except (tk.TclError, ValueError):
+                depth = DISK_USAGE_DEPTH
+            start_scan(root_var.get().strip().rstrip('/') or "/", depth)
+        
+        def refresh_selected():
+            """只重新扫描选中的子目录，深度为该目录以下剩余的层数"""
+            usage = usage_state['tree']
+            selection = dir_tree.selection()
+            if usage is None or not selection:
+                messagebox.showinfo("提示", "请先选择要刷新的目录", parent=usage_window)
+                return
+            path = selection[0]
+            start_scan(path, max(1, usage.max_depth - usage.depth_of(path)), subtree=True)
+        
+        def cancel_scan():
+            job = usage_state['job']
+            if job is not None:
+                job.cancel()
+                usage_state['job'] = None
+                status_var.set("已取消扫描")
+        
+        def open_selected(event=None):
+            """在文件浏览器中打开选中的目录，或跳转到选中文件所在的目录"""
+            if on_open is None:
+                return
+            selection = file_tree.selection()
+            if selection:
+                file_path = file_tree.item(selection[0], "text")
+                on_open(posixpath.dirname(file_path) or "/", posixpath.basename(file_path))
+                return
+            selection = dir_tree.selection()
+            if selection and not selection[0].endswith(placeholder):
+                on_open(selection[0], None)
+        
+        def load_cached():
+            cached = cache.get(host, root_var.get().strip().rstrip('/') or "/")
+            if cached is not None:
+                usage_state['tree'] = cached
+                depth_var.set(cached.max_depth)
+                render()
+            else:
+                status_var.set("点击“扫描”统计目录占用（结果会缓存，下次打开直接显示）")
+        
+        dir_tree.bind("<<TreeviewOpen>>", on_tree_open)
+        file_tree.bind("<Double-1>", open_selected)
+        file_tree.bind("<<TreeviewSelect>>", lambda e: dir_tree.selection_remove(*dir_tree.selection()))
+        dir_tree.bind("<<TreeviewSelect>>", lambda e: file_tree.selection_remove(*file_tree.selection()))
+        root_entry.bind("<Return>", lambda e: load_cached() if cache.get(host, root_var.get().strip().rstrip('/') or "/") else scan_all())
+        usage_window.protocol("WM_DELETE_WINDOW", lambda: (cancel_scan(), usage_window.destroy()))
+        
+        ttk.Button(option_frame, text="扫描", command=scan_all, width=10).pack(side=tk.LEFT, padx=2)
+        ttk.Button(option_frame, text="取消", command=cancel_scan, width=10).pack(side=tk.LEFT, padx=2)
+        btn_frame = ttk.Frame(main_frame)
+        btn_frame.pack(fill=tk.X, pady=(8, 0))
+        ttk.Button(btn_frame, text="刷新所选目录", command=refresh_selected, width=14).pack(side=tk.LEFT, padx=2)
+        if on_open is not None:
+            ttk.Button(btn_frame, text="在文件浏览器中打开", command=lambda: open_selected(), width=18).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="关闭", command=lambda: (cancel_scan(), usage_window.destroy()), width=12).pack(side=tk.RIGHT, padx=2)
+        
+        load_cached()
+    
+    @staticmethod
+    def _treeview_iids(tree, parent=""):
+        """递归列出Treeview中的所有项"""
+        for iid in tree.get_children(parent):
+            yield iid
+            yield from SSHToolGUI._treeview_iids(tree, iid)
+    
+    def log_tail_viewer(self, file_path=None):
+        """
+        实时日志查看器
+        每个日志在独立的exec通道上运行 tail -F，过滤在服务器端完成，只有匹配的行经过网络；
+        收到的行进入有界环形缓冲区，界面定时批量显示；支持暂停、高亮规则和多个标签页
+        """
+        if not self.is_connected:
+            messagebox.showwarning("提示", "请先连接服务器")
+            return
+        if self.tail_window is not None:
+            try:
+                if self.tail_window.winfo_exists():
+                    self.tail_window.deiconify()
+                    self.tail_window.lift()
+                    if file_path and self.tail_open_callback:
+                        self.tail_open_callback(file_path)
+                    return
+            except tk.TclError:
+                pass
+        
+        tail_window = tk.Toplevel(self.root)
+        tail_window.title("实时日志")
+        tail_window.geometry("1100x700")
+        self.tail_window = tail_window
+        
+        # 新建查看
+        new_frame = ttk.LabelFrame(tail_window, text="新建", padding="5")
+        new_frame.pack(fill=tk.X, padx=5, pady=5)
+        path_var = tk.StringVar(value=file_path or "")
+        filter_var = tk.StringVar()
+        regex_var = tk.BooleanVar(value=False)
+        ignore_case_var = tk.BooleanVar(value=True)
+        highlight_var = tk.StringVar(value=TAIL_DEFAULT_HIGHLIGHTS)
+        ttk.Label(new_frame, text="日志文件:").grid(row=0, column=0, sticky=tk.W)
+        path_entry = ttk.Entry(new_frame, textvariable=path_var, width=50)
+        path_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=5)
+        ttk.Label(new_frame, text="过滤:").grid(row=0, column=2, sticky=tk.W)
+        filter_entry = ttk.Entry(new_frame, textvariable=filter_var, width=25)
+        filter_entry.grid(row=0, column=3, sticky=(tk.W, tk.E), padx=5)
+        ttk.Checkbutton(new_frame, text="正则", variable=regex_var).grid(row=0, column=4)
+        ttk.Checkbutton(new_frame, text="忽略大小写", variable=ignore_case_var).grid(row=0, column=5)
+        ttk.Button(new_frame, text="打开", command=lambda: open_tail(), width=8).grid(row=0, column=6, padx=5)
+        ttk.Label(new_frame, text="高亮规则:").grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
+        ttk.Entry(new_frame, textvariable=highlight_var).grid(row=1, column=1, columnspan=3, sticky=(tk.W, tk.E), padx=5, pady=(5, 0))
+        ttk.Label(new_frame, text="关键字:颜色，用逗号分隔", foreground="gray").grid(row=1, column=4, columnspan=3, sticky=tk.W, pady=(5, 0))
+        new_frame.columnconfigure(1, weight=1)
+        
+        tail_notebook = ttk.Notebook(tail_window)
+        tail_notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+        # 每个标签页的状态 {frame: {...}}
+        tabs = {}
+        highlight_rules = []
+        
+        def parse_highlights():
+            """解析高亮规则为 [(关键字, 标签名)]，并配置到所有标签页的文本框"""
+            rules = []
+            for i, part in enumerate(re.split(r'[,，;；]', highlight_var.get())):
+                keyword, _, color = part.strip().rpartition(':')
+                if keyword and color:
+                    rules.append((keyword, f"hl{i}", color.strip()))
+            highlight_rules[:] = rules
+            for tab in tabs.values():
+                for keyword, tag, color in rules:
+                    tab['text'].tag_configure(tag, foreground=color)
+        
+        def open_tail(path=None):
+            path = (path or path_var.get()).strip()
+            if not path:
+                messagebox.showwarning("提示", "请输入日志文件路径", parent=tail_window)
+                return
+            pattern = filter_var.get()
+            command = build_tail_command(path, pattern, regex_var.get(), ignore_case_var.get())
+            job = TailJob(self.client, command, TAIL_DISPLAY_LINES)
+            
+            frame = ttk.Frame(tail_notebook)
+            toolbar = ttk.Frame(frame, padding="3")
+            toolbar.pack(fill=tk.X)
+            text_frame = ttk.Frame(frame)
+            text_frame.pack(fill=tk.BOTH, expand=True)
+            log_text = tk.Text(text_frame, wrap=tk.NONE, font=("Consolas", 9), state=tk.DISABLED)
+            y_scroll = ttk.Scrollbar(text_frame, orient=tk.VERTICAL, command=log_text.yview)
+            x_scroll = ttk.Scrollbar(text_frame, orient=tk.HORIZONTAL, command=log_text.xview)
+            log_text.configure(yscrollcommand=y_scroll.set, xscrollcommand=x_scroll.set)
+            y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+            x_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+            log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            
+            tab = {'job': job, 'text': log_text, 'seq': 0, 'dropped': 0, 'paused': False,
+                   'follow': tk.BooleanVar(value=True), 'status': tk.StringVar(value="正在连接...")}
+            tabs[frame] = tab
+            
+            def toggle_pause():
+                tab['paused'] = not tab['paused']
+                pause_btn.config(text="继续" if tab['paused'] else "暂停")
+            
+            def clear_text():
+                log_text.config(state=tk.NORMAL)
+                log_text.delete("1.0", tk.END)
+                log_text.config(state=tk.DISABLED)
+            
+            pause_btn = ttk.Button(toolbar, text="暂停", command=toggle_pause, width=8)
+            pause_btn.pack(side=tk.LEFT, padx=2)
+            ttk.Button(toolbar, text="清屏", command=clear_text, width=8).pack(side=tk.LEFT, padx=2)
+            ttk.Checkbutton(toolbar, text="自动滚动", variable=tab['follow']).pack(side=tk.LEFT, padx=5)
+            ttk.Button(toolbar, text="关闭", command=lambda: close_tab(frame), width=8).pack(side=tk.RIGHT, padx=2)
+            ttk.Label(toolbar, textvariable=tab['status'], foreground="gray").pack(side=tk.LEFT, padx=10)
+            
+            title = path.rsplit('/', 1)[-1]
+            tail_notebook.add(frame, text=f"{title} [{pattern}]" if pattern else title)
+            tail_notebook.select(frame)
+            parse_highlights()
+            job.start()
+        
+        def close_tab(frame):
+            tab = tabs.pop(frame, None)
+            if tab:
+                tab['job'].cancel()
+            tail_notebook.forget(frame)
+            frame.destroy()
+        
+        def render(tab):
+            """把新行批量插入文本框（一次insert调用），并限制显示的总行数"""
+            job = tab['job']
+            if tab['paused']:
+                # 暂停期间不显示，缓冲区继续接收（超出容量的旧行被丢弃）
+                waiting = job.received - tab['seq']
+                tab['status'].set(f"已暂停，{waiting} 行等待显示")
+                return
+            lines, tab['seq'], dropped = job.read_new(tab['seq'])
+            tab['dropped'] += dropped
+            log_text = tab['text']
+            if lines:
+                at_bottom = log_text.yview()[1] >= 0.999
+                chunks = []
+                if dropped:
+                    chunks.extend((f"... 省略 {dropped} 行 ...\n", ()))
+                for line in lines:
+                    tag = ()
+                    for keyword, rule_tag, color in highlight_rules:
+                        if keyword in line:
+                            tag = (rule_tag,)
+                            break
+                    chunks.extend((line + "\n", tag))
+                log_text.config(state=tk.NORMAL)
+                log_text.insert(tk.END, *chunks)
+                line_count = int(log_text.index("end-1c").split('.')[0])
+                if line_count > TAIL_DISPLAY_LINES:
+                    log_text.delete("1.0", f"{line_count - TAIL_DISPLAY_LINES + 1}.0")
+                log_text.config(state=tk.DISABLED)
+                if tab['follow'].get() and at_bottom:
+                    log_text.see(tk.END)
+            if job.status == "error":
+                tab['status'].set(f"错误: {job.error}")
+            elif job.status == "stopped":
+                tab['status'].set(f"已结束，共 {job.received} 行")
+            else:
+                dropped_text = f"，省略 {tab['dropped']} 行" if tab['dropped'] else ""
+                tab['status'].set(f"实时中，已接收 {job.received} 行{dropped_text}")
+        
+        def tick():
+            try:
+                if not tail_window.winfo_exists():
+                    return
+            except tk.TclError:
+                return
+            for tab in list(tabs.values()):
+                render(tab)
+            tail_window.after(TAIL_RENDER_MS, tick)
+        
+        def close_window():
+            for frame in list(tabs):
+                close_tab(frame)
+            self.tail_open_callback = None
+            tail_window.destroy()
+        
+        path_entry.bind("<Return>", lambda e: open_tail())
+        filter_entry.bind("<Return>", lambda e: open_tail())
+        tail_window.protocol("WM_DELETE_WINDOW", close_window)
+        self.tail_open_callback = open_tail
+        
+        if file_path:
+            open_tail(file_path)
+        tick()
+    
+    def open_paged_viewer(self, parent, file_path, size):
+        """
+        大文件分页只读查看器
+        按需读取字节范围（LRU缓存页），后台在远程生成稀疏行号索引，支持跳转到行或偏移
+        """
+        viewer_window = tk.Toplevel(parent)
+        viewer_window.title(f"查看: {file_path}")
+        viewer_window.geometry("1000x700")
+        
+        paged_file = PagedRemoteFile(self.client, file_path, size)
+        line_index = LineIndex()
+        index_job = LineIndexJob(self.client, file_path, line_index)
+        requests = queue.Queue()
+        results = queue.Queue()
+        # 当前显示范围 [start, end) 及其起始行号
+        view = {'start': 0, 'end': 0, 'line': 1, 'closed': False}
+        
+        toolbar = ttk.Frame(viewer_window, padding="5")
+        toolbar.pack(fill=tk.X)
+        line_var = tk.StringVar()
+        offset_var = tk.StringVar()
+        
+        status_var = tk.StringVar(value="正在读取...")
+        index_var = tk.StringVar(value="行号索引: 正在生成...")
+        status_frame = ttk.Frame(viewer_window, padding="5")
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        ttk.Label(status_frame, textvariable=status_var).pack(side=tk.LEFT)
+        ttk.Label(status_frame, textvariable=index_var, foreground="gray").pack(side=tk.RIGHT)
+        
+        position_var = tk.DoubleVar(value=0)
+        position_scale = ttk.Scale(viewer_window, from_=0, to=max(size, 1), orient=tk.HORIZONTAL, variable=position_var)
+        position_scale.pack(side=tk.BOTTOM, fill=tk.X, padx=5, pady=(5, 0))
+        
+        text_frame = ttk.Frame(viewer_window)
+        text_frame.pack(fill=tk.BOTH, expand=True, padx=5)
+        viewer_text = tk.Text(text_frame, wrap=tk.NONE, font=("Consolas", 10), state=tk.DISABLED)
+        y_scroll = ttk.Scrollbar(text_frame, orient=tk.VERTICAL, command=viewer_text.yview)
+        x_scroll = ttk.Scrollbar(text_frame, orient=tk.HORIZONTAL, command=viewer_text.xview)
+        viewer_text.configure(yscrollcommand=y_scroll.set, xscrollcommand=x_scroll.set)
+        viewer_text.tag_configure("target", background="yellow")
+        y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        x_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+        viewer_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        def worker():
+            """后台读取：只处理最新的请求，旧请求直接丢弃"""
+            while True:
+                request = requests.get()
+                while not requests.empty():
+                    request = requests.get_nowait()
+                if request is None:
+                    return
+                kind, value = request
+                try:
+                    if kind == "line":
+                        offset = paged_file.find_line_offset(value, line_index)
+                        if offset is None:
+                            results.put(("message", f"第 {value} 行超出文件范围或行号索引尚未到达该位置"))
+                            continue
+                        line, aligned = value, True
+                    else:
+                        offset, line, aligned = value, None, kind == "aligned"
+                    data = paged_file.read_range(offset, VIEWER_WINDOW_BYTES)
+                    if not aligned and offset > 0:
+                        # 任意偏移从下一行开头显示
+                        newline = data.find(b"\n")
+                        if 0 <= newline < len(data) - 1:
+                            offset += newline + 1
+                            data = data[newline + 1:]
+                    if offset + len(data) < size:
+                        # 末尾不完整的行留到下一屏
+                        last_newline = data.rfind(b"\n")
+                        if last_newline >= 0:
+                            data = data[:last_newline + 1]
+                    if line is None:
+                        known_line, known_offset = line_index.line_at(offset)
+                        if offset - known_offset <= VIEWER_LINE_COUNT_MAX_BYTES:
+                            line = known_line + paged_file.read_range(known_offset, offset - known_offset).count(b"\n")
+                    results.put(("page", (offset, offset + len(data), line, kind == "line",
+                                          data.decode('utf-8', errors='replace'))))
+                except Exception as e:
+                    results.put(("message", f"读取失败: {e}"))
+        
+        def request(kind, value):
+            requests.put((kind, value))
+            status_var.set("正在读取...")
+        
+        def show_page(start, end, line, highlight, content):
+            view.update(start=start, end=end, line=line)
+            viewer_text.config(state=tk.NORMAL)
+            viewer_text.delete("1.0", tk.END)
+            viewer_text.insert("1.0", content)
+            if highlight:
+                viewer_text.tag_add("target", "1.0", "1.end")
+            viewer_text.config(state=tk.DISABLED)
+            viewer_text.yview_moveto(0)
+            position_var.set(start)
+            percent = end * 100.0 / size if size else 100.0
+            line_text = f"  起始行: {line}" if line else ""
+            status_var.set(f"偏移 {start} - {end} / {size}（{format_bytes(size)}，{percent:.1f}%）{line_text}")
+        
+        def pump():
+            if view['closed']:
+                return
+            while True:
+                try:
+                    kind, payload = results.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "page":
+                    show_page(*payload)
+                else:
+                    status_var.set(payload)
+            while True:
+                try:
+                    kind, payload = index_job.results.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "progress":
+                    index_var.set(f"行号索引: 已索引约 {payload} 行...")
+                elif kind == "done":
+                    index_var.set(f"共 {payload} 行")
+                else:
+                    index_var.set(f"行号索引失败: {payload}")
+            viewer_window.after(VIEWER_POLL_MS, pump)
+        
+        def go_first():
+            request("aligned", 0)
+        
+        def go_next():
+            if view['end'] < size:
+                request("aligned", view['end'])
+        
+        def go_prev():
+            if view['start'] > 0:
+                request("offset", max(0, view['start'] - VIEWER_WINDOW_BYTES))
+        
+        def go_last():
+            request("offset", max(0, size - VIEWER_WINDOW_BYTES))
+        
+        def go_line(event=None):
+            try:
+                line = int(line_var.get().strip())
+            except ValueError:
+                messagebox.showwarning("提示", "请输入有效的行号", parent=viewer_window)
+                return
+            request("line", line)
+        
+        def go_offset(event=None):
+            try:
+                offset = int(offset_var.get().strip(), 0)
+            except ValueError:
+                messagebox.showwarning("提示", "请输入有效的偏移（支持0x十六进制）", parent=viewer_window)
+                return
+            request("offset", max(0, min(offset, size)))
+        
+        def on_scale_release(event=None):
+            request("offset", int(position_var.get()))
+        
+        def on_page_key(event):
+            """在当前屏的顶部/底部继续翻页时切换到上一屏/下一屏"""
+            if event.keysym == "Next" and viewer_text.yview()[1] >= 1.0:
+                go_next()
+                return "break"
+            if event.keysym == "Prior" and viewer_text.yview()[0] <= 0.0:
+                go_prev()
+                return "break"
+            return None
+        
+        def close_viewer():
+            view['closed'] = True
+            index_job.cancel()
+            requests.put(None)
+            threading.Thread(target=paged_file.close, daemon=True).start()
+            viewer_window.destroy()
+        
+        ttk.Button(toolbar, text="首页", command=go_first, width=8).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="上一页", command=go_prev, width=8).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="下一页", command=go_next, width=8).pack(side=tk.LEFT, padx=2)
+        ttk.Button(toolbar, text="末页", command=go_last, width=8).pack(side=tk.LEFT, padx=2)
+        ttk.Label(toolbar, text="  跳转到行:").pack(side=tk.LEFT)
+        line_entry = ttk.Entry(toolbar, textvariable=line_var, width=12)
+        line_entry.pack(side=tk.LEFT, padx=2)
+        line_entry.bind("<Return>", go_line)
+        ttk.Button(toolbar, text="跳转", command=go_line, width=6).pack(side=tk.LEFT, padx=2)
+        ttk.Label(toolbar, text="  偏移:").pack(side=tk.LEFT)
+        offset_entry = ttk.Entry(toolbar, textvariable=offset_var, width=14)
+        offset_entry.pack(side=tk.LEFT, padx=2)
+        offset_entry.bind("<Return>", go_offset)
+        ttk.Button(toolbar, text="跳转", command=go_offset, width=6).pack(side=tk.LEFT, padx=2)
+        ttk.Label(toolbar, text=f"  文件较大（{format_bytes(size)}），只读分页查看", foreground="gray").pack(side=tk.LEFT)
+        
+        position_scale.bind("<ButtonRelease-1>", on_scale_release)
+        viewer_text.bind("<Next>", on_page_key)
+        viewer_text.bind("<Prior>", on_page_key)
+        viewer_window.protocol("WM_DELETE_WINDOW", close_viewer)
+        
+        threading.Thread(target=worker, daemon=True).start()
+        index_job.start()
+        go_first()
+        pump()
+        return viewer_window
+    
+    def _show_transfer_progress(self, parent, job, title, on_done=None, resumable=True, verify_label="SHA256校验",
+                                extra_detail=None):
+        """
+        显示后台传输的进度窗口（进度、速度、剩余时间），传输成功后调用 on_done(job)
+        resumable: 中断后能否续传（决定取消、失败时的提示）；verify_label: 校验方式的说明
+        extra_detail: 返回附加进度说明的函数（显示在字节数之后）
+        """
+        resume_hint = "\n（已传输的部分会保留，下次可续传）" if resumable else ""
+        progress_window = tk.Toplevel(parent)
+        progress_window.title(title)
+        progress_window.geometry("480x180")
+        progress_window.transient(parent)
+        
+        frame = ttk.Frame(progress_window, padding="15")
+        frame.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(frame, text=job.transfer.name, font=("Microsoft YaHei", 10, "bold")).pack(anchor=tk.W)
+        progress_bar = ttk.Progressbar(frame, length=440, mode='determinate', maximum=100)
+        progress_bar.pack(fill=tk.X, pady=8)
+        detail_var = tk.StringVar(value="准备中...")
+        ttk.Label(frame, textvariable=detail_var).pack(anchor=tk.W)
+        speed_var = tk.StringVar(value="")
+        ttk.Label(frame, textvariable=speed_var, foreground="gray").pack(anchor=tk.W)
+        
+        def on_button():
+            if job.status in ("pending", "running", "verifying"):
+                job.cancel()
+            else:
+                progress_window.destroy()
+        
+        action_btn = ttk.Button(frame, text="取消", command=on_button, width=10)
+        action_btn.pack(anchor=tk.E, pady=(8, 0))
+        
+        def on_close():
+            if job.status in ("pending", "running", "verifying"):
+                if not messagebox.askyesno("确认", f"传输尚未完成，是否取消？{resume_hint}", parent=progress_window):
+                    return
+                job.cancel()
+            progress_window.destroy()
+        
+        progress_window.protocol("WM_DELETE_WINDOW", on_close)
+        
+        def refresh():
+            try:
+                if not progress_window.winfo_exists():
+                    return
+            except tk.TclError:
+                return
+            stats = job.stats
+            progress_bar['value'] = stats.percent
+            detail = f"{format_bytes(stats.done)} / {format_bytes(stats.total)}  ({stats.percent:.1f}%)"
+            if extra_detail:
+                detail += f"  {extra_detail()}"
+            detail_var.set(detail)
+            resumed = f"  （从 {format_bytes(stats.resumed_from)} 处续传）" if stats.resumed_from else ""
+            if job.verify_retries:
+                resumed += f"  （校验不一致，已重新传输{job.verify_retries}次）"
+            
+            if job.status == "verifying":
+                speed_var.set(f"正在{verify_label}...")
+                progress_window.after(TRANSFER_REFRESH_MS, refresh)
+                return
+            if job.status in ("pending", "running"):
+                speed_var.set(f"速度: {format_bytes(stats.speed)}/s  剩余时间: {format_duration(stats.eta)}{resumed}")
+                progress_window.after(TRANSFER_REFRESH_MS, refresh)
+                return
+            
+            action_btn.config(text="关闭")
+            if job.status == "done":
+                verified = f"，{verify_label}通过" if job.verified else ""
+                speed_var.set(f"传输完成{verified}，平均速度: {format_bytes(stats.average_speed)}/s{resumed}")
+                if on_done:
+                    on_done(job)
+            elif job.status == "cancelled":
+                speed_var.set("已取消（再次传输同一文件时可从中断处继续）" if resumable else "已取消")
+            else:
+                speed_var.set(f"传输失败: {job.error}")
+                retry_hint = "\n\n再次传输同一文件时可从中断处继续" if resumable else ""
+                messagebox.showerror("错误", f"传输失败: {job.error}{retry_hint}", parent=progress_window)
+        
+        refresh()
+        return progress_window
+    
+    def file_browser(self):
+        """文件浏览器"""
+        if not self.is_connected:
+            messagebox.showwarning("提示", "请先连接服务器")
+            return
         
         if not self.client:
             messagebox.showerror("错误", "SSH连接未建立")
@@ -6555,6 +8756,8 @@ nginx -t && nginx -s reload
         # 路径变量
         path_var = tk.StringVar(value="/")
         current_file_path = None
+        # 打开时的远程版本和原始内容（保存前检查冲突、只发送改动部分）
+        opened_state = {'version': None, 'data': None}
         
         # 创建Notebook用于文件列表和文件编辑
         notebook = ttk.Notebook(browser_window)
@@ -6584,40 +8787,30 @@ nginx -t && nginx -s reload
         tree = ttk.Treeview(tree_frame, columns=columns, show="tree headings", height=20)
         
         # 排序状态（列名 -> 排序方向: True=升序, False=降序）
-        sort_states = {"#0": True, "大小": True}
+        sort_states = {"#0": True, "大小": True, "修改时间": True}
+        # 列名 -> 目录模型的排序键
+        sort_keys = {"#0": "name", "大小": "size", "修改时间": "mtime"}
+        
+        # 目录内容保存在模型中（紧凑数组），Treeview只显示其中的一部分
+        dir_model = DirectoryModel()
+        # 视图状态:
+        #   virtual: 是否处于虚拟列表模式（目录项超过阈值时只显示可见窗口）
+        #   top: 可见窗口第一行对应的显示行号
+        #   rendered: 普通模式下已插入Treeview的行数
+        #   status: 列表末尾的状态行 (文本, 标签)，如加载中/空目录/错误
+        #   sort: 当前排序 (排序键, 是否降序)
+        #   selected_name: 虚拟模式下选中项的名称（滚动后恢复选中）
+        #   pending_select: 目录加载完成后要选中的名称（搜索结果跳转）
+        view_state = {'virtual': False, 'top': 0, 'rendered': 0, 'status': None, 'sort': None,
+                      'selected_name': None, 'pending_select': None}
+        status_iid = "__status__"
         
         def sort_treeview(col, reverse=False):
-            """对Treeview进行排序"""
-            # 获取所有项目
-            items = []
-            for item in tree.get_children(""):
-                if col == "#0":
-                    # 名称列使用text值
-                    value = tree.item(item, "text")
-                else:
-                    # 其他列使用列值
-                    value = tree.set(item, col)
-                items.append((value, item))
-            
-            # 根据列类型进行排序
-            if col == "#0":  # 名称列（字符串排序，忽略大小写）
-                items.sort(key=lambda t: (not t[0] or t[0].strip() == "", (t[0] or "").lower()), reverse=reverse)
-            elif col == "大小":  # 大小列（数字排序）
-                def parse_size(size_str):
-                    if not size_str or not size_str.strip():
-                        return 0
-                    try:
-                        return int(size_str.strip())
-                    except:
-                        return 0
-                items.sort(key=lambda t: parse_size(t[0]), reverse=reverse)
-            else:
-                # 其他列（字符串排序）
-                items.sort(key=lambda t: (not t[0] or t[0].strip() == "", (t[0] or "").lower()), reverse=reverse)
-            
-            # 重新排列项目
-            for index, (val, item) in enumerate(items):
-                tree.move(item, "", index)
+            """对目录模型排序（使用预先计算的数值键），然后重新显示"""
+            view_state['sort'] = (sort_keys[col], reverse)
+            dir_model.sort(sort_keys[col], reverse)
+            view_state['top'] = 0
+            render_view()
             
             # 更新排序方向
             sort_states[col] = not reverse
@@ -6639,7 +8832,7 @@ nginx -t && nginx -s reload
         tree.heading("类型", text="类型")
         tree.heading("权限", text="权限")
         tree.heading("大小", text="大小", command=lambda: on_column_click("大小"))
-        tree.heading("修改时间", text="修改时间")
+        tree.heading("修改时间", text="修改时间", command=lambda: on_column_click("修改时间"))
         
         tree.column("#0", width=300, anchor=tk.W)
         tree.column("类型", width=80, anchor=tk.CENTER)
@@ -6654,19 +8847,224 @@ nginx -t && nginx -s reload
         tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
+        def visible_row_count():
+            """Treeview当前能显示的行数"""
+            try:
+                rowheight = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+            except (ValueError, tk.TclError):
+                rowheight = 20
+            height = tree.winfo_height()
+            if height <= 1:
+                # 窗口尚未显示，使用配置的高度
+                return int(tree.cget("height"))
+            return max(1, (height - TREEVIEW_HEADING_HEIGHT) // rowheight)
+        
+        def set_status_row(text=None, tag="loading"):
+            """设置列表末尾的状态行（text为None时移除）"""
+            view_state['status'] = (text, tag) if text else None
+            place_status_row()
+        
+        def place_status_row():
+            status = view_state['status']
+            if status is None:
+                if tree.exists(status_iid):
+                    tree.delete(status_iid)
+                return
+            text, tag = status
+            if tree.exists(status_iid):
+                tree.item(status_iid, text=text, values=("", "", "", ""), tags=(tag,))
+                tree.move(status_iid, "", tk.END)
+            else:
+                tree.insert("", tk.END, iid=status_iid, text=text, values=("", "", "", ""), tags=(tag,))
+        
+        def row_slots():
+            """Treeview中用于显示目录项的行（不含状态行）"""
+            return [iid for iid in tree.get_children() if iid != status_iid]
+        
+        def render_view(append_only=False):
+            """根据模型刷新Treeview：行数不多时全部显示，超过阈值时切换为虚拟列表只显示可见窗口"""
+            total = len(dir_model)
+            if total > VIRTUAL_LIST_THRESHOLD:
+                if not view_state['virtual']:
+                    view_state['virtual'] = True
+                    tree.configure(yscrollcommand="")
+                    scrollbar.configure(command=on_virtual_scroll)
+                render_window()
+            else:
+                if view_state['virtual']:
+                    view_state['virtual'] = False
+                    tree.configure(yscrollcommand=scrollbar.set)
+                    scrollbar.configure(command=tree.yview)
+                    append_only = False
+                if not append_only:
+                    slots = row_slots()
+                    if slots:
+                        tree.delete(*slots)
+                    view_state['rendered'] = 0
+                for row in range(view_state['rendered'], total):
+                    values = dir_model.row_values(row)
+                    tree.insert("", tk.END, text=dir_model.name_at(row), values=values, tags=(values[0],))
+                view_state['rendered'] = total
+            place_status_row()
+        
+        def render_window():
+            """虚拟列表模式：只把可见窗口内的目录项写入Treeview（复用已有的行）"""
+            total = len(dir_model)
+            page = visible_row_count()
+            top = max(0, min(view_state['top'], total - page))
+            view_state['top'] = top
+            end = min(total, top + page)
+            
+            slots = row_slots()
+            selected_slot = None
+            for slot, row in enumerate(range(top, end)):
+                name = dir_model.name_at(row)
+                values = dir_model.row_values(row)
+                if slot < len(slots):
+                    tree.item(slots[slot], text=name, values=values, tags=(values[0],))
+                else:
+                    slots.append(tree.insert("", slot, text=name, values=values, tags=(values[0],)))
+                if name == view_state['selected_name']:
+                    selected_slot = slots[slot]
+            if len(slots) > end - top:
+                tree.delete(*slots[end - top:])
+            
+            # 恢复选中项（选中项滚出窗口时暂时取消选中）
+            if selected_slot is not None:
+                tree.selection_set(selected_slot)
+                tree.focus(selected_slot)
+            elif tree.selection():
+                tree.selection_remove(*tree.selection())
+            
+            if total:
+                scrollbar.set(top / total, end / total)
+            else:
+                scrollbar.set(0, 1)
+        
+        def select_entry(name):
+            """选中指定名称的目录项并滚动到可见位置"""
+            row = dir_model.find(name)
+            if row < 0:
+                return False
+            view_state['selected_name'] = name
+            if view_state['virtual']:
+                view_state['top'] = row - visible_row_count() // 2
+                render_window()
+            else:
+                item = row_slots()[row]
+                tree.selection_set(item)
+                tree.focus(item)
+                tree.see(item)
+            tree.focus_set()
+            return True
+        
+        def apply_pending_select():
+            name = view_state['pending_select']
+            view_state['pending_select'] = None
+            if name:
+                select_entry(name)
+        
+        def on_virtual_scroll(*args):
+            """虚拟列表模式下的滚动条命令"""
+            total = len(dir_model)
+            page = visible_row_count()
+            top = view_state['top']
+            if args[0] == "moveto":
+                top = int(float(args[1]) * total)
+            elif args[0] == "scroll":
+                step = page if args[2] == "pages" else 1
+                top += int(args[1]) * step
+            view_state['top'] = top
+            render_window()
+        
+        def on_tree_select(event=None):
+            """记录选中项名称（虚拟模式下滚动时用于恢复选中）"""
+            selection = tree.selection()
+            if selection and selection[0] != status_iid:
+                view_state['selected_name'] = tree.item(selection[0], "text")
+        
+        def on_mouse_wheel(event):
+            if not view_state['virtual']:
+                return None
+            if event.num == 4:
+                delta = -3
+            elif event.num == 5:
+                delta = 3
+            else:
+                delta = -3 if event.delta > 0 else 3
+            on_virtual_scroll("scroll", delta, "units")
+            return "break"
+        
+        def on_virtual_key(event):
+            """虚拟模式下的键盘导航：移动到窗口边缘时滚动模型"""
+            if not view_state['virtual']:
+                return None
+            total = len(dir_model)
+            page = visible_row_count()
+            top = view_state['top']
+            if event.keysym == "Home":
+                row = 0
+            elif event.keysym == "End":
+                row = total - 1
+            else:
+                slots = row_slots()
+                selection = tree.selection()
+                if not selection or selection[0] not in slots:
+                    return None
+                moves = {"Down": 1, "Up": -1, "Next": page, "Prior": -page}
+                row = top + slots.index(selection[0]) + moves[event.keysym]
+            row = max(0, min(row, total - 1))
+            if row < top:
+                top = row
+            elif row >= top + page:
+                top = row - page + 1
+            view_state['top'] = top
+            view_state['selected_name'] = dir_model.name_at(row)
+            render_window()
+            return "break"
+        
+        tree.bind("<<TreeviewSelect>>", on_tree_select)
+        tree.bind("<MouseWheel>", on_mouse_wheel)
+        tree.bind("<Button-4>", on_mouse_wheel)
+        tree.bind("<Button-5>", on_mouse_wheel)
+        for key in ("<Down>", "<Up>", "<Next>", "<Prior>", "<Home>", "<End>"):
+            tree.bind(key, on_virtual_key)
+        tree.bind("<Configure>", lambda e: render_window() if view_state['virtual'] else None)
+        
+
         # 操作按钮
         action_frame = ttk.Frame(list_frame, padding="5")
         action_frame.pack(fill=tk.X)
         ttk.Button(action_frame, text="打开/编辑", command=lambda: open_file(), width=12).pack(side=tk.LEFT, padx=2)
-        ttk.Button(action_frame, text="下载", command=lambda: download_file(), width=12).pack(side=tk.LEFT, padx=2)
-        ttk.Button(action_frame, text="上传", command=lambda: upload_file(), width=12).pack(side=tk.LEFT, padx=2)
         ttk.Button(action_frame, text="Notepad++编辑", command=lambda: edit_with_notepad(), width=14).pack(side=tk.LEFT, padx=2)
+        ttk.Button(action_frame, text="自动同步列表", command=lambda: self.show_watched_files(browser_window), width=14).pack(side=tk.LEFT, padx=2)
+        ttk.Button(action_frame, text="实时查看", command=lambda: tail_selected_file(), width=12).pack(side=tk.LEFT, padx=2)
         ttk.Button(action_frame, text="重命名", command=lambda: rename_file(), width=12).pack(side=tk.LEFT, padx=2)
         ttk.Button(action_frame, text="权限", command=lambda: set_permissions(), width=12).pack(side=tk.LEFT, padx=2)
         ttk.Button(action_frame, text="删除", command=lambda: delete_file(), width=12).pack(side=tk.LEFT, padx=2)
         
-        # 存储Notepad++编辑的文件信息 {remote_path: {'local_path': str, 'last_mtime': float, 'last_sync_mtime': float}}
-        notepad_edit_files = {}
+        # 传输按钮
+        transfer_frame = ttk.Frame(list_frame, padding=(5, 0, 5, 5))
+        transfer_frame.pack(fill=tk.X)
+        ttk.Button(transfer_frame, text="下载", command=lambda: download_file(), width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(transfer_frame, text="上传", command=lambda: upload_file(), width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(transfer_frame, text="上传目录", command=lambda: upload_folder(), width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(transfer_frame, text="同步目录",
+                   command=lambda: self.directory_sync(browser_window, path_var.get().strip().rstrip('/') or "/"),
+                   width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(transfer_frame, text="传输队列", command=lambda: self.show_transfer_queue(browser_window), width=12).pack(side=tk.LEFT, padx=2)
+        ttk.Button(transfer_frame, text="磁盘占用",
+                   command=lambda: self.disk_usage_analyzer(browser_window, path_var.get().strip().rstrip('/') or "/",
+                                                            on_open=open_in_browser),
+                   width=12).pack(side=tk.LEFT, padx=2)
+        
+        def open_in_browser(directory, name=None):
+            """从磁盘占用分析跳转到指定目录（并选中文件）"""
+            view_state['pending_select'] = name
+            path_var.set(directory)
+            notebook.select(0)
+            browser_window.lift()
+            browse_path(use_cache=True)
         
         def debug_output():
             """调试：显示原始输出"""
@@ -6733,8 +9131,207 @@ nginx -t && nginx -s reload
         file_content_text = scrolledtext.ScrolledText(edit_frame, wrap=tk.WORD, font=("Consolas", 10), height=30)
         file_content_text.pack(fill=tk.BOTH, expand=True)
         
-        def browse_path():
-            # 浏览指定路径
+        # 标签页3: 远程搜索（find/grep 在服务器上执行，结果边到达边显示）
+        search_frame = ttk.Frame(notebook, padding="10")
+        notebook.add(search_frame, text="搜索")
+        
+        search_form = ttk.Frame(search_frame)
+        search_form.pack(fill=tk.X)
+        search_form.columnconfigure(1, weight=1)
+        
+        ttk.Label(search_form, text="起始目录:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=3)
+        search_root_var = tk.StringVar(value="/")
+        ttk.Entry(search_form, textvariable=search_root_var).grid(row=0, column=1, columnspan=3, sticky=(tk.W, tk.E), padx=5, pady=3)
+        
+        ttk.Label(search_form, text="文件名:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=3)
+        search_name_var = tk.StringVar()
+        search_name_entry = ttk.Entry(search_form, textvariable=search_name_var)
+        search_name_entry.grid(row=1, column=1, sticky=(tk.W, tk.E), padx=5, pady=3)
+        ttk.Label(search_form, text="（支持通配符，如 *.xml）", foreground="gray").grid(row=1, column=2, columnspan=2, sticky=tk.W, padx=5)
+        
+        ttk.Label(search_form, text="文件内容:").grid(row=2, column=0, sticky=tk.W, padx=5, pady=3)
+        search_content_var = tk.StringVar()
+        search_content_entry = ttk.Entry(search_form, textvariable=search_content_var)
+        search_content_entry.grid(row=2, column=1, sticky=(tk.W, tk.E), padx=5, pady=3)
+        search_ignore_case_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(search_form, text="忽略大小写", variable=search_ignore_case_var).grid(row=2, column=2, sticky=tk.W, padx=5)
+        
+        search_limit_frame = ttk.Frame(search_form)
+        search_limit_frame.grid(row=3, column=0, columnspan=4, sticky=tk.W, pady=3)
+        ttk.Label(search_limit_frame, text="最大深度:").pack(side=tk.LEFT, padx=5)
+        search_depth_var = tk.StringVar(value="5")
+        ttk.Spinbox(search_limit_frame, from_=1, to=50, textvariable=search_depth_var, width=5).pack(side=tk.LEFT)
+        ttk.Label(search_limit_frame, text="跳过大于(KB)的文件:").pack(side=tk.LEFT, padx=(15, 5))
+        search_size_var = tk.StringVar(value="1024")
+        ttk.Entry(search_limit_frame, textvariable=search_size_var, width=8).pack(side=tk.LEFT)
+        ttk.Label(search_limit_frame, text="（0 表示不限制）", foreground="gray").pack(side=tk.LEFT, padx=5)
+        
+        search_btn_frame = ttk.Frame(search_frame)
+        search_btn_frame.pack(fill=tk.X, pady=5)
+        search_start_btn = ttk.Button(search_btn_frame, text="搜索", command=lambda: start_search(), width=10)
+        search_start_btn.pack(side=tk.LEFT, padx=5)
+        search_cancel_btn = ttk.Button(search_btn_frame, text="取消", command=lambda: cancel_search(), width=10, state='disabled')
+        search_cancel_btn.pack(side=tk.LEFT, padx=5)
+        search_status_var = tk.StringVar(value="")
+        ttk.Label(search_btn_frame, textvariable=search_status_var, foreground="gray").pack(side=tk.LEFT, padx=10)
+        
+        search_tree_frame = ttk.Frame(search_frame)
+        search_tree_frame.pack(fill=tk.BOTH, expand=True)
+        search_tree = ttk.Treeview(search_tree_frame, columns=("行号", "内容"), show="tree headings")
+        search_tree.heading("#0", text="路径")
+        search_tree.heading("行号", text="行号")
+        search_tree.heading("内容", text="匹配内容")
+        search_tree.column("#0", width=450, anchor=tk.W)
+        search_tree.column("行号", width=60, anchor=tk.E)
+        search_tree.column("内容", width=400, anchor=tk.W)
+        search_scrollbar = ttk.Scrollbar(search_tree_frame, orient=tk.VERTICAL, command=search_tree.yview)
+        search_tree.configure(yscrollcommand=search_scrollbar.set)
+        search_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        search_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        ttk.Label(search_frame, text="双击结果跳转到文件所在目录", foreground="gray").pack(anchor=tk.W, pady=(5, 0))
+        
+        search_state = {'job': None, 'auto_root': "/"}
+        
+        def cancel_search():
+            """取消正在进行的搜索"""
+            job = search_state['job']
+            search_state['job'] = None
+            if job is not None:
+                job.cancel()
+                search_status_var.set(f"已取消，找到 {len(search_tree.get_children())} 个结果")
+            search_start_btn.config(state='normal')
+            search_cancel_btn.config(state='disabled')
+        
+        def start_search():
+            """开始远程搜索"""
+            if not self.client or not self.is_connected:
+                messagebox.showwarning("提示", "请先连接服务器", parent=browser_window)
+                return
+            root_dir = search_root_var.get().strip() or "/"
+            name_pattern = search_name_var.get().strip()
+            content = search_content_var.get()
+            if not name_pattern and not content:
+                messagebox.showwarning("提示", "请输入文件名或文件内容", parent=browser_window)
+                return
+            try:
+                max_depth = max(1, int(search_depth_var.get()))
+                max_size_kb = max(0, int(search_size_var.get() or 0))
+            except ValueError:
+                messagebox.showerror("错误", "最大深度和文件大小必须是数字", parent=browser_window)
+                return
+            
+            cancel_search()
+            search_tree.delete(*search_tree.get_children())
+            command = build_search_command(root_dir, name_pattern, content, max_depth, max_size_kb,
+                                           search_ignore_case_var.get())
+            job = RemoteSearchJob(self.client, command, with_content=bool(content))
+            search_state['job'] = job
+            job.start()
+            search_status_var.set("搜索中...")
+            search_start_btn.config(state='disabled')
+            search_cancel_btn.config(state='normal')
+            browser_window.after(LISTING_PUMP_INTERVAL_MS, lambda: pump_search(job))
+        
+        def pump_search(job):
+            """把搜索结果插入列表（每次最多处理一批）"""
+            if job is not search_state['job']:
+                return
+            try:
+                if not browser_window.winfo_exists():
+                    job.cancel()
+                    return
+            except tk.TclError:
+                job.cancel()
+                return
+            
+            for _ in range(SEARCH_RESULTS_PER_TICK):
+                try:
+                    kind, payload = job.results.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "match":
+                    result_path, line_no, text = payload
+                    search_tree.insert("", tk.END, text=result_path, values=(line_no, text))
+                    continue
+                
+                search_state['job'] = None
+                search_start_btn.config(state='normal')
+                search_cancel_btn.config(state='disabled')
+                if kind == "done":
+                    message = f"搜索完成，找到 {payload['count']} 个结果"
+                    if payload['truncated']:
+                        message += "（已达到上限，请缩小搜索范围）"
+                    search_status_var.set(message)
+                else:
+                    search_status_var.set(f"搜索失败: {payload}")
+                return
+            
+            search_status_var.set(f"搜索中... 已找到 {len(search_tree.get_children())} 个结果")
+            browser_window.after(LISTING_PUMP_INTERVAL_MS, lambda: pump_search(job))
+        
+        def on_search_result_open(event=None):
+            """双击搜索结果：跳转到所在目录并选中该文件"""
+            selection = search_tree.selection()
+            if not selection:
+                return
+            result_path = search_tree.item(selection[0], "text").rstrip('/')
+            if not result_path.startswith('/'):
+                return
+            parent_dir, name = result_path.rsplit('/', 1)
+            view_state['pending_select'] = name
+            path_var.set(parent_dir or "/")
+            notebook.select(0)
+            browse_path(use_cache=True)
+        
+        def on_notebook_tab_changed(event=None):
+            """切换到搜索页时，默认从当前浏览的目录开始搜索（用户手动修改过则保留）"""
+            if notebook.index("current") != 2:
+                return
+            if search_root_var.get() == search_state['auto_root']:
+                search_state['auto_root'] = path_var.get().strip() or "/"
+                search_root_var.set(search_state['auto_root'])
+        
+        notebook.bind('<<NotebookTabChanged>>', on_notebook_tab_changed)
+        search_tree.bind('<Double-1>', on_search_result_open)
+        search_tree.bind('<Return>', on_search_result_open)
+        search_name_entry.bind('<Return>', lambda e: start_search())
+        search_content_entry.bind('<Return>', lambda e: start_search())
+        
+        # 当前正在进行的目录读取任务（切换目录或关闭窗口时取消）
+        listing_state = {'job': None}
+        
+        # 目录预取：最近访问的目录 + 当前目录中靠前的子目录，在后台读入缓存
+        prefetcher = DirectoryPrefetcher(self.get_shared_sftp(), self.listing_cache)
+        visited_paths = deque(maxlen=PREFETCH_HISTORY_SIZE)
+        
+        def join_remote_path(directory, name):
+            return f"/{name}" if directory == "/" else f"{directory}/{name}"
+        
+        def schedule_prefetch(path):
+            """根据当前目录安排预取（最可能打开的目录排在前面）"""
+            candidates = []
+            for row in range(len(dir_model)):
+                if len(candidates) >= PREFETCH_TOP_DIRS:
+                    break
+                if dir_model.is_dir_at(row):
+                    candidates.append(join_remote_path(path, dir_model.name_at(row)))
+            if path != "/":
+                candidates.append("/".join(path.split("/")[:-1]) or "/")
+            for visited in reversed(visited_paths):
+                if visited != path and visited not in candidates:
+                    candidates.append(visited)
+            prefetcher.schedule(candidates)
+        
+        def cancel_listing():
+            """取消正在进行的目录读取"""
+            job = listing_state['job']
+            if job is not None:
+                job.cancel()
+                listing_state['job'] = None
+        
+        def browse_path(use_cache=False):
+            # 浏览指定路径（后台线程读取，分块显示，界面不卡顿）
+            # use_cache=True 时优先使用缓存/预取的结果（目录导航），刷新和修改文件后重新读取
             path = path_var.get().strip()
             if not path:
                 path = "/"
@@ -6744,9 +9341,13 @@ nginx -t && nginx -s reload
             if not path:
                 path = "/"
             
-            # 清空树
-            for item in tree.get_children():
-                tree.delete(item)
+            # 取消上一次未完成的读取
+            cancel_listing()
+            
+            # 清空模型和树
+            dir_model.clear()
+            view_state.update(top=0, rendered=0, status=None, sort=None, selected_name=None)
+            tree.delete(*tree.get_children())
             
             # 清除排序箭头（重置列标题）
             for col in sort_states.keys():
@@ -6755,225 +9356,136 @@ nginx -t && nginx -s reload
                 tree.heading(col, text=base_text)
                 sort_states[col] = True  # 重置为升序
             
-            # 显示加载中
-            loading_item = tree.insert("", tk.END, text="(加载中...)", values=("", "", "", ""), tags=("loading",))
+            # 设置标签颜色
+            tree.tag_configure("目录", foreground="blue")
+            tree.tag_configure("链接", foreground="green")
             tree.tag_configure("loading", foreground="gray")
-            browser_window.update_idletasks()
+            tree.tag_configure("empty", foreground="gray")
+            tree.tag_configure("error", foreground="red")
+            tree.tag_configure("warning", foreground="orange")
+            
+            # 测试连接
+            if not self.client or not self.is_connected:
+                set_status_row("(错误: SSH未连接)", "error")
+                return
+            
+            # 更新路径显示
+            path_var.set(path)
+            if path in visited_paths:
+                visited_paths.remove(path)
+            visited_paths.append(path)
+            
+            # 缓存命中（通常是预取的结果），直接显示
+            cached_entries = self.listing_cache.get(path) if use_cache else None
+            if cached_entries is not None:
+                dir_model.extend(cached_entries)
+                render_view()
+                set_status_row(None if cached_entries else "(空目录)", "empty")
+                apply_pending_select()
+                schedule_prefetch(path)
+                return
+            
+            # 显示加载中
+            set_status_row("(加载中...)", "loading")
             
+            job = DirectoryListingJob(self.client, path, session=self.get_shared_sftp(), cache=self.listing_cache)
+            listing_state['job'] = job
+            job.start()
+            browser_window.after(20, lambda: pump_listing(job, path))
+        
+        def pump_listing(job, path):
+            """把后台读取的目录项分块加入模型并刷新显示（每次只处理有限数量，保证界面响应）"""
+            if job is not listing_state['job'] or job.cancelled:
+                return
             try:
-                import time
-                from datetime import datetime
-                
-                # 测试连接
-                if not self.client or not self.is_connected:
-                    tree.delete(loading_item)
-                    tree.insert("", tk.END, text="(错误: SSH未连接)", values=("", "", "", ""), tags=("error",))
-                    tree.tag_configure("error", foreground="red")
-                    return
-                
-                # 优先使用SFTP方法（更可靠）
-                try:
-                    sftp = self.client.open_sftp()
-                    files = sftp.listdir_attr(path)
-                    sftp.close()
-                    
-                    # 清空加载提示
-                    tree.delete(loading_item)
-                    
-                    # 解析SFTP结果
-                    file_count = 0
-                    for attr in files:
-                        name = attr.filename
-                        if name in ['.', '..']:
-                            continue
-                        
-                        # 判断类型
-                        if stat.S_ISDIR(attr.st_mode):
-                            file_type = "目录"
-                        elif stat.S_ISLNK(attr.st_mode):
-                            file_type = "链接"
-                        else:
-                            file_type = "文件"
-                        
-                        # 权限
-                        permissions = stat.filemode(attr.st_mode)
-                        
-                        # 大小
-                        size = str(attr.st_size) if hasattr(attr, 'st_size') else ""
-                        
-                        # 修改时间
-                        try:
-                            mtime = datetime.fromtimestamp(attr.st_mtime)
-                            date = mtime.strftime("%Y-%m-%d %H:%M")
-                        except:
-                            date = ""
-                        
-                        # 插入到树中
-                        tree.insert("", tk.END, text=name, values=(file_type, permissions, size, date), 
-                                  tags=(file_type,))
-                        file_count += 1
-                    
-                    # 设置标签颜色
-                    tree.tag_configure("目录", foreground="blue")
-                    tree.tag_configure("链接", foreground="green")
-                    
-                    # 更新路径显示
-                    path_var.set(path)
-                    
-                    # 如果没有文件，显示提示
-                    if file_count == 0:
-                        tree.insert("", tk.END, text="(空目录)", values=("", "", "", ""), tags=("empty",))
-                        tree.tag_configure("empty", foreground="gray")
-                    
-                    browser_window.update_idletasks()
+                if not browser_window.winfo_exists():
+                    job.cancel()
                     return
-                    
-                except Exception as sftp_error:
-                    # SFTP失败，回退到ls命令
-                    pass
-                
-                # 使用ls命令作为备用方法
-                cmd = f"ls -la '{path}'"
-                stdin, stdout, stderr = self.client.exec_command(cmd, timeout=10)
-                
-                # 等待命令完成
-                time.sleep(1.0)
-                
-                # 读取输出
-                output = stdout.read().decode('utf-8', errors='ignore')
-                error = stderr.read().decode('utf-8', errors='ignore')
-                
-                # 清空加载提示
+            except tk.TclError:
+                job.cancel()
+                return
+            
+            received = False
+            for _ in range(LISTING_CHUNKS_PER_TICK):
                 try:
-                    tree.delete(loading_item)
-                except:
-                    pass
-                
-                # 检查错误
-                if error and ("No such file" in error or "cannot access" in error or "Permission denied" in error):
-                    tree.insert("", tk.END, text=f"(错误: {error.strip()})", values=("", "", "", ""), tags=("error",))
-                    tree.tag_configure("error", foreground="red")
-                    browser_window.update_idletasks()
-                    return
-                
-                # 如果没有输出
-                if not output.strip():
-                    tree.insert("", tk.END, text="(空目录)", values=("", "", "", ""), tags=("empty",))
-                    tree.tag_configure("empty", foreground="gray")
-                    path_var.set(path)
-                    browser_window.update_idletasks()
-                    return
+                    kind, payload = job.results.get_nowait()
+                except queue.Empty:
+                    break
                 
-                # 解析输出
-                lines = output.strip().split('\n')
-                file_count = 0
-                parse_errors = []
+                if kind == "chunk":
+                    dir_model.extend(payload)
+                    received = True
+                    continue
                 
-                for line in lines:
-                    line = line.strip()
-                    # 跳过空行和total行
-                    if not line or line.startswith('total'):
-                        continue
-                    
-                    # 检查是否是ls输出格式（必须以d、-或l开头）
-                    if len(line) < 10 or line[0] not in ['d', '-', 'l']:
-                        continue
-                    
-                    try:
-                        # 使用split方法解析，更可靠
-                        parts = line.split(None, 8)  # 最多分割8次，保留文件名部分
-                        
-                        if len(parts) < 9:
-                            # 如果分割后少于9部分，尝试更宽松的解析
-                            parts = line.split(None, 7)
-                            if len(parts) < 8:
-                                parse_errors.append(f"无法解析: {line[:50]}")
-                                continue
-                            # 简化格式：只有8部分
-                            permissions_str = parts[0]
-                            file_type_char = permissions_str[0] if permissions_str else '-'
-                            permissions = permissions_str
-                            size = parts[4] if len(parts) > 4 else ""
-                            date = " ".join(parts[5:7]) if len(parts) > 6 else ""
-                            name = parts[7] if len(parts) > 7 else ""
-                        else:
-                            # 标准格式：9部分
-                            permissions_str = parts[0]
-                            file_type_char = permissions_str[0] if permissions_str else '-'
-                            permissions = permissions_str
-                            size = parts[4]
-                            # 日期可能是3部分（月 日 时间）或4部分（月 日 年）
-                            if len(parts) > 7:
-                                date = " ".join(parts[5:8])
-                            else:
-                                date = " ".join(parts[5:7]) if len(parts) > 6 else ""
-                            name = parts[8]
-                        
-                        # 处理符号链接
-                        if ' -> ' in name:
-                            name = name.split(' -> ')[0].strip()
-                        
-                        # 跳过当前目录和父目录
-                        if name in ['.', '..']:
-                            continue
-                        
-                        # 判断文件类型
-                        if file_type_char == 'd':
-                            file_type = "目录"
-                        elif file_type_char == 'l':
-                            file_type = "链接"
+                # 读取结束（完成或出错）
+                listing_state['job'] = None
+                if kind == "done":
+                    # 加载过程中点击过排序，加载完成后对完整结果重新排序
+                    if view_state['sort']:
+                        dir_model.sort(*view_state['sort'])
+                        received = False
+                        view_state['status'] = None
+                        render_view()
+                    file_count = payload.get("count", 0)
+                    parse_errors = payload.get("parse_errors", 0)
+                    if file_count == 0:
+                        if parse_errors:
+                            # 如果有解析错误，显示错误信息
+                            set_status_row(f"(解析错误: {parse_errors} 行无法解析)", "error")
                         else:
-                            file_type = "文件"
-                        
-                        # 插入到树中
-                        tree.insert("", tk.END, text=name, values=(file_type, permissions, size, date), 
-                                  tags=(file_type,))
-                        file_count += 1
-                    except Exception as parse_error:
-                        parse_errors.append(f"解析错误: {str(parse_error)} - {line[:50]}")
-                        continue
-                
-                # 设置标签颜色
-                tree.tag_configure("目录", foreground="blue")
-                tree.tag_configure("链接", foreground="green")
-                
-                # 更新路径显示
-                path_var.set(path)
-                
-                # 如果没有找到文件，显示提示
-                if file_count == 0:
-                    if parse_errors:
-                        # 如果有解析错误，显示错误信息
-                        error_msg = f"(解析错误: {len(parse_errors)} 行无法解析)"
-                        tree.insert("", tk.END, text=error_msg, values=("", "", "", ""), tags=("error",))
-                        tree.tag_configure("error", foreground="red")
+                            set_status_row("(空目录)", "empty")
+                    elif parse_errors:
+                        # 如果部分解析成功但有错误，在最后显示警告
+                        set_status_row(f"(警告: {parse_errors} 行解析失败)", "warning")
                     else:
-                        tree.insert("", tk.END, text="(空目录)", values=("", "", "", ""), tags=("empty",))
-                        tree.tag_configure("empty", foreground="gray")
-                elif parse_errors and file_count > 0:
-                    # 如果部分解析成功但有错误，在最后显示警告
-                    tree.insert("", tk.END, text=f"(警告: {len(parse_errors)} 行解析失败)", 
-                              values=("", "", "", ""), tags=("warning",))
-                    tree.tag_configure("warning", foreground="orange")
-                
-                # 强制更新界面
-                browser_window.update_idletasks()
-                
-            except Exception as e:
-                import traceback
-                error_detail = traceback.format_exc()
-                # 清空树并显示错误
-                try:
-                    tree.delete(loading_item)
-                except:
-                    pass
-                for item in tree.get_children():
-                    tree.delete(item)
-                tree.insert("", tk.END, text=f"(错误: {str(e)})", values=("", "", "", ""), tags=("error",))
-                tree.tag_configure("error", foreground="red")
-                browser_window.update_idletasks()
-                # 显示详细错误
-                messagebox.showerror("错误", f"浏览失败: {e}\n\n路径: {path}\n\n详细信息:\n{error_detail[:300]}")
+                        set_status_row(None)
+                    if received:
+                        render_view(append_only=True)
+                        received = False
+                    apply_pending_select()
+                    schedule_prefetch(path)
+                elif kind == "error":
+                    set_status_row(f"(错误: {payload})", "error")
+                else:
+                    # 未预期的异常：清空列表并显示错误
+                    error_text, error_detail = payload
+                    dir_model.clear()
+                    view_state['status'] = (f"(错误: {error_text})", "error")
+                    render_view()
+                    messagebox.showerror("错误", f"浏览失败: {error_text}\n\n路径: {path}\n\n详细信息:\n{error_detail[:300]}", parent=browser_window)
+                    return
+                if received:
+                    render_view(append_only=True)
+                return
+            
+            if received:
+                view_state['status'] = (f"(加载中... 已读取 {len(dir_model)} 项)", "loading")
+                render_view(append_only=True)
+            browser_window.after(LISTING_PUMP_INTERVAL_MS, lambda: pump_listing(job, path))
+        
+        def refresh_if_showing(directory):
+            try:
+                if not browser_window.winfo_exists():
+                    self.browser_refreshers.discard(refresh_if_showing)
+                    return
+            except tk.TclError:
+                self.browser_refreshers.discard(refresh_if_showing)
+                return
+            current = path_var.get().strip().rstrip('/') or "/"
+            if current == directory:
+                browse_path()
+        
+        self.browser_refreshers.add(refresh_if_showing)
+        
+        def close_browser():
+            """关闭文件浏览器（同时取消后台读取、预取和搜索）"""
+            self.browser_refreshers.discard(refresh_if_showing)
+            cancel_listing()
+            prefetcher.stop()
+            cancel_search()
+            browser_window.destroy()
+        
+        browser_window.protocol("WM_DELETE_WINDOW", close_browser)
         
         def go_up():
             # Go to parent directory
@@ -6984,12 +9496,12 @@ nginx -t && nginx -s reload
             if not parent:
                 parent = "/"
             path_var.set(parent)
-            browse_path()
+            browse_path(use_cache=True)
         
         def go_root():
             # Go to root directory
             path_var.set("/")
-            browse_path()
+            browse_path(use_cache=True)
         
         def get_selected_path():
             # Get currently selected file or directory path
@@ -7004,9 +9516,29 @@ nginx -t && nginx -s reload
             else:
                 return f"{current}/{name}"
         
+        def get_selected_entries():
+            """所有选中项的 (远程路径, 是否目录) 列表（支持Ctrl/Shift多选）"""
+            entries = []
+            for item in tree.selection():
+                if item == status_iid:
+                    continue
+                name = tree.item(item, "text")
+                values = tree.item(item, "values")
+                entries.append((join_remote_path(path_var.get().strip().rstrip('/') or "/", name),
+                                bool(values) and values[0] == "目录"))
+            return entries
+        
+        def set_opened(file_path, raw=None, version=None):
+            """
+            记录当前编辑的文件；新建文件或未能取得版本时 version 为 None（保存时不做冲突检查）
+            内容按 surrogateescape 解码，保存时同样编码，非UTF-8字节保持不变（增量保存才能与 raw 对应）
+            """
+            nonlocal current_file_path
+            current_file_path = file_path
+            opened_state.update(version=version, data=raw)
+        
         def open_file():
             """打开文件进行编辑"""
-            nonlocal current_file_path
             file_path = get_selected_path()
             if not file_path:
                 # 如果没有选择文件，询问是否创建新文件
@@ -7020,13 +9552,13 @@ nginx -t && nginx -s reload
                     try:
                         sftp.stat(file_path)
                         # 文件存在，读取它
-                        with sftp.open(file_path, 'r') as f:
-                            content = f.read().decode('utf-8', errors='ignore')
+                        raw, version = read_remote_file(sftp, file_path)
+                        content = raw.decode('utf-8', errors='surrogateescape')
                         sftp.close()
+                        set_opened(file_path, raw, version)
                         file_content_text.delete("1.0", tk.END)
                         file_content_text.insert("1.0", content)
                         file_path_label.config(text=file_path, foreground="black")
-                        current_file_path = file_path
                         notebook.select(1)
                         return
                     except IOError:
@@ -7035,7 +9567,7 @@ nginx -t && nginx -s reload
                         if messagebox.askyesno("确认", f"文件不存在: {file_path}\n是否创建新文件？"):
                             file_content_text.delete("1.0", tk.END)
                             file_path_label.config(text=file_path, foreground="blue")
-                            current_file_path = file_path
+                            set_opened(file_path)
                             notebook.select(1)
                         return
                 except Exception as e:
@@ -7047,26 +9579,33 @@ nginx -t && nginx -s reload
                 messagebox.showwarning("提示", "请选择文件，不是目录")
                 return
             
+            # 大文件用分页查看器打开，避免整体读入内存导致界面卡死
+            row = dir_model.find(tree.item(tree.selection()[0], "text"))
+            file_size = dir_model.entry(row)[2] if row >= 0 else 0
+            if file_size > EDIT_MAX_SIZE:
+                self.open_paged_viewer(browser_window, file_path, file_size)
+                return
+            
             try:
                 # 使用SFTP读取文件（更可靠）
                 try:
                     sftp = self.client.open_sftp()
-                    with sftp.open(file_path, 'r') as f:
-                        content = f.read().decode('utf-8', errors='ignore')
+                    raw, version = read_remote_file(sftp, file_path)
+                    content = raw.decode('utf-8', errors='surrogateescape')
                     sftp.close()
+                    set_opened(file_path, raw, version)
                     
                     # 显示文件内容
                     file_content_text.delete("1.0", tk.END)
                     file_content_text.insert("1.0", content)
                     file_path_label.config(text=file_path, foreground="black")
-                    current_file_path = file_path
                     notebook.select(1)  # 切换到编辑标签页
                 except (IOError, FileNotFoundError) as io_error:
                     # 文件不存在
                     if messagebox.askyesno("文件不存在", f"文件不存在: {file_path}\n\n是否创建新文件？\n（点击'是'将创建空文件供编辑）"):
                         file_content_text.delete("1.0", tk.END)
                         file_path_label.config(text=file_path + " (新文件)", foreground="blue")
-                        current_file_path = file_path
+                        set_opened(file_path)
                         notebook.select(1)
                     return
                 except Exception as sftp_error:
@@ -7076,14 +9615,14 @@ nginx -t && nginx -s reload
                     stdout.channel.settimeout(10)
                     import time
                     time.sleep(0.5)
-                    content = stdout.read().decode('utf-8', errors='ignore')
+                    content = stdout.read().decode('utf-8', errors='surrogateescape')
                     error = stderr.read().decode('utf-8', errors='ignore')
                     
                     if error and ("No such file" in error or "cannot access" in error):
                         if messagebox.askyesno("文件不存在", f"文件不存在: {file_path}\n\n是否创建新文件？\n（点击'是'将创建空文件供编辑）"):
                             file_content_text.delete("1.0", tk.END)
                             file_path_label.config(text=file_path + " (新文件)", foreground="blue")
-                            current_file_path = file_path
+                            set_opened(file_path)
                             notebook.select(1)
                         return
                     
@@ -7091,67 +9630,92 @@ nginx -t && nginx -s reload
                     file_content_text.delete("1.0", tk.END)
                     file_content_text.insert("1.0", content)
                     file_path_label.config(text=file_path, foreground="black")
-                    current_file_path = file_path
+                    set_opened(file_path)
                     notebook.select(1)
                 
             except Exception as e:
                 messagebox.showerror("错误", f"打开文件失败: {e}")
         
-        def save_file():
-            """保存文件"""
-            nonlocal current_file_path
+        def save_file(force=False):
+            """保存文件：写入临时文件后原子改名；远程文件在打开后被修改时提示冲突"""
             if not current_file_path:
                 messagebox.showwarning("提示", "没有打开的文件", parent=browser_window)
                 return
             
             content = file_content_text.get("1.0", tk.END + "-1c")  # 获取内容，去掉最后的换行
-            
             try:
-                # 使用SFTP保存文件（最可靠的方法）
-                import tempfile
-                with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', delete=False) as tmp_file:
-                    tmp_file.write(content)
-                    tmp_path = tmp_file.name
-                
+                # 打开时无法按UTF-8解码的字节（如GBK）原样写回，未修改的部分与远程文件一致
+                data = content.encode('utf-8', errors='surrogateescape')
+            except UnicodeEncodeError as e:
+                messagebox.showerror("错误", f"内容中有无法保存的字符: {e}", parent=browser_window)
+                return
+            file_path = current_file_path
+            expected, original = opened_state['version'], opened_state['data']
+            client = self.client
+            file_path_label.config(text=f"{file_path}（正在保存...）", foreground="gray")
+            
+            def worker():
+                sftp = None
                 try:
-                    sftp = self.client.open_sftp()
-                    sftp.put(tmp_path, current_file_path)
-                    sftp.close()
-                    messagebox.showinfo("成功", "文件已保存", parent=browser_window)
-                    # 保存后刷新文件列表，但不关闭浏览器
-                    browse_path()
+                    sftp = client.open_sftp()
+                    version, sent, delta = atomic_save(client, sftp, file_path, data, expected, original, force)
+                except SaveConflict as conflict:
+                    remote_version = conflict.remote_version
+                    self.root.after(0, lambda: on_conflict(remote_version))
+                    return
+                except Exception as e:
+                    error_msg = str(e)
+                    self.root.after(0, lambda: on_failed(error_msg))
+                    return
                 finally:
-                    # 删除临时文件
-                    try:
-                        os.unlink(tmp_path)
-                    except:
-                        pass
-                    
-            except Exception as e:
-                messagebox.showerror("错误", f"保存文件失败: {e}", parent=browser_window)
+                    if sftp is not None:
+                        sftp.close()
+                self.root.after(0, lambda: on_saved(version, sent, delta))
+            
+            def on_saved(version, sent, delta):
+                if current_file_path == file_path:
+                    opened_state.update(version=version, data=data)
+                    file_path_label.config(text=file_path, foreground="black")
+                detail = f"（仅发送改动部分 {format_bytes(sent)}）" if delta else ""
+                self.output_queue.put(("success", f"文件已保存: {file_path}{detail}\n"))
+                messagebox.showinfo("成功", f"文件已保存{detail}", parent=browser_window)
+                # 保存后刷新文件列表，但不关闭浏览器
+                browse_path()
+            
+            def on_failed(error_msg):
+                file_path_label.config(text=file_path, foreground="black")
+                messagebox.showerror("错误", f"保存文件失败: {error_msg}\n\n原文件未被修改", parent=browser_window)
+            
+            def on_conflict(remote_version):
+                file_path_label.config(text=file_path, foreground="black")
+                when = datetime.fromtimestamp(remote_version.mtime).strftime('%Y-%m-%d %H:%M:%S') if remote_version.mtime else "已删除"
+                if messagebox.askyesno(
+                        "保存冲突",
+                        f"远程文件在打开后已被修改（大小 {remote_version.size}，修改时间 {when}）。\n\n"
+                        f"是否仍然用当前内容覆盖？\n（选择“否”可先另存或重新加载查看远程的修改）",
+                        parent=browser_window):
+                    save_file(force=True)
+            
+            threading.Thread(target=worker, daemon=True).start()
         
         def reload_file():
             """重新加载文件"""
-            nonlocal current_file_path
             if current_file_path:
-                # 临时保存路径
-                saved_path = current_file_path
-                # 重新打开文件
-                file_path = saved_path
+                file_path = current_file_path
                 try:
-                    cmd = f"cat '{file_path}' 2>&1"
-                    stdin, stdout, stderr = self.client.exec_command(cmd)
-                    stdout.channel.settimeout(10)
-                    content = stdout.read().decode('utf-8', errors='ignore')
-                    error = stderr.read().decode('utf-8', errors='ignore')
-                    
-                    if error and "No such file" in error:
-                        messagebox.showerror("错误", f"文件不存在: {file_path}")
-                        return
+                    sftp = self.client.open_sftp()
+                    try:
+                        raw, version = read_remote_file(sftp, file_path)
+                    finally:
+                        sftp.close()
                     
                     file_content_text.delete("1.0", tk.END)
-                    file_content_text.insert("1.0", content)
+                    file_content_text.insert("1.0", raw.decode('utf-8', errors='surrogateescape'))
+                    set_opened(file_path, raw, version)
+                    file_path_label.config(text=file_path, foreground="black")
                     messagebox.showinfo("成功", "文件已重新加载")
+                except FileNotFoundError:
+                    messagebox.showerror("错误", f"文件不存在: {file_path}")
                 except Exception as e:
                     messagebox.showerror("错误", f"重新加载失败: {e}")
         def find_replace():
@@ -7285,17 +9849,26 @@ nginx -t && nginx -s reload
             ttk.Button(btn_frame, text="关闭", command=find_window.destroy, width=12).grid(row=0, column=3, padx=3)
         
         def download_file():
-            """下载文件到本地"""
-            file_path = get_selected_path()
-            if not file_path:
-                messagebox.showwarning("提示", "请先选择一个文件")
+            """下载文件到本地（多选或包含目录时加入并行传输队列）"""
+            entries = get_selected_entries()
+            if not entries:
+                messagebox.showwarning("提示", "请先选择文件或目录")
                 return
             
-            values = tree.item(tree.selection()[0], "values")
-            if values and values[0] == "目录":
-                messagebox.showwarning("提示", "请选择文件，不是目录")
+            if len(entries) > 1 or entries[0][1]:
+                local_dir = filedialog.askdirectory(title="选择保存目录")
+                if not local_dir:
+                    return
+                transfer_queue = self.get_transfer_queue()
+                for remote_path, is_dir in entries:
+                    local_target = os.path.join(local_dir, remote_path.rstrip('/').rsplit('/', 1)[-1])
+                    transfer_queue.add_download(remote_path, local_target, is_dir)
+                self.output_queue.put(("info", f"已加入传输队列: {len(entries)} 项 -> {local_dir}\n"))
+                self.show_transfer_queue(browser_window)
                 return
             
+            file_path = entries[0][0]
+            
             # 选择保存位置
             local_path = filedialog.asksaveasfilename(
                 title="保存文件",
@@ -7305,23 +9878,56 @@ nginx -t && nginx -s reload
             if not local_path:
                 return
             
-            try:
-                # 使用SFTP下载文件
-                sftp = self.client.open_sftp()
-                sftp.get(file_path, local_path)
-                sftp.close()
-                messagebox.showinfo("成功", f"文件已下载到: {local_path}")
-                # 下载后不关闭窗口
-            except Exception as e:
-                messagebox.showerror("错误", f"下载文件失败: {e}")
-                # 错误后也不关闭窗口
+            # 后台下载（预取加速、可续传），进度窗口显示速度
+            transfer = FileTransfer(self.client.open_sftp, FileTransfer.DOWNLOAD, file_path, local_path,
+                                    self.transfer_resume_store, verify=self.verify_transfers)
+            job = TransferJob(transfer, self.client)
+            job.start()
+            self._show_transfer_progress(
+                browser_window, job, "下载文件",
+                on_done=lambda j: self.output_queue.put(("success", f"文件已下载到: {local_path}\n")))
+        
+        def tail_selected_file():
+            """在实时日志窗口中跟随选中的文件"""
+            entries = get_selected_entries()
+            if len(entries) != 1 or entries[0][1]:
+                messagebox.showwarning("提示", "请选择一个日志文件")
+                return
+            self.log_tail_viewer(entries[0][0])
+        
+        def upload_target_dir():
+            """上传的目标目录：选中的目录，否则为当前目录"""
+            entries = get_selected_entries()
+            if len(entries) == 1 and entries[0][1]:
+                return entries[0][0]
+            return path_var.get().strip().rstrip('/') or "/"
+        
+        def queue_uploads(local_paths):
+            """把多个本地文件或目录加入并行传输队列"""
+            remote_dir = upload_target_dir()
+            transfer_queue = self.get_transfer_queue()
+            for local_path in local_paths:
+                name = os.path.basename(os.path.normpath(local_path))
+                transfer_queue.add_upload(local_path, join_remote_path(remote_dir, name))
+            self.output_queue.put(("info", f"已加入传输队列: {len(local_paths)} 项 -> {remote_dir}\n"))
+            self.show_transfer_queue(browser_window)
+        
+        def upload_folder():
+            """上传整个本地目录（保留目录结构、权限和修改时间）"""
+            local_dir = filedialog.askdirectory(title="选择要上传的目录")
+            if local_dir:
+                queue_uploads([local_dir])
         
         def upload_file():
-            """上传本地文件到服务器"""
+            """上传本地文件到服务器（选择多个文件时加入并行传输队列）"""
             # 选择本地文件
-            local_path = filedialog.askopenfilename(title="选择要上传的文件")
-            if not local_path:
+            local_paths = filedialog.askopenfilenames(title="选择要上传的文件")
+            if not local_paths:
+                return
+            if len(local_paths) > 1:
+                queue_uploads(list(local_paths))
                 return
+            local_path = local_paths[0]
             
             file_path = get_selected_path()
             if file_path:
@@ -7339,16 +9945,16 @@ nginx -t && nginx -s reload
                 current = path_var.get().strip().rstrip('/')
                 remote_path = f"{current}/{os.path.basename(local_path)}"
             
-            try:
-                # 使用SFTP上传文件
-                sftp = self.client.open_sftp()
-                sftp.put(local_path, remote_path)
-                sftp.close()
-                messagebox.showinfo("成功", f"文件已上传到: {remote_path}")
+            def on_uploaded(job):
+                self.output_queue.put(("success", f"文件已上传到: {remote_path}\n"))
                 browse_path()  # 刷新文件列表，不关闭窗口
-            except Exception as e:
-                messagebox.showerror("错误", f"上传文件失败: {e}")
-                # 错误后也不关闭窗口
+            
+            # 后台上传（流水线写入、可续传），进度窗口显示速度
+            transfer = FileTransfer(self.client.open_sftp, FileTransfer.UPLOAD, remote_path, local_path,
+                                    self.transfer_resume_store, verify=self.verify_transfers)
+            job = TransferJob(transfer, self.client)
+            job.start()
+            self._show_transfer_progress(browser_window, job, "上传文件", on_done=on_uploaded)
         
         def edit_with_notepad():
             """用Notepad++打开文件编辑，保存后自动同步到服务器"""
@@ -7389,112 +9995,54 @@ nginx -t && nginx -s reload
                     messagebox.showerror("错误", "未找到Notepad++\n\n请确保已安装Notepad++，或手动指定Notepad++的安装路径。")
                     return
                 
-                # 创建临时目录（如果不存在）
-                temp_dir = os.path.join(tempfile.gettempdir(), "ssh_tool_notepad_edit")
-                os.makedirs(temp_dir, exist_ok=True)
-                
-                # 生成临时文件路径（使用文件名+时间戳避免冲突）
-                file_name = os.path.basename(file_path)
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                temp_file_path = os.path.join(temp_dir, f"{file_name}_{timestamp}")
-                
-                # 下载文件到临时目录
-                try:
-                    sftp = self.client.open_sftp()
-                    sftp.get(file_path, temp_file_path)
-                    sftp.close()
-                except Exception as e:
-                    messagebox.showerror("错误", f"下载文件失败: {e}")
-                    return
-                
-                # 保存文件映射关系和初始修改时间
-                initial_mtime = os.path.getmtime(temp_file_path) if os.path.exists(temp_file_path) else 0
-                notepad_edit_files[file_path] = {
-                    'local_path': temp_file_path,
-                    'last_mtime': initial_mtime,
-                    'last_sync_mtime': initial_mtime
-                }
+                watcher = self.get_file_watcher()
+                watched = watcher.get(file_path)
+                if watched and os.path.exists(watched.local_path):
+                    # 已在监视中：直接打开现有的本地副本
+                    temp_file_path = watched.local_path
+                else:
+                    # 创建临时目录（如果不存在）
+                    temp_dir = os.path.join(tempfile.gettempdir(), "ssh_tool_notepad_edit")
+                    os.makedirs(temp_dir, exist_ok=True)
+                    
+                    # 生成临时文件路径（使用文件名+时间戳避免冲突）
+                    file_name = os.path.basename(file_path)
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    temp_file_path = os.path.join(temp_dir, f"{file_name}_{timestamp}")
+                    
+                    # 下载文件到临时目录，记录远程版本（同步时检查冲突）
+                    try:
+                        sftp = self.client.open_sftp()
+                        try:
+                            raw, version = read_remote_file(sftp, file_path)
+                        finally:
+                            sftp.close()
+                        with open(temp_file_path, 'wb') as f:
+                            f.write(raw)
+                    except Exception as e:
+                        messagebox.showerror("错误", f"下载文件失败: {e}")
+                        return
+                    
+                    # 加入共享的监视服务（保存后防抖合并，再原子上传）
+                    watcher.watch(file_path, temp_file_path, version)
                 
                 # 用Notepad++打开文件
                 try:
                     # 使用subprocess启动Notepad++，不等待其关闭
                     subprocess.Popen([notepad_exe, temp_file_path], shell=False)
                     
-                    # 启动自动同步监控线程
-                    def auto_sync_monitor():
-                        """自动监控文件变化并同步"""
-                        while file_path in notepad_edit_files:
-                            try:
-                                local_file = notepad_edit_files[file_path]['local_path']
-                                
-                                # 检查文件是否存在
-                                if not os.path.exists(local_file):
-                                    # 文件被删除，停止监控
-                                    if file_path in notepad_edit_files:
-                                        del notepad_edit_files[file_path]
-                                    break
-                                
-                                # 检查文件修改时间
-                                current_mtime = os.path.getmtime(local_file)
-                                last_sync_mtime = notepad_edit_files[file_path]['last_sync_mtime']
-                                
-                                # 如果文件被修改了（修改时间变化）
-                                if current_mtime > last_sync_mtime + 1:  # 加1秒避免频繁同步
-                                    # 等待一小段时间，确保文件写入完成
-                                    import time
-                                    time.sleep(0.5)
-                                    
-                                    # 再次检查修改时间，确保文件已保存完成
-                                    final_mtime = os.path.getmtime(local_file)
-                                    if final_mtime == current_mtime:
-                                        # 文件已保存，开始同步
-                                        try:
-                                            sftp = self.client.open_sftp()
-                                            sftp.put(local_file, file_path)
-                                            sftp.close()
-                                            
-                                            # 更新同步时间
-                                            notepad_edit_files[file_path]['last_sync_mtime'] = final_mtime
-                                            
-                                            # 在输出面板显示同步信息（不弹窗）
-                                            self.output_queue.put(("success", f"[自动同步] {file_path} 已同步到服务器\n"))
-                                            
-                                            # 刷新文件列表（在UI线程中执行）
-                                            self.root.after(0, browse_path)
-                                        except Exception as sync_error:
-                                            # 同步失败，在输出面板显示错误
-                                            self.output_queue.put(("error", f"[自动同步失败] {file_path}: {sync_error}\n"))
-                                
-                                # 更新最后检查的修改时间
-                                notepad_edit_files[file_path]['last_mtime'] = current_mtime
-                                
-                                # 等待1秒后再次检查
-                                import time
-                                time.sleep(1)
-                                
-                            except Exception as e:
-                                # 监控出错，继续监控
-                                import time
-                                time.sleep(2)
-                                continue
-                    
-                    # 启动监控线程
-                    monitor_thread = threading.Thread(target=auto_sync_monitor, daemon=True)
-                    monitor_thread.start()
-                    
                     # 显示成功提示（不弹窗，只在输出面板显示）
                     self.output_queue.put(("info", f"[Notepad++编辑] 已打开文件: {file_path}\n文件保存后将自动同步到服务器\n"))
                     
                 except Exception as e:
                     messagebox.showerror("错误", f"打开Notepad++失败: {e}")
+                    watcher.unwatch(file_path)
                     # 清理临时文件
                     if os.path.exists(temp_file_path):
                         try:
                             os.remove(temp_file_path)
                         except:
                             pass
-                    if file_path in notepad_edit_files:
-                        del notepad_edit_files[file_path]
                     
             except Exception as e:
                 messagebox.showerror("错误", f"操作失败: {e}")
@@ -7777,12 +10325,12 @@ nginx -t && nginx -s reload
                 else:
                     new_path = f"{current}/{name}"
                 path_var.set(new_path)
-                browse_path()
+                browse_path(use_cache=True)
             else:
                 open_file()
         
         # 绑定事件和按钮
-        path_entry.bind('<Return>', lambda e: browse_path())
+        path_entry.bind('<Return>', lambda e: browse_path(use_cache=True))
         ttk.Button(btn_frame, text="刷新", command=browse_path, width=8).pack(side=tk.LEFT, padx=2)
         ttk.Button(btn_frame, text="上级目录", command=go_up, width=8).pack(side=tk.LEFT, padx=2)
         ttk.Button(btn_frame, text="根目录", command=go_root, width=8).pack(side=tk.LEFT, padx=2)
@@ -7888,47 +10436,32 @@ nginx -t && nginx -s reload
                 messagebox.showwarning("提示", "请输入数据库用户名")
                 return
             
-            # 选择保存位置
+            # 选择保存位置（按扩展名在服务器上压缩：.gz 用gzip，.zst 用zstd）
             filename = filedialog.asksaveasfilename(
                 title="保存数据库备份",
-                defaultextension=".sql",
-                filetypes=[("SQL文件", "*.sql"), ("所有文件", "*.*")]
+                initialfile=f"{db_name}.sql.gz",
+                defaultextension=".gz",
+                filetypes=[("gzip压缩的SQL文件", "*.sql.gz"), ("zstd压缩的SQL文件", "*.sql.zst"),
+                           ("SQL文件", "*.sql"), ("所有文件", "*.*")]
             )
             
             if not filename:
                 return
             
-            # 构建mysqldump命令
-            if db_pass:
-                cmd = f"mysqldump -u{db_user} -p{db_pass} {db_name} > /tmp/{db_name}_backup.sql"
-            else:
-                cmd = f"mysqldump -u{db_user} {db_name} > /tmp/{db_name}_backup.sql"
+            # mysqldump 的输出在服务器上压缩后直接传回本地，不在服务器上生成临时文件
+            # （开启传输校验时检查gzip文件的完整性，损坏时自动重新导出）
+            export = DatabaseExport(self.client, db_name, db_user, db_pass, filename, verify=self.verify_transfers)
+            job = TransferJob(export, self.client)
             
-            # 执行导出命令
-            try:
-                stdin, stdout, stderr = self.client.exec_command(cmd, get_pty=False)
-                error = stderr.read().decode('utf-8', errors='ignore')
-                
-                if error and "ERROR" in error.upper():
-                    messagebox.showerror("错误", f"导出数据库失败:\n{error}")
-                    return
-                
-                # 使用SFTP下载文件
-                try:
-                    sftp = self.client.open_sftp()
-                    remote_path = f"/tmp/{db_name}_backup.sql"
-                    sftp.get(remote_path, filename)
-                    sftp.close()
-                    
-                    # 删除临时文件
-                    self.client.exec_command(f"rm -f {remote_path}", get_pty=False)
-                    
-                    messagebox.showinfo("成功", f"数据库 '{db_name}' 已导出到:\n{filename}")
-                    self.output_queue.put(("info", f"导出数据库: {db_name} -> {filename}\n"))
-                except Exception as e:
-                    messagebox.showerror("错误", f"下载备份文件失败: {e}")
-            except Exception as e:
-                messagebox.showerror("错误", f"导出数据库失败: {e}")
+            def on_exported(job):
+                verified = "（gzip完整性校验通过）" if job.verified else ""
+                self.output_queue.put(("info", f"导出数据库: {db_name} -> {filename}，{export.describe()}{verified}\n"))
+                messagebox.showinfo("成功", f"数据库 '{db_name}' 已导出到:\n{filename}\n\n{export.describe()}",
+                                    parent=db_window)
+            
+            job.start()
+            self._show_transfer_progress(db_window, job, "导出数据库", on_done=on_exported,
+                                         resumable=False, verify_label="检查文件完整性")
         
         def import_database():
             """导入数据库"""
@@ -7944,10 +10477,10 @@ nginx -t && nginx -s reload
                 messagebox.showwarning("提示", "请输入数据库用户名")
                 return
             
-            # 选择要导入的SQL文件
+            # 选择要导入的SQL文件（.gz/.zst 文件在服务器上解压）
             filename = filedialog.askopenfilename(
                 title="选择要导入的SQL文件",
-                filetypes=[("SQL文件", "*.sql"), ("所有文件", "*.*")]
+                filetypes=[("SQL文件", "*.sql *.sql.gz *.sql.zst"), ("所有文件", "*.*")]
             )
             
             if not filename:
@@ -7958,36 +10491,30 @@ nginx -t && nginx -s reload
                 return
             
             # 确认导入
-            if not messagebox.askyesno("确认", f"确定要导入数据库 '{db_name}' 吗？\n这将覆盖现有数据！"):
+            if not messagebox.askyesno("确认", f"确定要导入数据库 '{db_name}' 吗？\n这将覆盖现有数据！\n"
+                                              f"（中途取消时已执行的语句不会回滚）"):
                 return
             
-            try:
-                # 使用SFTP上传文件
-                sftp = self.client.open_sftp()
-                remote_path = f"/tmp/{os.path.basename(filename)}"
-                sftp.put(filename, remote_path)
-                sftp.close()
-                
-                # 构建mysql导入命令
-                if db_pass:
-                    cmd = f"mysql -u{db_user} -p{db_pass} {db_name} < {remote_path}"
-                else:
-                    cmd = f"mysql -u{db_user} {db_name} < {remote_path}"
-                
-                # 执行导入命令
-                stdin, stdout, stderr = self.client.exec_command(cmd, get_pty=False)
-                error = stderr.read().decode('utf-8', errors='ignore')
-                
-                # 删除临时文件
-                self.client.exec_command(f"rm -f {remote_path}", get_pty=False)
-                
-                if error and "ERROR" in error.upper():
-                    messagebox.showerror("错误", f"导入数据库失败:\n{error}")
-                else:
-                    messagebox.showinfo("成功", f"数据库 '{db_name}' 导入成功！")
-                    self.output_queue.put(("info", f"导入数据库: {filename} -> {db_name}\n"))
-            except Exception as e:
-                messagebox.showerror("错误", f"导入数据库失败: {e}")
+            # 本地文件通过stdin直接送入远程 mysql，不上传到服务器，导入立即开始
+            # （开启传输校验时先检查gzip文件的完整性）
+            database_import = DatabaseImport(self.client, db_name, db_user, db_pass, filename,
+                                             verify=self.verify_transfers)
+            job = TransferJob(database_import, self.client)
+            
+            def statement_detail():
+                if database_import.checking:
+                    return "正在检查压缩文件完整性..."
+                statements = database_import.statements
+                return f"已发送 {statements} 条语句" if statements is not None else ""
+            
+            def on_imported(job):
+                self.output_queue.put(("info", f"导入数据库: {filename} -> {db_name}，{database_import.describe()}\n"))
+                messagebox.showinfo("成功", f"数据库 '{db_name}' 导入成功！\n\n{database_import.describe()}",
+                                    parent=db_window)
+            
+            job.start()
+            self._show_transfer_progress(db_window, job, "导入数据库", on_done=on_imported,
+                                         resumable=False, extra_detail=statement_detail)
         
         # 按钮样式
         style = ttk.Style()
@@ -8525,6 +11052,9 @@ if __name__ == "__main__":
         root = tk.Tk()
         app = SSHToolGUI(root)
         root.mainloop()
+        # 写入未保存的监控数据
+        if app.metrics_store:
+            app.metrics_store.close()
     except Exception as e:
         # 兜底错误提示，避免静默失败
         import traceback
@@ -8564,5 +11094,4 @@ if __name__ == "__main__":
             try:
                 input("\n按回车键退出...")
             except Exception:
-                import time
                 time.sleep(5)  # 等待5秒让用户看到错误信息
\ No newline at end of file
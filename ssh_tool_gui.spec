@@ -24,6 +24,14 @@ a = Analysis(
         'tkinter.simpledialog',
         'license_manager',
         'connection_monitor',
+        'remote_files',
+        'sftp_transfer',
+        'remote_sync',
+        'file_watcher',
+        'remote_monitor',
+        'metrics_store',
+        'metric_alerts',
+        'db_transfer',
         'cryptography',
         'bcrypt',
         'openpyxl',
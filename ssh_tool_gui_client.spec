@@ -9,10 +9,26 @@ a = Analysis(
     binaries=[],
     datas=[
         ('license_manager.py', '.'),
+        ('remote_files.py', '.'),
+        ('sftp_transfer.py', '.'),
+        ('remote_sync.py', '.'),
+        ('file_watcher.py', '.'),
+        ('remote_monitor.py', '.'),
+        ('metrics_store.py', '.'),
+        ('metric_alerts.py', '.'),
+        ('db_transfer.py', '.'),
         ('config.json.example', '.'),
     ],
     hiddenimports=[
         'license_manager',
+        'remote_files',
+        'sftp_transfer',
+        'remote_sync',
+        'file_watcher',
+        'remote_monitor',
+        'metrics_store',
+        'metric_alerts',
+        'db_transfer',
         'paramiko',
         'pytz',
         'tkinter',
@@ -1,7 +1,7 @@
 # -*- mode: python ; coding: utf-8 -*-
 from PyInstaller.utils.hooks import collect_all
 
-datas = [('ssh_tool_gui.py', '.'), ('license_manager.py', '.'), ('licenses.json', '.'), ('config.json', '.'), ('config.json.example', '.'), ('gm_templates.json', '.'), ('gm_templates.json.backup', '.'), ('item_ids.json', '.'), ('connections.json', '.'), ('connections.json.backup', '.'), ('user_connections.json', '.'), ('license.key', '.')]
+datas = [('ssh_tool_gui.py', '.'), ('license_manager.py', '.'), ('remote_files.py', '.'), ('sftp_transfer.py', '.'), ('remote_sync.py', '.'), ('file_watcher.py', '.'), ('remote_monitor.py', '.'), ('metrics_store.py', '.'), ('metric_alerts.py', '.'), ('db_transfer.py', '.'), ('licenses.json', '.'), ('config.json', '.'), ('config.json.example', '.'), ('gm_templates.json', '.'), ('gm_templates.json.backup', '.'), ('item_ids.json', '.'), ('connections.json', '.'), ('connections.json.backup', '.'), ('user_connections.json', '.'), ('license.key', '.')]
 binaries = []
 hiddenimports = ['pkgutil', 'paramiko', 'pytz', 'tkinter', 'tkinter.ttk', 'tkinter.scrolledtext', 'tkinter.messagebox', 'tkinter.filedialog', 'tkinter.simpledialog']
 tmp_ret = collect_all('paramiko')
@@ -5,7 +5,7 @@ a = Analysis(
     ['build\\obf\\start_gui_wrapper.py'],
     pathex=['build\\obf'],
     binaries=[],
-    datas=[('ssh_tool_gui.py', '.'), ('license_manager.py', '.'), ('licenses.json', '.'), ('config.json', '.'), ('config.json.example', '.'), ('gm_templates.json', '.'), ('gm_templates.json.backup', '.'), ('item_ids.json', '.'), ('connections.json', '.'), ('connections.json.backup', '.'), ('user_connections.json', '.'), ('license.key', '.')],
+    datas=[('ssh_tool_gui.py', '.'), ('license_manager.py', '.'), ('remote_files.py', '.'), ('sftp_transfer.py', '.'), ('remote_sync.py', '.'), ('file_watcher.py', '.'), ('remote_monitor.py', '.'), ('metrics_store.py', '.'), ('metric_alerts.py', '.'), ('db_transfer.py', '.'), ('licenses.json', '.'), ('config.json', '.'), ('config.json.example', '.'), ('gm_templates.json', '.'), ('gm_templates.json.backup', '.'), ('item_ids.json', '.'), ('connections.json', '.'), ('connections.json.backup', '.'), ('user_connections.json', '.'), ('license.key', '.')],
     hiddenimports=['pkgutil'],
     hookspath=[],
     hooksconfig={},